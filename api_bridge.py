@@ -8,8 +8,11 @@ It provides intelligent supply chain analysis and recommendations based on
 inventory data using advanced prompt engineering and dynamic model selection.
 
 Features:
-- Automatic model discovery and fallback
-- Rate limit handling with exponential backoff
+- Automatic model discovery and fallback (cached per process and API key)
+- Rate limit handling with jittered, bounded exponential backoff
+- Background brief jobs (submit, poll, cancel) with a per-key concurrency limit
+- Persistent brief cache (SQLite, TTL) keyed by prompt and model
+- Request coalescing: identical concurrent briefs share one model call
 - Free tier optimization
 - Comprehensive error handling with diagnostics
 
@@ -17,38 +20,223 @@ Author: InsightPro Team
 Version: 2.1
 """
 
-import google.generativeai as genai
+import hashlib
 import os
-import streamlit as st
+import pandas as pd
+import random
+import sqlite3
+import threading
 import time
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from contextlib import closing, contextmanager
+from engine import telemetry
 
-def get_supply_chain_brief(inventory_df, api_key):
+# --- Brief Cache ---
+# Successful briefs are stored on disk keyed by a hash of the model name and
+# the full prompt (which is built only from the inventory snapshot), so any
+# session asking about the same snapshot reuses the answer until it expires.
+BRIEF_CACHE_DB = "brief_cache.db"
+BRIEF_CACHE_TTL_SECONDS = 6 * 60 * 60
+
+# --- Prompt Budget ---
+PROMPT_TOKEN_BUDGET = 1200
+CHARS_PER_TOKEN = 4
+MAX_PROMPT_ITEMS = 10
+MAX_PROMPT_CATEGORIES = 8
+CRITICAL_RUNWAY_DAYS = 7
+
+MODEL_PRIORITY = ['gemini-2.5-flash', 'gemini-2.0-flash', 'gemini-1.5-flash', 'gemini-1.5-pro', 'gemini-1.0-pro', 'gemini-pro']
+DEFAULT_MODEL = 'gemini-2.5-flash'
+
+# --- Background Generation ---
+# Briefs are generated on a small worker pool so the Streamlit script thread
+# never waits on the model; rate-limit retries back off with full jitter
+# (uniform in [0, min(cap, base * 2**attempt)]) and are interruptible.
+BRIEF_WORKERS = 4
+BRIEF_MAX_CONCURRENT_PER_KEY = 2
+BRIEF_MAX_RETRIES = 3
+BACKOFF_BASE_SECONDS = 2.0
+BACKOFF_CAP_SECONDS = 20.0
+POLL_INTERVAL_SECONDS = 0.1
+
+_model_cache = {}      # api_key -> (model name, available models)
+_inflight = {}         # cache key -> Future of the brief being generated
+_inflight_lock = threading.Lock()
+_key_slots = {}        # api_key -> BoundedSemaphore limiting concurrent model calls
+_executor = None
+
+# google.generativeai takes seconds to import, so it is loaded on the first
+# brief rather than with the app; tests patch this attribute directly.
+genai = None
+
+def _genai():
+    """The google.generativeai module, imported on first use."""
+    global genai
+    if genai is None:
+        import google.generativeai
+        genai = google.generativeai
+    return genai
+
+# genai.configure() sets one process-wide API key, but briefs for every
+# session share the worker pool. Calls with the configured key run
+# concurrently; a different key waits until they finish, then reconfigures.
+_key_gate = threading.Condition()
+_configured_key = None
+_key_users = 0
+
+class BriefCancelled(Exception):
+    """Raised inside a worker when its brief job was cancelled."""
+
+def _connect_brief_cache():
+    conn = sqlite3.connect(BRIEF_CACHE_DB, timeout=30)
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS brief_cache (
+            cache_key TEXT PRIMARY KEY,
+            model_name TEXT NOT NULL,
+            response TEXT NOT NULL,
+            created_at REAL NOT NULL
+        )
+    ''')
+    return conn
+
+def brief_cache_key(prompt, model_name):
+    return hashlib.sha256(f"{model_name}\n{prompt}".encode()).hexdigest()
+
+def get_cached_brief(cache_key, ttl_seconds=None):
+    """Returns the cached brief for cache_key, or None if missing or older than the TTL."""
+    ttl = BRIEF_CACHE_TTL_SECONDS if ttl_seconds is None else ttl_seconds
+    with closing(_connect_brief_cache()) as conn:
+        row = conn.execute(
+            "SELECT response FROM brief_cache WHERE cache_key = ? AND created_at >= ?",
+            (cache_key, time.time() - ttl)
+        ).fetchone()
+    return row[0] if row else None
+
+def store_brief(cache_key, model_name, response):
+    """Stores a brief and drops entries that have outlived the TTL."""
+    now = time.time()
+    with closing(_connect_brief_cache()) as conn, conn:
+        conn.execute("DELETE FROM brief_cache WHERE created_at < ?", (now - BRIEF_CACHE_TTL_SECONDS,))
+        conn.execute(
+            "INSERT OR REPLACE INTO brief_cache (cache_key, model_name, response, created_at) VALUES (?, ?, ?, ?)",
+            (cache_key, model_name, response, now)
+        )
+
+def clear_brief_cache():
+    """Empties the on-disk brief cache and the per-process model discovery cache."""
+    _model_cache.clear()
+    with closing(_connect_brief_cache()) as conn, conn:
+        conn.execute("DELETE FROM brief_cache")
+
+def estimate_tokens(text):
+    """Rough token count for Gemini prompts (about four characters per token)."""
+    return -(-len(text) // CHARS_PER_TOKEN)
+
+def _first_column(df, names):
+    return next((name for name in names if name in df.columns), None)
+
+def _format_item(row, burn_col, runway_col):
+    line = f"- {row['product_name']}: stock {row['current_stock']:,.0f} / reorder {row['reorder_point']:,.0f}, cost ${row['unit_cost']:,.2f}"
+    if burn_col:
+        line += f", burn {row[burn_col]:.1f}/day"
+    if runway_col:
+        line += f", runway {row[runway_col]:.1f} days"
+    return line
+
+def _category_lines(inventory_df, value, at_risk, burn_col):
+    """One line per category, most capital at risk first; the tail is rolled up."""
+    category = inventory_df['category']
+    if isinstance(category.dtype, pd.CategoricalDtype) and 'Uncategorized' not in category.cat.categories:
+        category = category.cat.add_categories('Uncategorized')
+    grouped = pd.DataFrame({
+        'category': category.fillna('Uncategorized'),
+        'value': value,
+        'at_risk': at_risk,
+        'risk_value': value.where(at_risk, 0.0),
+        'burn': inventory_df[burn_col] if burn_col else 0.0,
+    }).groupby('category', sort=False, observed=True).agg(
+        skus=('value', 'size'), value=('value', 'sum'), at_risk=('at_risk', 'sum'),
+        risk_value=('risk_value', 'sum'), burn=('burn', 'sum'),
+    )
+    top = grouped.nlargest(MAX_PROMPT_CATEGORIES, ['risk_value', 'value'])
+    lines = [
+        f"- {row.Index}: {row.skus:,} SKUs, ${row.value:,.0f} value, {row.at_risk:,} at risk (${row.risk_value:,.0f})"
+        + (f", burn {row.burn:,.1f}/day" if burn_col else "")
+        for row in top.itertuples()
+    ]
+    rest = grouped.drop(top.index)
+    if len(rest):
+        lines.append(f"- {len(rest):,} other categories: {rest['skus'].sum():,} SKUs, ${rest['value'].sum():,.0f} value, "
+                     f"{rest['at_risk'].sum():,} at risk")
+    return lines
+
+@telemetry.instrumented("ai.build_brief_prompt")
+def build_brief_prompt(inventory_df, token_budget=PROMPT_TOKEN_BUDGET):
     """
-    Generates a comprehensive, AI-powered supply chain brief with detailed analysis.
-    Uses advanced prompting for rich, actionable insights.
+    Builds the Gemini prompt for an inventory snapshot within token_budget.
+
+    The caller's frame is never modified. Critical items are picked with a
+    partial selection (nsmallest) on the forecast runway when the frame has
+    one (app.py's 'Runway' or ml_logic's 'days_to_stockout'), otherwise on
+    stock / reorder point. Per-category aggregates summarise the rest of the
+    catalog, so the prompt stays the same size however many SKUs there are.
+    Item and category lines are dropped from the end until the estimate fits.
     """
-    if not api_key:
-        return "🔒 **AI Insights Locked**: Please enter your API Key in the sidebar."
-        
-    genai.configure(api_key=api_key)
-    
+    burn_col = _first_column(inventory_df, ['Burn Rate', 'burn_rate'])
+    runway_col = _first_column(inventory_df, ['Runway', 'days_to_stockout'])
+
     # 1. Enhanced Data Analysis
-    inventory_df['stock_ratio'] = inventory_df['current_stock'] / inventory_df['reorder_point']
-    critical_items = inventory_df.sort_values('stock_ratio').head(10)
+    stock, reorder, cost = (pd.to_numeric(inventory_df[col], errors='coerce')
+                            for col in ['current_stock', 'reorder_point', 'unit_cost'])
+    stock_ratio = stock / reorder
+    value = stock * cost
+    if runway_col:
+        runway = pd.to_numeric(inventory_df[runway_col], errors='coerce')
+        ranked = runway.where(runway >= 0)
+        at_risk = ranked < CRITICAL_RUNWAY_DAYS
+    else:
+        ranked = stock_ratio
+        at_risk = stock < reorder
+    critical_index = ranked.dropna().nsmallest(MAX_PROMPT_ITEMS).index
+    critical_items = inventory_df.loc[critical_index]
     
     # Calculate additional metrics for richer context
-    total_inventory_value = (inventory_df['current_stock'] * inventory_df['unit_cost']).sum()
-    critical_value = (critical_items['current_stock'] * critical_items['unit_cost']).sum()
-    avg_stock_ratio = inventory_df['stock_ratio'].mean()
-    
-    data_summary = critical_items[['product_name', 'current_stock', 'reorder_point', 'unit_cost']].to_string(index=False)
-    
-    prompt = f"""You are a Senior Supply Chain Strategy Advisor with expertise in inventory optimization and procurement planning.
+    total_inventory_value = value.sum()
+    critical_value = value.loc[critical_index].sum()
+    avg_stock_ratio = stock_ratio.mean() if len(stock_ratio) else 0.0
 
-INVENTORY ANALYSIS DATA:
+    item_lines = [_format_item(row, burn_col, runway_col) for _, row in critical_items.iterrows()]
+    category_lines = (_category_lines(inventory_df, value, at_risk, burn_col)
+                      if 'category' in inventory_df.columns else [])
+    catalog_line = f"- Catalog Size: {len(inventory_df):,} SKUs, {int(at_risk.sum()):,} at risk"
+
+    while True:
+        prompt = _render_prompt(
+            "\n".join(item_lines) or "- (no items)", "\n".join(category_lines) or "- (not available)",
+            total_inventory_value, critical_value, avg_stock_ratio, catalog_line
+        )
+        if estimate_tokens(prompt) <= token_budget or not (item_lines or category_lines):
+            telemetry.annotate(rows=len(inventory_df), tokens=estimate_tokens(prompt))
+            return prompt
+        # Shed the least important detail first: trailing categories, then items
+        if len(category_lines) > len(item_lines) // 2 and category_lines:
+            category_lines.pop()
+        elif item_lines:
+            item_lines.pop()
+        else:
+            category_lines.pop()
+
+def _render_prompt(data_summary, category_summary, total_inventory_value, critical_value, avg_stock_ratio, catalog_line):
+    return f"""You are a Senior Supply Chain Strategy Advisor with expertise in inventory optimization and procurement planning.
+
+INVENTORY ANALYSIS DATA (most urgent items):
 {data_summary}
 
+CATEGORY SUMMARY:
+{category_summary}
+
 CONTEXT METRICS:
+{catalog_line}
 - Total Inventory Value: ${total_inventory_value:,.2f}
 - Critical Items Value at Risk: ${critical_value:,.2f}
 - Average Stock Health Ratio: {avg_stock_ratio:.2f}x
@@ -67,23 +255,36 @@ FORMATTING REQUIREMENTS:
 - Keep tone professional but conversational
 - Maximum 200 words total
 - Focus on value-creation, not just warnings"""
-    
-    # 2. Dynamic Model Discovery (Fail-Safe) - Prioritize Free Tier Models
-    valid_model_name = 'gemini-2.5-flash' # Default fallback - FREE TIER with generous quotas
+
+@telemetry.instrumented("ai.discover_model")
+def discover_model(api_key):
+    """
+    Picks the best available generateContent model for api_key.
+
+    The listing is cached per process and key; failed listings are not
+    cached, so the next request tries again.
+
+    Returns:
+        tuple: (model name, list of available model names or None if listing failed)
+    """
+    if api_key in _model_cache:
+        return _model_cache[api_key]
+
+    # Dynamic Model Discovery (Fail-Safe) - Prioritize Free Tier Models
+    valid_model_name = DEFAULT_MODEL # Default fallback - FREE TIER with generous quotas
     
     try:
         # Attempt to list models to find the best available one
         available_models = []
-        for m in genai.list_models():
-            if 'generateContent' in m.supported_generation_methods:
-                available_models.append(m.name)
+        with _using_key(api_key):
+            for m in _genai().list_models():
+                if 'generateContent' in m.supported_generation_methods:
+                    available_models.append(m.name)
         
         # Priority Strategy: Prefer 2.5-Flash (free tier) > 2.0-Flash > Others
         # 2.5-Flash has the most generous free tier quotas
-        model_priority = ['gemini-2.5-flash', 'gemini-2.0-flash', 'gemini-1.5-flash', 'gemini-1.5-pro', 'gemini-1.0-pro', 'gemini-pro']
-        
         found_priority = False
-        for priority in model_priority:
+        for priority in MODEL_PRIORITY:
             for avail in available_models:
                 if priority in avail:
                     valid_model_name = avail
@@ -96,36 +297,224 @@ FORMATTING REQUIREMENTS:
         # If listing models fails (e.g. strict permission scopes), we shouldn't crash.
         # We just silently fall back to trying the default 'gemini-2.5-flash' blindly.
         print(f"Model discovery warning: {e}")
-        # We don't return here, we proceed to try generation with the default valid_model_name
-    
-    # 3. Generate Content with the chosen model - with retry logic
-    max_retries = 2
-    retry_count = 0
+        return valid_model_name, None
+
+    _model_cache[api_key] = (valid_model_name, available_models)
+    return valid_model_name, available_models
+
+def _backoff_delay(attempt):
+    """Full-jitter exponential backoff, bounded by BACKOFF_CAP_SECONDS."""
+    return random.uniform(0, min(BACKOFF_CAP_SECONDS, BACKOFF_BASE_SECONDS * 2 ** attempt))
+
+@contextmanager
+def _using_key(api_key, cancel_event=None):
+    """Holds the process-wide genai key at api_key for the duration of a call."""
+    global _configured_key, _key_users
+    with _key_gate:
+        while _key_users and _configured_key != api_key:
+            _key_gate.wait(POLL_INTERVAL_SECONDS)
+            if cancel_event is not None and cancel_event.is_set():
+                raise BriefCancelled()
+        if not _key_users:
+            _genai().configure(api_key=api_key)
+            _configured_key = api_key
+        _key_users += 1
+    try:
+        yield
+    finally:
+        with _key_gate:
+            _key_users -= 1
+            _key_gate.notify_all()
+
+def _key_slot(api_key):
+    with _inflight_lock:
+        if api_key not in _key_slots:
+            _key_slots[api_key] = threading.BoundedSemaphore(BRIEF_MAX_CONCURRENT_PER_KEY)
+        return _key_slots[api_key]
+
+@telemetry.instrumented("ai.generate_content")
+def _generate_brief(prompt, model_name, api_key, available_models, cancel_event=None):
+    """
+    Calls the model with jittered retry on rate limits.
+
+    At most BRIEF_MAX_CONCURRENT_PER_KEY calls run per API key. Waiting for a
+    slot or a backoff delay returns early with BriefCancelled once
+    cancel_event is set.
+
+    Returns:
+        tuple: (markdown text, True if it is a real brief worth caching)
+    """
+    cancel_event = cancel_event or threading.Event()
+    slot = _key_slot(api_key)
     
-    while retry_count < max_retries:
+    for attempt in range(BRIEF_MAX_RETRIES):
+        while not slot.acquire(timeout=POLL_INTERVAL_SECONDS):
+            if cancel_event.is_set():
+                raise BriefCancelled()
         try:
-            model = genai.GenerativeModel(valid_model_name)
-            response = model.generate_content(prompt)
-            return response.text
+            if cancel_event.is_set():
+                raise BriefCancelled()
+            with _using_key(api_key, cancel_event):
+                model = _genai().GenerativeModel(model_name)
+                response = model.generate_content(prompt)
+            return response.text, True
+        except BriefCancelled:
+            raise
         except Exception as e:
             error_str = str(e)
             # Check if it's a quota/rate limit error (429)
-            if '429' in error_str or 'quota' in error_str.lower():
-                retry_count += 1
-                if retry_count < max_retries:
-                    wait_time = 3 ** retry_count  # Exponential backoff: 3s, then 9s
-                    print(f"Rate limited. Retrying in {wait_time}s... (Attempt {retry_count}/{max_retries})")
-                    time.sleep(wait_time)
-                    continue
+            if ('429' in error_str or 'quota' in error_str.lower()) and attempt + 1 < BRIEF_MAX_RETRIES:
+                wait_time = _backoff_delay(attempt)
+                print(f"Rate limited. Retrying in {wait_time:.1f}s... (Attempt {attempt + 1}/{BRIEF_MAX_RETRIES})")
+                error = None
+            else:
+                error = e
+        finally:
+            slot.release()
+
+        if error is None:
+            # Sleep outside the slot so other briefs for this key can proceed
+            if cancel_event.wait(wait_time):
+                raise BriefCancelled()
+            continue
             
-            # If we get here, it's a non-recoverable error or we've exhausted retries
-            debug_info = f"""
+        # If we get here, it's a non-recoverable error or we've exhausted retries
+        debug_info = f"""
         **Debug Diagnostics:**
         - **API Key Status**: {'Set' if api_key else 'Missing'} (Ends with: ...{api_key[-4:] if api_key else 'N/A'})
-        - **Selected Model**: {valid_model_name}
-        - **Available Models**: {available_models if 'available_models' in locals() else 'Could not list'}
-        - **Error Detail**: {str(e)}
+        - **Selected Model**: {model_name}
+        - **Available Models**: {available_models if available_models is not None else 'Could not list'}
+        - **Error Detail**: {str(error)}
         """
-            return f"⚠️ **Generation Failed**: {str(e)} \n\n {debug_info}"
+        return f"⚠️ **Generation Failed**: {str(error)} \n\n {debug_info}", False
     
-    return "⚠️ **Generation Failed**: Quota exceeded after retries. Please try again later or upgrade your API plan."
+    return "⚠️ **Generation Failed**: Quota exceeded after retries. Please try again later or upgrade your API plan.", False
+
+@telemetry.instrumented("ai.brief_for_prompt")
+def _brief_for_prompt(prompt, api_key, use_cache=True, cancel_event=None):
+    """Model discovery, cache lookup, coalescing and generation for a built prompt."""
+    cancel_event = cancel_event or threading.Event()
+    model_name, available_models = discover_model(api_key)
+    if not use_cache:
+        return _generate_brief(prompt, model_name, api_key, available_models, cancel_event)[0]
+
+    cache_key = brief_cache_key(prompt, model_name)
+    while True:
+        cached = get_cached_brief(cache_key)
+        if cached is not None:
+            telemetry.annotate(cache='hit')
+            return cached
+
+        with _inflight_lock:
+            future = _inflight.get(cache_key)
+            owner = future is None
+            if owner:
+                future = _inflight[cache_key] = Future()
+        if owner:
+            break
+
+        # Someone else is generating this brief: wait for it, but stay cancellable
+        while not wait([future], timeout=POLL_INTERVAL_SECONDS).done:
+            if cancel_event.is_set():
+                raise BriefCancelled()
+        try:
+            text = future.result()
+            telemetry.annotate(cache='coalesced')
+            return text
+        except BriefCancelled:
+            continue  # that request was cancelled, not this one; try again
+
+    try:
+        # Another request may have stored it between the lookup and the lock
+        text = get_cached_brief(cache_key)
+        telemetry.annotate(cache='hit' if text is not None else 'miss')
+        if text is None:
+            text, ok = _generate_brief(prompt, model_name, api_key, available_models, cancel_event)
+            if ok:
+                store_brief(cache_key, model_name, text)
+        future.set_result(text)
+        return text
+    except BaseException as e:
+        future.set_exception(e)
+        raise
+    finally:
+        with _inflight_lock:
+            _inflight.pop(cache_key, None)
+
+@telemetry.instrumented("ai.get_supply_chain_brief")
+def get_supply_chain_brief(inventory_df, api_key, use_cache=True):
+    """
+    Generates a comprehensive, AI-powered supply chain brief with detailed analysis.
+    Uses advanced prompting for rich, actionable insights.
+
+    Identical requests (same prompt and model) are answered from the brief
+    cache while fresh, and concurrent identical requests wait on a single
+    in-flight model call instead of each calling the API.
+
+    This call blocks until the brief is ready; the dashboard uses
+    submit_supply_chain_brief instead.
+    """
+    if not api_key:
+        return "🔒 **AI Insights Locked**: Please enter your API Key in the sidebar."
+        
+    return _brief_for_prompt(build_brief_prompt(inventory_df), api_key, use_cache)
+
+class BriefJob:
+    """
+    Handle to a brief generating in the background.
+
+    Poll done() / result() from the script thread; neither blocks.
+    """
+
+    def __init__(self, future, cancel_event):
+        self._future = future
+        self._cancel_event = cancel_event
+
+    def done(self):
+        return self._future.done()
+
+    @property
+    def cancelled(self):
+        return self._cancel_event.is_set()
+
+    def cancel(self):
+        """Stops the job: before it starts, while it waits for a slot, or between retries."""
+        self._cancel_event.set()
+        self._future.cancel()
+
+    def result(self):
+        """Returns the brief markdown, or None while the job is still running."""
+        if self.cancelled:
+            return "⏹️ **Brief cancelled.**"
+        if not self._future.done():
+            return None
+        try:
+            return self._future.result()
+        except BriefCancelled:
+            return "⏹️ **Brief cancelled.**"
+        except Exception as e:
+            return f"⚠️ **Generation Failed**: {str(e)}"
+
+def _get_executor():
+    global _executor
+    with _inflight_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=BRIEF_WORKERS, thread_name_prefix="brief")
+        return _executor
+
+def submit_supply_chain_brief(inventory_df, api_key, use_cache=True):
+    """
+    Starts generating a brief in the background and returns a BriefJob at once.
+
+    The prompt is built from inventory_df before returning, so later edits to
+    the frame do not change the request.
+    """
+    cancel_event = threading.Event()
+    if not api_key:
+        future = Future()
+        future.set_result(get_supply_chain_brief(inventory_df, api_key))
+        return BriefJob(future, cancel_event)
+
+    prompt = build_brief_prompt(inventory_df)
+    future = _get_executor().submit(_brief_for_prompt, prompt, api_key, use_cache, cancel_event)
+    return BriefJob(future, cancel_event)
@@ -23,11 +23,12 @@ Last Updated: January 22, 2026
 """
 
 import streamlit as st
+import numpy as np
 import pandas as pd
-import plotly.express as px
-from engine import db_manager, ml_logic
+from engine import alerts, db_manager, ml_logic, telemetry
 import api_bridge
 import os
+import uuid
 from dotenv import load_dotenv
 
 # Load env immediately
@@ -47,10 +48,84 @@ def local_css(file_name):
 
 local_css("style.css")
 
+# Hidden profiling panel: ?profile=1 profiles this session's reruns only;
+# INSIGHTPRO_PROFILE=1 profiles every session and shows the panel to all
+show_profiler = st.query_params.get("profile") == "1" or telemetry.is_enabled()
+# Runs are tagged so the panel lists this session's reruns, not other visitors'
+profile_session = st.session_state.setdefault("profile_session", uuid.uuid4().hex)
+telemetry.begin_run("rerun", profile=show_profiler, session=profile_session)
+
 # --- Logic Initialization ---
 db_manager.init_db()
-inventory_df = db_manager.get_inventory_df()
-sales_df = db_manager.get_sales_df()
+# Landing-view numbers come precomputed from the database (refits only products with new sales)
+db_manager.refresh_dashboard_metrics()
+summary = db_manager.get_dashboard_summary()
+
+@st.cache_resource
+def get_forecast_cache():
+    """One forecast cache per server process, shared by every session."""
+    return ml_logic.ForecastCache()
+
+forecast_cache = get_forecast_cache()
+
+@st.cache_resource
+def get_alert_evaluator():
+    """One background alert evaluator per server process (woken by stock edits and ingested sales)."""
+    return alerts.AlertEvaluator().start()
+
+get_alert_evaluator()
+
+# Catalogs larger than this default to the paginated, SQL-backed asset grid
+GRID_PAGINATION_THRESHOLD = 500
+GRID_PAGE_SIZE = 50
+
+def add_forecast_columns(df, forecast):
+    """Adds the Burn Rate / Runway / Status grid columns from an ml_logic forecast."""
+    df['Burn Rate'] = forecast['burn_rate']
+    df['Runway'] = forecast['days_to_stockout']
+    # Smart Status Logic
+    df['Status'] = np.select(
+        [forecast['days_to_stockout'] < 7, forecast['days_to_stockout'] < 30],
+        ["🔴 Critical", "🟡 Warning"],
+        default="🟢 Healthy"
+    )
+    return df
+
+def forecast_page(page_df):
+    """
+    Forecast for a page of the grid: rows with a current batch forecast
+    (engine.batch_forecast) are read from the forecasts table, the rest are
+    fitted live from the sales rollup.
+    """
+    stored = db_manager.get_fresh_forecasts(page_df['id'].tolist()).set_index('product_id')
+    stored = stored.reindex(page_df['id']).set_axis(page_df.index)
+    forecast = pd.DataFrame({
+        'burn_rate': stored['burn_rate'],
+        'days_to_stockout': stored['days_to_stockout'].fillna(np.inf),
+        'status': stored['status'],
+    })
+    live = stored['run_id'].isna()
+    if live.any():
+        live_df = page_df[live]
+        page_stats = db_manager.get_sales_stats(product_ids=live_df['id'].tolist())
+        forecast.loc[live] = ml_logic.forecast_from_stats(live_df, page_stats)
+    return forecast
+
+def full_inventory():
+    """
+    The whole catalog with forecast columns, for the unpaginated grid and
+    full-catalog features (AI brief, memory report). Paginated reruns never
+    call this, so their cost does not grow with the catalog.
+    """
+    inventory_df = db_manager.get_inventory_df()
+    # ML Logic (batched, memoized across reruns; only changed products are refitted)
+    forecast = forecast_cache.forecast(
+        inventory_df,
+        db_manager.get_sales_high_water_mark(),
+        load_stats=lambda product_ids: db_manager.get_sales_stats(product_ids=product_ids),
+        sold_since=db_manager.get_products_sold_since
+    )
+    return add_forecast_columns(inventory_df, forecast)
 
 # --- Top Header & Settings ---
 # We use columns to put settings in top right
@@ -84,10 +159,16 @@ with col_settings:
             st.session_state["api_key"] = api_key_input.strip()
             
         st.divider()
+        cache_stats = forecast_cache.stats()
+        st.caption(f"Forecast cache: {cache_stats['hits']:,} hits / {cache_stats['misses']:,} misses")
+        last_run = db_manager.get_last_forecast_run()
+        if last_run:
+            st.caption(f"Last batch forecast: run #{last_run['run_id']} ({last_run['mode']}, "
+                       f"{last_run['products']:,} products) at {last_run['finished_at']} UTC")
         st.caption(f"v2.1 SaaS Edition")
 
 # --- Hero Section (SaaS Gradient) ---
-critical_restocks = len(inventory_df[inventory_df['current_stock'] < inventory_df['reorder_point']])
+critical_restocks = summary['below_reorder_count']
 
 st.markdown(f"""
     <div class="hero-container">
@@ -111,65 +192,54 @@ with col_side:
     st.caption("Import custom inventory data or use generated mock data")
     uploaded_file = st.file_uploader("Upload Inventory (CSV/Excel)", type=["csv", "xlsx"])
     
-    if uploaded_file:
+    # Streamlit keeps the upload across reruns, so import each file only once
+    if uploaded_file and st.session_state.get("imported_upload") != uploaded_file.file_id:
+        st.session_state["imported_upload"] = uploaded_file.file_id
+        progress_bar = st.progress(0.0, text="Importing inventory...")
         try:
-            if uploaded_file.name.endswith('.csv'):
-                custom_df = pd.read_csv(uploaded_file)
-            else:
-                custom_df = pd.read_excel(uploaded_file)
-            
-            # Validation
-            required = {'product_name', 'current_stock', 'reorder_point'}
-            if not required.issubset(custom_df.columns):
-                st.error(f"Missing columns: {required - set(custom_df.columns)}")
-            else:
-                # Normalize & Default Values
-                if 'unit_cost' not in custom_df: custom_df['unit_cost'] = 0.0
-                if 'selling_price' not in custom_df: custom_df['selling_price'] = 0.0
-                if 'category' not in custom_df: custom_df['category'] = 'Uncategorized'
-                if 'id' not in custom_df: custom_df['id'] = range(1, len(custom_df) + 1)
-                
-                # Replace Global Data
-                inventory_df = custom_df
-                # For custom data, we don't have sales history linked, so ML will return "No Data"
-                sales_df = pd.DataFrame(columns=['product_id', 'sale_date', 'quantity_sold']) 
-                st.success("Custom Data Loaded")
-                
+            result = db_manager.import_inventory(
+                uploaded_file,
+                uploaded_file.name,
+                progress=lambda rows, fraction: progress_bar.progress(
+                    fraction if fraction is not None else 0.0,
+                    text=f"Imported {rows:,} rows..."
+                )
+            )
         except Exception as e:
-            st.error(f"Error: {e}")
+            progress_bar.empty()
+            st.error(f"Import failed: {e}")
+        else:
+            st.toast(f"Imported {result['rows']:,} rows ({result['inserted']:,} new, {result['updated']:,} updated).", icon="📂")
+            st.rerun()
             
     st.markdown('</div>', unsafe_allow_html=True)
 
+    # --- Stockout Alerts (kept current by the background evaluator) ---
+    st.markdown('<div class="card-container" style="padding: 20px;">', unsafe_allow_html=True)
+    st.markdown("#### 🚨 Alerts")
+    critical = db_manager.get_alerted_products('Critical', limit=5)
+    if critical.empty:
+        st.caption("No products are critical.")
+    for row in critical.itertuples(index=False):
+        st.markdown(f"**{row.product_name}**: {row.runway:.1f} days of stock left")
+    recent = db_manager.get_alerts(limit=5)
+    if not recent.empty:
+        st.caption("Recent level changes")
+        st.dataframe(
+            recent[['created_at', 'product_name', 'from_status', 'to_status', 'runway']],
+            hide_index=True, use_container_width=True
+        )
+    st.markdown('</div>', unsafe_allow_html=True)
+
 with col_main:
     # --- Asset Grid (Card Style) ---
     st.markdown('<div class="card-container">', unsafe_allow_html=True)
     st.markdown("#### 📋 Inventory Asset Grid")
     st.caption("📌 Edit stock levels directly. Real-time ML metrics auto-calculate below.")
-    
-    # ML Logic Loop
-    burn_rates = []
-    days_rem = []
-    status_list = []
-    
-    for _, row in inventory_df.iterrows():
-        ml_res = ml_logic.calculate_burn_rate_and_stockout(row, sales_df)
-        burn_rates.append(ml_res['burn_rate'])
-        days_rem.append(ml_res['days_to_stockout'])
-        # Smart Status Logic
-        if ml_res['days_to_stockout'] < 7:
-            status_list.append("🔴 Critical") 
-        elif ml_res['days_to_stockout'] < 30:
-            status_list.append("🟡 Warning")
-        else:
-            status_list.append("🟢 Healthy")
-            
-    inventory_df['Burn Rate'] = burn_rates
-    inventory_df['Runway'] = days_rem
-    inventory_df['Status'] = status_list
 
     # Add summary metrics
-    critical_count = len(inventory_df[inventory_df['Status'] == "🔴 Critical"])
-    warning_count = len(inventory_df[inventory_df['Status'] == "🟡 Warning"])
+    critical_count = summary['critical_count']
+    warning_count = summary['warning_count']
     
     # Summary Cards
     col_crit, col_warn, col_value = st.columns(3)
@@ -178,44 +248,86 @@ with col_main:
     with col_warn:
         st.metric("🟡 Warning Items", warning_count, delta="monitor closely", delta_color="off")
     with col_value:
-        total_inv_value = (inventory_df['current_stock'] * inventory_df['unit_cost']).sum()
-        st.metric("💰 Total Inventory Value", f"${total_inv_value:,.0f}", delta="at risk:", delta_color="off")
+        total_inv_value = summary['total_value']
+        st.metric("💰 Total Inventory Value", f"${total_inv_value:,.0f}", delta=f"at risk: ${summary['value_at_risk']:,.0f}", delta_color="off")
 
     st.markdown("<div style='height: 8px;'></div>", unsafe_allow_html=True)
 
-    edited_df = st.data_editor(
-        inventory_df,
-        column_config={
-            "current_stock": st.column_config.NumberColumn(
-                "Stock (Units)",
-                min_value=0,
-                step=1,
-                format="%d"
-            ),
-            "Burn Rate": st.column_config.NumberColumn(
-                "Burn Rate",
-                format="%.1f / day"
-            ),
-            "Runway": st.column_config.NumberColumn(
-                "Runway",
-                format="%.1f days"
-            ),
-            "Status": st.column_config.TextColumn(
-                "Health",
-                width="small"
-            )
-        },
-        disabled=["id", "Burn Rate", "Runway", "Status", "product_name", "category", "unit_cost", "selling_price", "reorder_point"],
-        hide_index=True,
-        width='stretch',
-        height=450,
-        key="data_editor"
-    )
+    paginated = st.toggle("Paginated grid", value=summary['products'] > GRID_PAGINATION_THRESHOLD,
+                          help="Load one page at a time, filtered and sorted in the database")
+    if paginated:
+        col_search, col_category, col_sort, col_filter = st.columns([3, 2, 2, 1.5])
+        with col_search:
+            search = st.text_input("Search products", key="grid_search", placeholder="Product name...")
+        with col_category:
+            category = st.selectbox("Category", ["All"] + db_manager.get_inventory_categories(), key="grid_category")
+        with col_sort:
+            sort_by = st.selectbox("Sort by", db_manager.INVENTORY_SORT_COLUMNS, key="grid_sort")
+        with col_filter:
+            descending = st.checkbox("Descending", key="grid_desc")
+            below_reorder = st.checkbox("Below reorder", key="grid_below_reorder")
+        query = dict(search=search.strip() or None, category=None if category == "All" else category,
+                     below_reorder=below_reorder, sort_by=sort_by, descending=descending)
+
+        # Start from the first page whenever the query changes
+        if st.session_state.get("grid_query") != query:
+            st.session_state["grid_query"] = query
+            st.session_state["grid_page"] = 1
+        page = st.session_state.get("grid_page", 1)
+        grid_df, total_rows = db_manager.get_inventory_page(page=page - 1, page_size=GRID_PAGE_SIZE, **query)
+        page_count = max(1, -(-total_rows // GRID_PAGE_SIZE))
+        if page > page_count:
+            # The catalog shrank under us (e.g. a re-import); show the last page
+            st.session_state["grid_page"] = page = page_count
+            grid_df, total_rows = db_manager.get_inventory_page(page=page - 1, page_size=GRID_PAGE_SIZE, **query)
+        col_page, col_count = st.columns([1, 3], vertical_alignment="bottom")
+        with col_page:
+            st.number_input("Page", min_value=1, max_value=page_count, step=1, key="grid_page")
+        with col_count:
+            st.caption(f"Page {page:,} of {page_count:,} · {total_rows:,} products")
+
+        # Forecast just the visible rows, reusing current batch forecasts where there are any
+        add_forecast_columns(grid_df, forecast_page(grid_df))
+        # A fresh editor per page/query so pending edits never leak onto other rows
+        editor_key = f"data_editor_{page}_{abs(hash(tuple(query.items())))}"
+    else:
+        grid_df = full_inventory()
+        editor_key = "data_editor"
+
+    with telemetry.stage("app.data_editor", rows=len(grid_df)):
+        edited_df = st.data_editor(
+            grid_df,
+            column_config={
+                "current_stock": st.column_config.NumberColumn(
+                    "Stock (Units)",
+                    min_value=0,
+                    step=1,
+                    format="%d"
+                ),
+                "Burn Rate": st.column_config.NumberColumn(
+                    "Burn Rate",
+                    format="%.1f / day"
+                ),
+                "Runway": st.column_config.NumberColumn(
+                    "Runway",
+                    format="%.1f days"
+                ),
+                "Status": st.column_config.TextColumn(
+                    "Health",
+                    width="small"
+                )
+            },
+            disabled=["id", "Burn Rate", "Runway", "Status", "product_name", "category", "unit_cost", "selling_price", "reorder_point"],
+            hide_index=True,
+            width='stretch',
+            height=450,
+            key=editor_key
+        )
     
-    # Save Logic
-    if not inventory_df['current_stock'].equals(edited_df['current_stock']):
-        db_manager.update_stock_batch(edited_df)
-        st.toast("Stock levels updated.", icon="💾")
+    # Save Logic (only the rows shown in the grid are compared and written)
+    if not grid_df['current_stock'].equals(edited_df['current_stock']):
+        updated = db_manager.update_stock_batch(edited_df)
+        st.toast(f"{updated} stock level(s) updated.", icon="💾")
         st.rerun()
 
     st.markdown('</div>', unsafe_allow_html=True) # End Card
@@ -224,29 +336,32 @@ with col_main:
     st.markdown('<div class="card-container">', unsafe_allow_html=True)
     st.markdown("#### � Top 8 Burn Rate Analysis")
     
-    chart_df = inventory_df.sort_values(by="Burn Rate", ascending=False).head(8)
-    fig = px.bar(
-        chart_df,
-        x='product_name',
-        y='Burn Rate',
-        color='Runway',
-        title="",
-        color_continuous_scale=["#E63946", "#F59E0B", "#10B981"],
-        template="plotly_white",
-        labels={'Burn Rate': 'Daily Burn Rate (units/day)', 'product_name': 'Product'},
-    )
-    fig.update_layout(
-        plot_bgcolor='rgba(245, 247, 250, 0.5)',
-        paper_bgcolor='white',
-        font={'family': "Inter", 'color': "#1A1F2C", 'size': 11},
-        margin=dict(t=20, l=50, r=20, b=50),
-        height=350,
-        xaxis_tickangle=-45,
-        hovermode='x unified',
-        coloraxis_colorbar=dict(title="Runway<br>(days)")
-    )
-    fig.update_traces(marker_line_color='rgba(0, 45, 91, 0.2)', marker_line_width=1)
-    st.plotly_chart(fig, use_container_width=True)
+    chart_df = summary['top_burn']
+    with telemetry.stage("app.chart", rows=len(chart_df)):
+        # Deferred so the grid above renders before plotly loads
+        import plotly.express as px
+        fig = px.bar(
+            chart_df,
+            x='product_name',
+            y='Burn Rate',
+            color='Runway',
+            title="",
+            color_continuous_scale=["#E63946", "#F59E0B", "#10B981"],
+            template="plotly_white",
+            labels={'Burn Rate': 'Daily Burn Rate (units/day)', 'product_name': 'Product'},
+        )
+        fig.update_layout(
+            plot_bgcolor='rgba(245, 247, 250, 0.5)',
+            paper_bgcolor='white',
+            font={'family': "Inter", 'color': "#1A1F2C", 'size': 11},
+            margin=dict(t=20, l=50, r=20, b=50),
+            height=350,
+            xaxis_tickangle=-45,
+            hovermode='x unified',
+            coloraxis_colorbar=dict(title="Runway<br>(days)")
+        )
+        fig.update_traces(marker_line_color='rgba(0, 45, 91, 0.2)', marker_line_width=1)
+        st.plotly_chart(fig, use_container_width=True)
     st.markdown('</div>', unsafe_allow_html=True)
 
 
@@ -263,21 +378,67 @@ with col_side:
     """, unsafe_allow_html=True)
     
     if st.button("🚀 Generate AI Brief", use_container_width=True, key="ai_brief_btn"):
-        api_key = st.session_state.get("api_key")
-        with st.spinner("🔄 Analyzing your inventory patterns..."):
-            advice = api_bridge.get_supply_chain_brief(edited_df, api_key)
-            st.markdown(f"""
-                <div style="
-                    margin-top: 20px; 
-                    font-size: 0.95rem; 
-                    line-height: 1.7;
-                    padding: 16px;
-                    background: linear-gradient(135deg, rgba(0, 174, 239, 0.05) 0%, rgba(0, 150, 136, 0.05) 100%);
-                    border-left: 4px solid var(--accent-cyan);
-                    border-radius: 8px;
-                ">
-                    {advice}
-                </div>
-            """, unsafe_allow_html=True)
+        previous_job = st.session_state.get("brief_job")
+        if previous_job is not None and not previous_job.done():
+            previous_job.cancel()
+        # Runs on a background worker; the script thread only polls the handle
+        st.session_state["brief_job"] = api_bridge.submit_supply_chain_brief(
+            full_inventory() if paginated else grid_df, st.session_state.get("api_key")
+        )
+
+    brief_job = st.session_state.get("brief_job")
+
+    # Poll once a second only while a job is pending
+    @st.fragment(run_every=1 if brief_job is not None and not brief_job.done() else None)
+    def render_brief():
+        job = st.session_state.get("brief_job")
+        if job is None:
+            return
+        advice = job.result()
+        if advice is None:
+            st.info("🔄 Analyzing your inventory patterns...")
+            if st.button("Cancel", key="ai_brief_cancel"):
+                job.cancel()
+                st.rerun(scope="fragment")
+            return
+        st.markdown(f"""
+            <div style="
+                margin-top: 20px; 
+                font-size: 0.95rem; 
+                line-height: 1.7;
+                padding: 16px;
+                background: linear-gradient(135deg, rgba(0, 174, 239, 0.05) 0%, rgba(0, 150, 136, 0.05) 100%);
+                border-left: 4px solid var(--accent-cyan);
+                border-radius: 8px;
+            ">
+                {advice}
+            </div>
+        """, unsafe_allow_html=True)
+
+    render_brief()
             
     st.markdown('</div>', unsafe_allow_html=True) # End AI Glass
+
+telemetry.end_run()
+
+# --- Profiling Panel (hidden unless ?profile=1) ---
+if show_profiler:
+    with st.expander("⏱️ Profiling: recent reruns", expanded=False):
+        runs = telemetry.recent_runs(10, session=profile_session)
+        for run in runs:
+            title = f"**{run['run']}** at {run['started']} · {run['seconds'] * 1000:,.1f} ms"
+            st.markdown(title + (" (interrupted by a rerun)" if run.get('interrupted') else ""))
+            stages = pd.DataFrame(run['stages'])
+            if not stages.empty:
+                stages['ms'] = (stages.pop('seconds') * 1000).round(2)
+                stages['stage'] = stages.apply(lambda row: "  " * row['depth'] + row['stage'], axis=1)
+                st.dataframe(stages.drop(columns='depth'), hide_index=True, width='stretch')
+        memory = db_manager.memory_report(inventory=full_inventory() if paginated else grid_df)
+        st.caption(f"In-memory inventory frame: {memory['bytes'].iloc[-1] / 1024:,.1f} KiB")
+        st.dataframe(memory, hide_index=True, width='stretch')
+        col_jsonl, col_prom = st.columns(2)
+        with col_jsonl:
+            st.download_button("Download JSON lines", telemetry.to_jsonl(telemetry.recent_runs(session=profile_session)),
+                               file_name="insightpro-profile.jsonl")
+        with col_prom:
+            st.download_button("Download Prometheus text", telemetry.prometheus_text(), file_name="insightpro.prom")
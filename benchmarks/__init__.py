@@ -0,0 +1,6 @@
+"""
+Performance benchmarks for InsightPro.
+
+Run individual scripts from the project root, e.g.
+    python -m benchmarks.bench_db_connections
+"""
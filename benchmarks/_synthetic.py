@@ -0,0 +1,32 @@
+"""
+Synthetic data helpers shared by the benchmark scripts.
+"""
+import os
+
+from engine import db_manager
+
+
+def remove_database(path):
+    for suffix in ("", "-wal", "-shm", "-journal"):
+        if os.path.exists(f"{path}{suffix}"):
+            os.remove(f"{path}{suffix}")
+
+
+def build_database(path, n_products=1000, n_days=90, seed=42, **options):
+    """
+    Creates a fresh database at `path` with the app schema and
+    n_products x n_days rows of synthetic sales. Extra keyword arguments
+    (seasonality, sparsity, ...) go to generate_synthetic_data. Returns the path.
+    """
+    path = str(path)
+    previous = db_manager.DB_NAME
+    db_manager.close_connections()
+    remove_database(path)
+    db_manager.DB_NAME = path
+    try:
+        db_manager.migrate()
+        db_manager.generate_synthetic_data(n_products, n_days, seed=seed, **options)
+    finally:
+        db_manager.close_connections()
+        db_manager.DB_NAME = previous
+    return path
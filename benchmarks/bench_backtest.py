@@ -0,0 +1,56 @@
+"""
+Forecast accuracy and cost of every ml_logic model across catalog sizes.
+
+For each catalog size it builds a synthetic database with a year of sales
+(weekly seasonality, a share of days without sales, so every model has
+something to get right) and runs engine.backtest over it: rolling weekly
+origins, each model fitted for the whole catalog per origin. Reports MAE,
+MAPE, stockout hit rate and false-alarm rate with the fit time and peak
+traced memory per model, plus the time to load the demand matrix.
+
+Usage:
+    python -m benchmarks.bench_backtest [--sizes 1000 10000] [--days 365]
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import pandas as pd
+
+from benchmarks._synthetic import build_database
+from engine import backtest, db_manager
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000])
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--horizon", type=int, default=14)
+    parser.add_argument("--weekly-seasonality", type=float, default=0.4)
+    parser.add_argument("--sparsity", type=float, default=0.3)
+    parser.add_argument("--output", default=None, help="write all results to this CSV file")
+    args = parser.parse_args()
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in args.sizes:
+            print(f"Building {size:,} products x {args.days} days...")
+            db_manager.DB_NAME = build_database(
+                os.path.join(tmp, f"bench_{size}.db"), size, args.days,
+                weekly_seasonality=args.weekly_seasonality, sparsity=args.sparsity,
+            )
+            start = time.perf_counter()
+            result = backtest.backtest_database(days=args.days, horizon=args.horizon)
+            total = time.perf_counter() - start
+            print(backtest.format_results(result))
+            print(f"  total {total:.1f}s ({total - result['seconds'].sum():.1f}s loading and scoring)\n")
+            results.append(result)
+            db_manager.close_connections()
+
+    if args.output:
+        pd.concat(results, ignore_index=True).to_csv(args.output, index=False)
+
+
+if __name__ == "__main__":
+    main()
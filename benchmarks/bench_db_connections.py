@@ -0,0 +1,104 @@
+"""
+Concurrent read throughput: pooled WAL connections vs. connect-per-call.
+
+Simulates several Streamlit sessions rendering the dashboard (each render
+reads the inventory and the sales rollup) while one session keeps saving
+stock edits. The legacy mode reproduces the old db_manager behaviour: a new
+connection per call on a rollback-journal database.
+
+Usage:
+    python -m benchmarks.bench_db_connections [--products 2000] [--seconds 3]
+"""
+import argparse
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+
+import pandas as pd
+
+from benchmarks._synthetic import build_database
+from engine import db_manager
+
+
+def _legacy_render(path):
+    conn = sqlite3.connect(path)
+    pd.read_sql_query("SELECT * FROM inventory", conn)
+    conn.close()
+    conn = sqlite3.connect(path)
+    pd.read_sql_query("SELECT * FROM sales_stats", conn)
+    conn.close()
+
+
+def _legacy_write(path, updates):
+    conn = sqlite3.connect(path)
+    cursor = conn.cursor()
+    for stock, product_id in updates:
+        cursor.execute("UPDATE inventory SET current_stock = ? WHERE id = ?", (stock, product_id))
+    conn.commit()
+    conn.close()
+
+
+def _pooled_render(path):
+    pd.read_sql_query("SELECT * FROM inventory", db_manager.get_connection())
+    pd.read_sql_query("SELECT * FROM sales_stats", db_manager.get_connection())
+
+
+def _pooled_write(path, updates):
+    with db_manager.transaction() as cursor:
+        cursor.executemany("UPDATE inventory SET current_stock = ? WHERE id = ?", updates)
+
+
+def run(path, render, write, sessions, seconds, n_products):
+    stop = threading.Event()
+    counts = [0] * sessions
+    updates = [(i % 100, i + 1) for i in range(n_products)]
+
+    def reader(slot):
+        while not stop.is_set():
+            render(path)
+            counts[slot] += 1
+
+    def writer():
+        while not stop.is_set():
+            write(path, updates)
+
+    threads = [threading.Thread(target=reader, args=(i,)) for i in range(sessions)]
+    threads.append(threading.Thread(target=writer))
+    for thread in threads:
+        thread.start()
+    time.sleep(seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    return sum(counts) / seconds
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--products", type=int, default=2000)
+    parser.add_argument("--days", type=int, default=60)
+    parser.add_argument("--seconds", type=float, default=3.0)
+    parser.add_argument("--sessions", type=int, nargs="+", default=[1, 2, 4, 8])
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        pooled_path = build_database(os.path.join(tmp, "pooled.db"), args.products, args.days)
+        legacy_path = build_database(os.path.join(tmp, "legacy.db"), args.products, args.days)
+        conn = sqlite3.connect(legacy_path)
+        conn.execute("PRAGMA journal_mode = DELETE")
+        conn.close()
+
+        db_manager.DB_NAME = pooled_path
+        print(f"{args.products} products x {args.days} days, one concurrent writer")
+        print(f"{'sessions':>8} {'legacy renders/s':>18} {'pooled renders/s':>18} {'speedup':>8}")
+        for sessions in args.sessions:
+            legacy = run(legacy_path, _legacy_render, _legacy_write, sessions, args.seconds, args.products)
+            pooled = run(pooled_path, _pooled_render, _pooled_write, sessions, args.seconds, args.products)
+            print(f"{sessions:>8} {legacy:>18.1f} {pooled:>18.1f} {pooled / max(legacy, 1e-9):>7.1f}x")
+        db_manager.close_connections()
+
+
+if __name__ == "__main__":
+    main()
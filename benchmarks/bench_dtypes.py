@@ -0,0 +1,70 @@
+"""
+Memory footprint and downstream cost of the compact loader dtypes.
+
+Builds a synthetic database (products x days sales rows), then compares a
+plain read_sql_query of sales and inventory (default pandas dtypes: int64
+ids, text dates and names) against db_manager.get_sales_df /
+get_inventory_df (int32 ids, small-int quantities, parsed dates,
+categoricals). Reports load time, per-column memory from
+db_manager.memory_report, and the time ml_logic.forecast_inventory takes on
+each frame, which includes re-parsing text dates on the default one.
+
+Usage:
+    python -m benchmarks.bench_dtypes [--products 10000] [--days 365]
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import pandas as pd
+
+from benchmarks._synthetic import build_database
+from engine import db_manager, ml_logic
+
+
+def timed(func):
+    start = time.perf_counter()
+    result = func()
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--products", type=int, default=10000)
+    parser.add_argument("--days", type=int, default=365)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        print(f"Building {args.products * args.days:,} sales rows...")
+        db_manager.DB_NAME = build_database(os.path.join(tmp, "bench.db"), args.products, args.days)
+        conn = db_manager.get_connection()
+        default_sales, default_load = timed(lambda: pd.read_sql_query("SELECT * FROM sales", conn))
+        default_inventory = pd.read_sql_query("SELECT * FROM inventory", conn)
+        sales, compact_load = timed(db_manager.get_sales_df)
+        inventory = db_manager.get_inventory_df()
+        db_manager.close_connections()
+
+    report = db_manager.memory_report(
+        default_sales=default_sales, compact_sales=sales,
+        default_inventory=default_inventory, compact_inventory=inventory,
+    )
+    report['MB'] = (report.pop('bytes') / 1e6).round(2)
+    print(report.to_string(index=False))
+
+    totals = report[report['column'] == 'total'].set_index('frame')['MB']
+    _, default_forecast = timed(lambda: ml_logic.forecast_inventory(default_inventory, default_sales))
+    _, compact_forecast = timed(lambda: ml_logic.forecast_inventory(inventory, sales))
+    print()
+    print(f"{'':<22} {'default':>10} {'compact':>10} {'ratio':>7}")
+    for label, default, compact in [
+        ("sales memory (MB)", totals['default_sales'], totals['compact_sales']),
+        ("inventory memory (MB)", totals['default_inventory'], totals['compact_inventory']),
+        ("sales load (s)", default_load, compact_load),
+        ("forecast_inventory (s)", default_forecast, compact_forecast),
+    ]:
+        print(f"{label:<22} {default:>10.3f} {compact:>10.3f} {default / max(compact, 1e-9):>6.1f}x")
+
+
+if __name__ == "__main__":
+    main()
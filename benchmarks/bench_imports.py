@@ -0,0 +1,98 @@
+"""
+Cold-start import time of the app and the test run, from -X importtime.
+
+Each scenario runs in a fresh interpreter with `python -X importtime`;
+the import time is the sum of the top-level cumulative entries (the best
+of --repeat runs). Scenarios:
+
+- app imports: the module-level import statements of app.py
+- pytest collection: `pytest --collect-only -q -s tests` (-s, or pytest
+  captures the importtime lines of the test modules)
+- deferred modules: sklearn, plotly.express and google.generativeai on
+  their own, i.e. what is now paid on first use instead of at start-up
+
+With --baseline REF the app and pytest scenarios are also measured on that
+git revision (extracted with git archive), so the gain is shown side by side.
+
+Usage:
+    python -m benchmarks.bench_imports [--baseline HEAD~1] [--repeat 3]
+"""
+import argparse
+import ast
+import os
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFERRED = ["sklearn.linear_model", "plotly.express", "google.generativeai"]
+
+
+def app_imports(root):
+    """The module-level import statements of app.py as one code string."""
+    with open(os.path.join(root, "app.py"), encoding="utf-8") as f:
+        tree = ast.parse(f.read())
+    return "\n".join(ast.unparse(node) for node in tree.body if isinstance(node, (ast.Import, ast.ImportFrom)))
+
+
+def import_seconds(args, root, repeat):
+    """Best total import time over `repeat` runs, and the slowest top-level imports of that run."""
+    best = None
+    for _ in range(repeat):
+        result = subprocess.run(
+            [sys.executable, "-X", "importtime", *args], cwd=root,
+            capture_output=True, text=True, env={**os.environ, "PYTHONDONTWRITEBYTECODE": "1"},
+        )
+        top = []
+        for line in result.stderr.splitlines():
+            if not line.startswith("import time:") or "cumulative" in line:
+                continue
+            _, cumulative, name = line[len("import time:"):].split("|")
+            if not name.startswith("  "):  # top-level entries only; nested ones are included in them
+                top.append((int(cumulative) / 1e6, name.strip()))
+        total = sum(seconds for seconds, _ in top)
+        if best is None or total < best[0]:
+            best = (total, sorted(top, reverse=True)[:5])
+    return best
+
+
+def scenarios(root):
+    return {
+        "app imports": ["-c", app_imports(root)],
+        "pytest collection": ["-m", "pytest", "--collect-only", "-q", "-s", "-p", "no:cacheprovider", "tests"],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--baseline", default=None, help="git revision to compare against (e.g. HEAD~1)")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    current = {name: import_seconds(command, ROOT, args.repeat) for name, command in scenarios(ROOT).items()}
+    baseline = {}
+    if args.baseline:
+        with tempfile.TemporaryDirectory() as tmp:
+            archive = subprocess.run(["git", "archive", args.baseline], cwd=ROOT, capture_output=True, check=True)
+            subprocess.run(["tar", "-x", "-C", tmp], input=archive.stdout, check=True)
+            baseline = {name: import_seconds(command, tmp, args.repeat) for name, command in scenarios(tmp).items()}
+
+    print(f"{'scenario':<20} {'imports (s)':>12}" + (f" {args.baseline + ' (s)':>14} {'saved':>7}" if baseline else ""))
+    for name, (seconds, _) in current.items():
+        line = f"{name:<20} {seconds:>12.3f}"
+        if name in baseline:
+            line += f" {baseline[name][0]:>14.3f} {baseline[name][0] - seconds:>6.2f}s"
+        print(line)
+    for name, (_, top) in current.items():
+        print(f"\nSlowest top-level imports, {name}:")
+        for seconds, module in top:
+            print(f"  {module:<40} {seconds:>8.3f}s")
+
+    print("\nDeferred until first use:")
+    for module in DEFERRED:
+        seconds, _ = import_seconds(["-c", f"import {module}"], ROOT, args.repeat)
+        print(f"  {module:<40} {seconds:>8.3f}s")
+
+
+if __name__ == "__main__":
+    main()
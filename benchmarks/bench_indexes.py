@@ -0,0 +1,86 @@
+"""
+Query plans and timings before/after the schema index migration.
+
+Builds a synthetic sales table (products x days rows), drops the indexes
+from migration 3, times the hot queries and prints their plans, then
+re-applies the migration and repeats.
+
+Usage:
+    python -m benchmarks.bench_indexes [--products 5000] [--days 400]
+"""
+import argparse
+import os
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from benchmarks._synthetic import build_database
+from engine import db_manager
+
+INDEX_MIGRATION = 3
+
+
+def queries():
+    cutoff = (datetime.now() - timedelta(days=30)).strftime('%Y-%m-%d %H:%M:%S')
+    return {
+        "product history": (
+            "SELECT sale_date, quantity_sold FROM sales WHERE product_id = ? AND sale_date >= ?",
+            (42, cutoff),
+        ),
+        "runway window totals": (
+            "SELECT product_id, sale_date, SUM(quantity_sold) FROM sales "
+            "WHERE sale_date >= ? GROUP BY product_id, sale_date",
+            (cutoff,),
+        ),
+        "category filter": (
+            "SELECT * FROM inventory WHERE category = ?",
+            ("Category 7",),
+        ),
+    }
+
+
+def measure(conn, repeat):
+    results = {}
+    for name, (sql, params) in queries().items():
+        plan = [row[-1] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}", params)]
+        start = time.perf_counter()
+        for _ in range(repeat):
+            conn.execute(sql, params).fetchall()
+        results[name] = ((time.perf_counter() - start) / repeat, plan)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--products", type=int, default=5000)
+    parser.add_argument("--days", type=int, default=400)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        print(f"Building {args.products * args.days:,} sales rows...")
+        db_manager.DB_NAME = build_database(os.path.join(tmp, "bench.db"), args.products, args.days)
+        conn = db_manager.get_connection()
+
+        for (name,) in conn.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'index' AND name LIKE 'idx_%'"
+        ).fetchall():
+            conn.execute(f"DROP INDEX {name}")
+        conn.execute("DELETE FROM schema_version WHERE version >= ?", (INDEX_MIGRATION,))
+        before = measure(conn, args.repeat)
+
+        db_manager.migrate()
+        after = measure(conn, args.repeat)
+        db_manager.close_connections()
+
+    print(f"{'query':<22} {'before (ms)':>12} {'after (ms)':>12} {'speedup':>8}")
+    for name in before:
+        b, a = before[name][0] * 1000, after[name][0] * 1000
+        print(f"{name:<22} {b:>12.2f} {a:>12.2f} {b / max(a, 1e-9):>7.1f}x")
+    print()
+    for name in before:
+        print(f"{name}:\n  before: {' | '.join(before[name][1])}\n  after:  {' | '.join(after[name][1])}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""
+Throughput of db_manager.ingest_sales across micro-batch sizes.
+
+Builds a synthetic database, then streams generated point-of-sale events
+(random products, quantity 1-3, timestamped now) through ingest_sales with
+each batch size and reports events per second. Events come from a
+generator, so peak Python memory (tracemalloc) shows what the ingestor
+itself holds: it should track the batch size, not the number of events.
+
+Usage:
+    python -m benchmarks.bench_ingest [--products 10000] [--events 200000]
+"""
+import argparse
+import os
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+
+from benchmarks._synthetic import build_database
+from engine import db_manager
+
+
+def events(n_events, n_products, seed=0):
+    rng = np.random.default_rng(seed)
+    for start in range(0, n_events, 10000):
+        size = min(10000, n_events - start)
+        products = rng.integers(1, n_products + 1, size).tolist()
+        quantities = rng.integers(1, 4, size).tolist()
+        yield from zip(products, quantities)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--products", type=int, default=10000)
+    parser.add_argument("--days", type=int, default=30)
+    parser.add_argument("--events", type=int, default=200000)
+    parser.add_argument("--batch-rows", type=int, nargs="+", default=[1, 10, 100, 1000, 10000])
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        print(f"Building {args.products:,} products x {args.days} days...")
+        db_manager.DB_NAME = build_database(os.path.join(tmp, "bench.db"), args.products, args.days)
+
+        print(f"{'batch rows':>10} {'events':>9} {'seconds':>9} {'events/s':>11} {'batches':>8} {'peak MB':>8}")
+        for batch_rows in args.batch_rows:
+            # Per-event commits are slow; a sample is enough to measure them
+            n_events = min(args.events, 5000) if batch_rows == 1 else args.events
+            tracemalloc.start()
+            start = time.perf_counter()
+            stats = db_manager.ingest_sales(events(n_events, args.products), batch_rows=batch_rows)
+            seconds = time.perf_counter() - start
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            print(f"{batch_rows:>10,} {stats['rows']:>9,} {seconds:>9.2f} {stats['rows'] / seconds:>11,.0f} "
+                  f"{stats['batches']:>8,} {peak / 1e6:>8.2f}")
+        db_manager.close_connections()
+
+
+if __name__ == "__main__":
+    main()
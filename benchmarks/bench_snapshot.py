@@ -0,0 +1,109 @@
+"""
+SQL loads versus Parquet snapshot loads of the sales history.
+
+Builds a synthetic database (products x days sales rows), exports a
+snapshot with db_manager.export_snapshot, then times each load path and
+records its peak resident-memory growth (measured in a forked child, so
+Arrow's allocations count too) and the size of the resulting frame:
+
+- SQL: get_sales_df (all columns) and a projected three-column query
+- Parquet: load_snapshot_sales (three columns, memory-mapped), for the full
+  history and for the trailing 30-day window (month partitions pruned)
+
+Usage:
+    python -m benchmarks.bench_snapshot [--products 5000] [--days 365]
+"""
+import argparse
+import multiprocessing
+import os
+import resource
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+
+import pandas as pd
+
+from benchmarks._synthetic import build_database
+from engine import db_manager
+
+
+def _rss_bytes():
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+
+
+def _peak_growth(load, results):
+    # SQLite connections must not cross a fork: give the child its own
+    db_manager._local = threading.local()
+    db_manager._idle_connections = {}
+    # ru_maxrss is in KiB on Linux
+    baseline = _rss_bytes()
+    load()
+    results.put(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024 - baseline)
+
+
+def measure(load, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        frame = load()
+        timings.append(time.perf_counter() - start)
+    context = multiprocessing.get_context("fork")
+    results = context.Queue()
+    child = context.Process(target=_peak_growth, args=(load, results))
+    child.start()
+    peak = results.get()
+    child.join()
+    return min(timings), peak, frame.memory_usage(deep=True).sum(), len(frame)
+
+
+def directory_size(path):
+    return sum(os.path.getsize(os.path.join(root, name)) for root, _, files in os.walk(path) for name in files)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--products", type=int, default=5000)
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        print(f"Building {args.products * args.days:,} sales rows...")
+        db_path = build_database(os.path.join(tmp, "bench.db"), args.products, args.days)
+        snapshot = os.path.join(tmp, "snapshot")
+        db_manager.DB_NAME = db_path
+
+        start = time.perf_counter()
+        db_manager.export_snapshot(snapshot)
+        export_seconds = time.perf_counter() - start
+        print(f"Export: {export_seconds:.2f}s, database {os.path.getsize(db_path) / 1e6:,.1f} MB, "
+              f"snapshot {directory_size(snapshot) / 1e6:,.1f} MB")
+
+        window_start = datetime.now() - timedelta(days=30)
+        projected = "SELECT product_id, sale_date, quantity_sold FROM sales"
+        cutoff = (window_start.strftime('%Y-%m-%d %H:%M:%S'),)
+        loads = {
+            "sql get_sales_df": db_manager.get_sales_df,
+            "sql 3 columns": lambda: pd.read_sql_query(
+                projected, db_manager.get_connection(), parse_dates=['sale_date']
+            ),
+            "parquet 3 columns": lambda: db_manager.load_snapshot_sales(snapshot),
+            "sql 30-day window": lambda: pd.read_sql_query(
+                projected + " WHERE sale_date >= ?", db_manager.get_connection(), params=cutoff, parse_dates=['sale_date']
+            ),
+            "parquet 30-day window": lambda: db_manager.load_snapshot_sales(snapshot, start=window_start),
+        }
+        results = {name: measure(load, args.repeat) for name, load in loads.items()}
+        db_manager.close_connections()
+
+    print(f"{'load path':<22} {'rows':>11} {'seconds':>9} {'peak RSS (MB)':>16} {'frame (MB)':>11}")
+    for name, (seconds, peak, frame_bytes, rows) in results.items():
+        print(f"{name:<22} {rows:>11,} {seconds:>9.3f} {peak / 1e6:>16.1f} {frame_bytes / 1e6:>11.1f}")
+    sql, parquet = results["sql 3 columns"][0], results["parquet 3 columns"][0]
+    print(f"\nParquet full-history load is {sql / max(parquet, 1e-9):.1f}x faster than the projected SQL query.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,166 @@
+"""
+End-to-end benchmark suite: DB load, forecasting and the app render path.
+
+For each catalog size it builds a synthetic database (products x days of
+sales) and times the hot entry points:
+
+- db_manager: init_db (on an existing DB), get_inventory_df, get_sales_df,
+  get_sales_stats, update_stock_batch (one edit and a 10% edit)
+- ml_logic: calculate_burn_rate_and_stockout over all rows (capped by
+  --per-row-limit, then extrapolated), forecast_inventory, forecast_from_stats
+- api_bridge: get_supply_chain_brief prompt building with a stubbed model
+
+Results are written as JSON so runs can be diffed; --compare flags stages
+that got slower than a previous results file.
+
+Usage:
+    python -m benchmarks.bench_suite --sizes 1000 10000 --days 365 --output results.json
+    python -m benchmarks.bench_suite --compare results.json
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import tempfile
+import time
+import warnings
+from datetime import datetime
+from unittest.mock import MagicMock, patch
+
+from benchmarks._synthetic import build_database
+from engine import db_manager, ml_logic
+
+REGRESSION_THRESHOLD = 1.2  # flag stages more than 20% slower than the baseline
+
+
+def timed(results, size, stage, func, rows=None, repeat=1):
+    best = float("inf")
+    value = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        value = func()
+        best = min(best, time.perf_counter() - start)
+    results.append({"products": size, "stage": stage, "seconds": round(best, 6), "rows": rows})
+    print(f"  {stage:<38} {best:>10.4f}s" + (f"  ({rows:,} rows)" if rows is not None else ""))
+    return value
+
+
+def bench_size(results, n_products, n_days, per_row_limit, directory):
+    print(f"{n_products:,} products x {n_days} days")
+    db_manager.DB_NAME = build_database(os.path.join(directory, f"bench_{n_products}.db"), n_products, n_days)
+
+    timed(results, n_products, "init_db (existing)", db_manager.init_db)
+    inventory_df = timed(results, n_products, "get_inventory_df", db_manager.get_inventory_df, rows=n_products, repeat=3)
+    sales_df = timed(results, n_products, "get_sales_df", db_manager.get_sales_df, rows=n_products * n_days)
+    sales_stats = timed(results, n_products, "get_sales_stats", db_manager.get_sales_stats, rows=n_products, repeat=3)
+
+    one_edit = inventory_df.copy()
+    one_edit.loc[0, "current_stock"] += 1
+    timed(results, n_products, "update_stock_batch (1 row)", lambda: db_manager.update_stock_batch(one_edit))
+    bulk_edit = inventory_df.copy()
+    bulk_edit.loc[bulk_edit.index[::10], "current_stock"] += 1
+    timed(results, n_products, "update_stock_batch (10% rows)", lambda: db_manager.update_stock_batch(bulk_edit),
+          rows=len(bulk_edit.index[::10]))
+    db_manager.update_stock_batch(inventory_df)
+
+    sample = inventory_df.head(per_row_limit)
+
+    def per_row():
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            for _, row in sample.iterrows():
+                ml_logic.calculate_burn_rate_and_stockout(row, sales_df)
+
+    start = time.perf_counter()
+    per_row()
+    elapsed = time.perf_counter() - start
+    estimate = elapsed * n_products / max(len(sample), 1)
+    results.append({"products": n_products, "stage": "calculate_burn_rate_and_stockout (all rows)",
+                    "seconds": round(estimate, 6), "rows": n_products, "measured_rows": len(sample)})
+    print(f"  {'calculate_burn_rate_and_stockout':<38} {estimate:>10.4f}s  (extrapolated from {len(sample)} rows)")
+
+    forecast = timed(results, n_products, "forecast_inventory",
+                     lambda: ml_logic.forecast_inventory(inventory_df, sales_df), rows=n_products)
+    timed(results, n_products, "forecast_from_stats",
+          lambda: ml_logic.forecast_from_stats(inventory_df, sales_stats), rows=n_products, repeat=3)
+
+    import api_bridge
+
+    brief_df = inventory_df.assign(**{
+        "Burn Rate": forecast["burn_rate"], "Runway": forecast["days_to_stockout"], "Status": forecast["status"]
+    })
+    with patch("api_bridge.genai") as genai:
+        genai.list_models.return_value = []
+        genai.GenerativeModel.return_value.generate_content.return_value = MagicMock(text="stub")
+        timed(results, n_products, "get_supply_chain_brief (stub model)",
+              lambda: api_bridge.get_supply_chain_brief(brief_df.copy(), "bench-key", use_cache=False),
+              rows=n_products, repeat=3)
+
+    db_manager.close_connections()
+
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, baseline_path):
+    with open(baseline_path) as f:
+        baseline = {(r["products"], r["stage"]): r["seconds"] for r in json.load(f)["results"]}
+    print(f"\nComparison with {baseline_path}:")
+    regressions = 0
+    for r in results:
+        old = baseline.get((r["products"], r["stage"]))
+        if not old:
+            continue
+        ratio = r["seconds"] / old
+        flag = "  REGRESSION" if ratio > REGRESSION_THRESHOLD else ""
+        regressions += bool(flag)
+        print(f"  {r['products']:>8,} {r['stage']:<44} {old:>9.4f}s -> {r['seconds']:>9.4f}s ({ratio:.2f}x){flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000])
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--per-row-limit", type=int, default=100,
+                        help="rows timed for the per-row forecast before extrapolating")
+    parser.add_argument("--output", default=None, help="JSON results file (default: bench-<timestamp>.json)")
+    parser.add_argument("--compare", default=None, help="previous JSON results file to compare against")
+    args = parser.parse_args()
+
+    results = []
+    previous_db = db_manager.DB_NAME
+    with tempfile.TemporaryDirectory() as directory:
+        try:
+            for size in args.sizes:
+                bench_size(results, size, args.days, args.per_row_limit, directory)
+        finally:
+            db_manager.DB_NAME = previous_db
+
+    report = {
+        "meta": {
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "git_revision": git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "days": args.days,
+        },
+        "results": results,
+    }
+    output = args.output or f"bench-{datetime.now():%Y%m%d-%H%M%S}.json"
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nWrote {output}")
+
+    if args.compare:
+        raise SystemExit(1 if compare(results, args.compare) else 0)
+
+
+if __name__ == "__main__":
+    main()
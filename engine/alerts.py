@@ -0,0 +1,218 @@
+"""
+alerts.py
+=========
+Event-driven Stockout Alerting
+
+AlertEvaluator keeps every product's alert level (Healthy / Warning /
+Critical) current in the `alert_state` table and records each change of
+level in `alerts`, without rendering the dashboard or refitting the whole
+catalog:
+
+- Stock edits arrive through the `stock_changes` feed (fed by triggers on
+  inventory) and new sales through the sales high-water mark, so writers in
+  other processes are picked up too. db_manager.subscribe() wakes the
+  evaluator as soon as this process commits one.
+- Only the touched products are refitted (from the sales rollup) and
+  re-classified. The whole catalog is re-evaluated once per day, since the
+  trailing window moves at midnight.
+- A level is recorded only when it changes (deduplication). Escalation is
+  immediate; de-escalation needs the runway to clear the threshold by
+  HYSTERESIS, so a product hovering around 7 days does not flap.
+
+Run in the background of the app (start()/stop()), or standalone:
+
+    python -m engine.alerts                     # evaluate changes every second
+    python -m engine.alerts --once              # one catch-up pass and exit
+
+Author: InsightPro Team
+Version: 2.1
+"""
+
+import argparse
+import sys
+import threading
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from engine import db_manager, ml_logic
+
+WARNING_DAYS = 30
+CRITICAL_DAYS = 7
+HYSTERESIS = 0.2        # leave a level only at runway >= threshold * (1 + HYSTERESIS)
+POLL_SECONDS = 1.0
+EVALUATE_BATCH = 50000
+
+LEVELS = ('Healthy', 'Warning', 'Critical')
+CROSSING_COLUMNS = ['product_id', 'from_status', 'to_status', 'runway', 'burn_rate', 'current_stock']
+
+def classify(runway, warning_days=WARNING_DAYS, critical_days=CRITICAL_DAYS):
+    """Alert level index per runway (0 Healthy, 1 Warning, 2 Critical); NaN/inf is Healthy."""
+    runway = np.asarray(runway, dtype=float)
+    with np.errstate(invalid='ignore'):
+        return (runway < warning_days).astype(int) + (runway < critical_days).astype(int)
+
+def next_levels(previous, runway, hysteresis=HYSTERESIS):
+    """
+    New level indices from the previous ones and the current runways.
+
+    A worse level is taken immediately. A better one only as far as the
+    runway clears each threshold with the hysteresis margin.
+    """
+    previous = np.asarray(previous, dtype=int)
+    target = classify(runway)
+    relaxed = classify(runway, WARNING_DAYS * (1 + hysteresis), CRITICAL_DAYS * (1 + hysteresis))
+    return np.where(target >= previous, target, np.minimum(previous, relaxed))
+
+class AlertEvaluator:
+    """
+    Re-evaluates alert levels for products touched by stock edits or sales.
+
+    The first poll evaluates the whole catalog; later polls only what the
+    change feeds report, plus a full pass when the day changes. One
+    evaluator per database: it prunes the stock_changes rows it consumed.
+    """
+
+    def __init__(self, poll_seconds=POLL_SECONDS, hysteresis=HYSTERESIS, batch_size=EVALUATE_BATCH):
+        self.poll_seconds = poll_seconds
+        self.hysteresis = hysteresis
+        self.batch_size = batch_size
+        self._sales_hwm = None
+        self._change_hwm = None
+        self._day = None
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self.evaluated = 0
+        self.last_error = None
+
+    # --- Evaluation ---
+    def evaluate(self, product_ids, now=None):
+        """
+        Refits and re-classifies `product_ids`, recording level changes.
+
+        Returns:
+            pd.DataFrame: The crossings recorded (product_id, from_status,
+            to_status, runway, burn_rate, current_stock).
+        """
+        product_ids = sorted({int(pid) for pid in product_ids})
+        if not product_ids:
+            return pd.DataFrame(columns=CROSSING_COLUMNS)
+        inventory = db_manager.get_inventory_df(product_ids)
+        ids = inventory['id'].to_numpy()
+        stats = db_manager.get_sales_stats(ml_logic.WINDOW_DAYS, now=now, product_ids=ids.tolist())
+        burn_rate = ml_logic.burn_rates_from_stats(ids, stats)
+        stock = inventory['current_stock'].to_numpy(dtype=float)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            runway = np.round(np.where(burn_rate > 0, stock / burn_rate, np.inf), 1)
+
+        previous = db_manager.get_alert_state(ids.tolist()).set_index('product_id')['status']
+        previous = previous.reindex(ids).fillna(LEVELS[0]).map(LEVELS.index).to_numpy(dtype=int)
+        levels = next_levels(previous, runway, self.hysteresis)
+
+        state = pd.DataFrame({
+            'product_id': ids,
+            'status': np.array(LEVELS, dtype=object)[levels],
+            'runway': runway,
+            'burn_rate': burn_rate,
+        })
+        changed = levels != previous
+        crossings = state[changed].assign(
+            from_status=np.array(LEVELS, dtype=object)[previous[changed]],
+            current_stock=inventory['current_stock'].to_numpy()[changed],
+        ).rename(columns={'status': 'to_status'})
+        removed = sorted(set(product_ids) - set(ids.tolist()))
+        db_manager.save_alert_evaluation(state, crossings, removed)
+        self.evaluated += len(ids)
+        return crossings[CROSSING_COLUMNS]
+
+    def poll(self, now=None):
+        """
+        Evaluates whatever changed since the previous poll.
+
+        Returns:
+            pd.DataFrame: The crossings recorded by this poll.
+        """
+        now = now or datetime.now()
+        with self._lock:
+            sales_hwm = db_manager.get_sales_high_water_mark()
+            change_hwm = db_manager.get_stock_change_high_water_mark()
+            if self._day != now.date() or self._sales_hwm is None or sales_hwm < self._sales_hwm:
+                product_ids = db_manager.get_inventory_df()['id'].tolist()
+                product_ids += db_manager.get_alert_state()['product_id'].tolist()  # catch deletions
+            else:
+                product_ids = set(db_manager.get_products_with_stock_changes(self._change_hwm))
+                if sales_hwm > self._sales_hwm:
+                    product_ids.update(db_manager.get_products_sold_since(self._sales_hwm))
+                product_ids = sorted(product_ids)
+
+            crossings = [
+                self.evaluate(product_ids[start:start + self.batch_size], now=now)
+                for start in range(0, len(product_ids), self.batch_size)
+            ]
+            if change_hwm != self._change_hwm:
+                db_manager.prune_stock_changes(change_hwm)
+            self._day, self._sales_hwm, self._change_hwm = now.date(), sales_hwm, change_hwm
+        if not crossings:
+            return pd.DataFrame(columns=CROSSING_COLUMNS)
+        return pd.concat(crossings, ignore_index=True)
+
+    # --- Background thread ---
+    def wake(self):
+        """Asks the background thread to poll now (registered with db_manager.subscribe)."""
+        self._wake.set()
+
+    def start(self):
+        """Polls in a daemon thread until stop(); returns self."""
+        if self._thread is None:
+            db_manager.subscribe(self.wake)
+            self._thread = threading.Thread(target=self._run, name="alert-evaluator", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        db_manager.unsubscribe(self.wake)
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.poll()
+                self.last_error = None
+            except Exception as e:
+                # Keep watching; e.g. a locked database clears on a later poll
+                self.last_error = e
+            self._wake.wait(self.poll_seconds)
+            self._wake.clear()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Evaluate InsightPro stockout alerts as stock and sales change.")
+    parser.add_argument("--db", default=None, help=f"SQLite database (default: {db_manager.DB_NAME})")
+    parser.add_argument("--interval", type=float, default=POLL_SECONDS, help="seconds between polls")
+    parser.add_argument("--once", action="store_true", help="evaluate once and exit")
+    args = parser.parse_args(argv)
+
+    if args.db:
+        db_manager.DB_NAME = args.db
+    db_manager.migrate()
+    evaluator = AlertEvaluator(poll_seconds=args.interval)
+    try:
+        while True:
+            for crossing in evaluator.poll().itertuples(index=False):
+                print(f"Product {crossing.product_id}: {crossing.from_status} -> {crossing.to_status} "
+                      f"(runway {crossing.runway:.1f} days)")
+            if args.once:
+                return 0
+            time.sleep(args.interval)
+    except KeyboardInterrupt:
+        return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,196 @@
+"""
+backtest.py
+===========
+Forecast Backtesting
+
+Replays the sales history with rolling forecast origins and scores every
+model in ml_logic.MODELS (plus 'auto' selection) on what actually sold
+next, so model choices rest on measured accuracy and cost:
+
+    python -m engine.backtest                            # whole catalog, last year
+    python -m engine.backtest --days 180 --horizon 14 --models linear croston
+    python -m engine.backtest --db /data/inventory_v2.db --output backtest.csv
+
+The daily demand matrix is read once from the sales_daily rollup. At each
+origin every model is fitted for the whole catalog in one call on the
+HISTORY_DAYS before it and compared with the `horizon` days after it, so
+the cost grows with origins x models, never with products x origins.
+
+Scores per model:
+- mae: mean absolute error of daily demand
+- mape: mean absolute percentage error of total demand over the horizon
+  (product-origins that sold nothing are left out)
+- hit_rate: share of real stockouts within CRITICAL_DAYS that the model's
+  runway flagged as Critical; false_alarm_rate: Critical flags that did not
+  run out. Stock at each origin is simulated as the actual demand of a
+  random number of the following days, since past stock levels are not kept.
+- seconds / peak_mb: fit time and peak traced NumPy/Python memory. Fits are
+  timed with tracemalloc off, since tracing slows every allocation; the peak
+  comes from one more traced fit at the first origin (every origin fits the
+  same shapes, so one fit is representative).
+
+Author: InsightPro Team
+Version: 2.1
+"""
+
+import argparse
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from engine import db_manager, ml_logic
+
+BACKTEST_DAYS = 365
+BACKTEST_STEP = 7
+
+def _weekday(epoch_day):
+    """Weekday (0 = Monday) of an epoch day; 1970-01-01 was a Thursday."""
+    return (int(epoch_day) + 3) % 7
+
+def backtest(demand, observed, end_day, models=None, horizon=ml_logic.HORIZON_DAYS, step=BACKTEST_STEP,
+             history_days=ml_logic.HISTORY_DAYS, seed=0):
+    """
+    Scores models over rolling origins of a demand matrix.
+
+    Args:
+        demand, observed: ml_logic.demand_matrix arrays ending at `end_day`.
+        models: Names from ml_logic.MODELS and/or 'auto' (default: all of them).
+        horizon: Days forecast from each origin.
+        step: Days between origins.
+        history_days: Days each fit sees before its origin.
+        seed: Seed for the simulated stock levels.
+
+    Returns:
+        pd.DataFrame: One row per model with origins, forecasts (product
+        origins scored), mae, mape, hit_rate, false_alarm_rate, seconds and
+        peak_mb.
+    """
+    models = list(models or [*ml_logic.MODELS, 'auto'])
+    days = demand.shape[1]
+    origins = list(range(history_days, days - horizon + 1, step))
+    if not origins:
+        raise ValueError(f"need at least {history_days + horizon} days of history, got {days}")
+
+    # Same simulated stock for every model: stock lasts 1..horizon actual days
+    rng = np.random.default_rng(seed)
+    cover = rng.integers(1, horizon + 1, size=(len(origins), len(demand)))
+
+    def fit(model, origin):
+        return ml_logic.forecast_demand(
+            demand[:, origin - history_days:origin], observed[:, origin - history_days:origin],
+            _weekday(end_day - days + origin), model, horizon
+        )[0]
+
+    rows = []
+    for model in models:
+        seconds = 0.0
+        abs_error = 0.0
+        cells = 0
+        ape = []
+        hits = misses = false_alarms = 0
+        for number, origin in enumerate(origins):
+            actual = demand[:, origin:origin + horizon]
+            start = time.perf_counter()
+            forecast = fit(model, origin)
+            seconds += time.perf_counter() - start
+
+            abs_error += np.abs(forecast - actual).sum()
+            cells += actual.size
+            sold = actual.sum(axis=1)
+            predicted = forecast.sum(axis=1)
+            ape.append(np.abs(predicted - sold)[sold > 0] / sold[sold > 0])
+
+            # Products with nothing to cover (stock 0) would be trivial hits
+            stock = np.cumsum(actual, axis=1)[np.arange(len(actual)), cover[number] - 1]
+            stocked = stock > 0
+            runs_out = stocked & (ml_logic.runway_from_forecast(actual, stock) < ml_logic.CRITICAL_DAYS)
+            flagged = stocked & (ml_logic.runway_from_forecast(forecast, stock) < ml_logic.CRITICAL_DAYS)
+            hits += int((runs_out & flagged).sum())
+            misses += int((runs_out & ~flagged).sum())
+            false_alarms += int((flagged & ~runs_out).sum())
+        ape = np.concatenate(ape)
+        rows.append({
+            'model': model,
+            'origins': len(origins),
+            'forecasts': len(demand) * len(origins),
+            'mae': abs_error / cells if cells else np.nan,
+            'mape': ape.mean() if len(ape) else np.nan,
+            'hit_rate': hits / (hits + misses) if hits + misses else np.nan,
+            'false_alarm_rate': false_alarms / (hits + false_alarms) if hits + false_alarms else np.nan,
+            'seconds': seconds,
+            'peak_mb': _peak_mb(fit, model, origins[0]),
+        })
+    return pd.DataFrame(rows)
+
+def _peak_mb(fit, model, origin):
+    """Peak memory traced above the starting point while fitting `model` once."""
+    tracing = tracemalloc.is_tracing()
+    if not tracing:
+        tracemalloc.start()
+    try:
+        tracemalloc.reset_peak()
+        baseline = tracemalloc.get_traced_memory()[0]
+        fit(model, origin)
+        return (tracemalloc.get_traced_memory()[1] - baseline) / 1e6
+    finally:
+        if not tracing:
+            tracemalloc.stop()
+
+def backtest_database(product_ids=None, days=BACKTEST_DAYS, now=None, **options):
+    """
+    Backtests the last `days` days of the current database (see backtest()).
+
+    Returns:
+        pd.DataFrame: backtest() results with a 'products' column.
+    """
+    now = now or datetime.now()
+    end_day = int(np.datetime64(now.date(), 'D').astype(np.int64))
+    if product_ids is None:
+        product_ids = db_manager.get_inventory_df()['id'].to_numpy()
+        daily = db_manager.get_daily_demand(days, now=now)
+    else:
+        product_ids = np.asarray(product_ids)
+        daily = db_manager.get_daily_demand(days, now=now, product_ids=product_ids.tolist())
+    demand, observed = ml_logic.demand_matrix(product_ids, daily, end_day, days)
+    results = backtest(demand, observed, end_day, **options)
+    results.insert(1, 'products', len(demand))
+    return results
+
+def format_results(results):
+    """Results as a printable table."""
+    table = results.copy()
+    for column in ('mae', 'mape', 'hit_rate', 'false_alarm_rate'):
+        table[column] = table[column].round(3)
+    table['seconds'] = table['seconds'].round(2)
+    table['peak_mb'] = table['peak_mb'].round(1)
+    return table.to_string(index=False)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Backtest InsightPro forecast models on the sales history.")
+    parser.add_argument("--db", default=None, help=f"SQLite database (default: {db_manager.DB_NAME})")
+    parser.add_argument("--days", type=int, default=BACKTEST_DAYS, help="days of history to replay")
+    parser.add_argument("--horizon", type=int, default=ml_logic.HORIZON_DAYS, help="days forecast per origin")
+    parser.add_argument("--step", type=int, default=BACKTEST_STEP, help="days between origins")
+    parser.add_argument("--models", nargs="+", default=None, choices=[*ml_logic.MODELS, 'auto'],
+                        help="models to score (default: all and auto)")
+    parser.add_argument("--output", default=None, help="also write the results to this CSV file")
+    args = parser.parse_args(argv)
+
+    if args.db:
+        db_manager.DB_NAME = args.db
+    db_manager.migrate()
+    try:
+        results = backtest_database(days=args.days, models=args.models, horizon=args.horizon, step=args.step)
+    except ValueError as e:
+        parser.error(str(e))
+    print(format_results(results))
+    if args.output:
+        results.to_csv(args.output, index=False)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
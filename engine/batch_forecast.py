@@ -0,0 +1,143 @@
+"""
+batch_forecast.py
+=================
+Headless Batch Forecasting
+
+Runs the ML engine over the inventory database without the dashboard and
+stores burn rate, runway and status per product in the `forecasts` table,
+stamped with a run in `forecast_runs`. Intended for cron / off-peak runs:
+
+    python -m engine.batch_forecast                      # full run
+    python -m engine.batch_forecast --incremental        # only what changed
+    python -m engine.batch_forecast --category Audio --products 1,2,3
+    python -m engine.batch_forecast --workers 4 --db /data/inventory_v2.db
+    python -m engine.batch_forecast --model auto         # per-product model choice
+
+An incremental run forecasts only products without a current forecast:
+new products, products sold or restocked since their last forecast, and
+everything forecast on an earlier day (the trailing window has moved), so
+the first incremental run of a day is effectively a full one.
+
+Author: InsightPro Team
+Version: 2.1
+"""
+
+import argparse
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import pandas as pd
+
+from engine import db_manager, ml_logic
+
+BATCH_SIZE = 50000
+
+def _select_products(product_ids=None, category=None):
+    inventory = db_manager.get_inventory_df(product_ids)
+    if category is not None:
+        inventory = inventory[inventory['category'] == category]
+    return inventory
+
+def _forecast_batch(inventory_df, now, model=None):
+    product_ids = inventory_df['id'].tolist()
+    if model is None:
+        stats = db_manager.get_sales_stats(ml_logic.WINDOW_DAYS, now=now, product_ids=product_ids)
+        forecast = ml_logic.forecast_from_stats(inventory_df, stats)
+    else:
+        demand = db_manager.get_daily_demand(ml_logic.HISTORY_DAYS, now=now, product_ids=product_ids)
+        forecast = ml_logic.forecast_with_models(inventory_df, demand, now=now, model=model)
+    return forecast.assign(product_id=inventory_df['id'], current_stock=inventory_df['current_stock'])
+
+def run_batch_forecast(product_ids=None, category=None, incremental=False, workers=1,
+                       batch_size=BATCH_SIZE, now=None, model=None, log=print):
+    """
+    Forecasts the selected products and records the results as one run.
+
+    Args:
+        product_ids: Restrict to these product ids (default: all).
+        category: Restrict to one category.
+        incremental: Only forecast products without a current forecast.
+        workers: Batches forecast concurrently. Each worker thread reads its
+            batch's rollup sums over its own pooled connection, and SQLite
+            releases the GIL while the aggregate query runs.
+        batch_size: Most products forecast per batch, bounding memory.
+        model: None for the 30-day trend from the rollup sums, otherwise an
+            ml_logic.MODELS name or 'auto' (ml_logic.forecast_with_models).
+
+    Returns:
+        dict: run_id (None if nothing needed forecasting), mode, products,
+        seconds, counts per status and, with a model, counts per model.
+    """
+    started = time.perf_counter()
+    now = now or datetime.now()
+    db_manager.migrate()
+    sales_hwm = db_manager.get_sales_high_water_mark()
+
+    mode = 'incremental' if incremental else 'full'
+    if incremental:
+        stale = db_manager.get_products_needing_forecast(now)
+        product_ids = stale if product_ids is None else sorted(set(stale) & set(product_ids))
+
+    inventory = _select_products(product_ids, category)
+    if inventory.empty:
+        log("Nothing to forecast.")
+        return {'run_id': None, 'mode': mode, 'products': 0, 'seconds': time.perf_counter() - started, 'status': {}}
+
+    workers = max(1, int(workers))
+    batch_size = max(1, min(batch_size, -(-len(inventory) // workers)))
+    batches = [
+        inventory.iloc[start:start + batch_size].reset_index(drop=True)
+        for start in range(0, len(inventory), batch_size)
+    ]
+    if workers > 1 and len(batches) > 1:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(lambda batch: _forecast_batch(batch, now, model), batches))
+    else:
+        results = [_forecast_batch(batch, now, model) for batch in batches]
+    forecast = pd.concat(results, ignore_index=True)
+    run_id = db_manager.save_forecast_run(forecast, mode, workers, sales_hwm, now, datetime.now())
+
+    summary = {
+        'run_id': run_id,
+        'mode': mode,
+        'products': len(forecast),
+        'seconds': time.perf_counter() - started,
+        'status': forecast['status'].value_counts().to_dict(),
+    }
+    counts = ", ".join(f"{status} {count:,}" for status, count in sorted(summary['status'].items()))
+    if model is not None:
+        summary['models'] = forecast['model'].value_counts().to_dict()
+        counts += "; " + ", ".join(f"{name} {count:,}" for name, count in sorted(summary['models'].items()))
+    log(f"Run #{run_id} ({mode}): {len(forecast):,} products in {summary['seconds']:.2f}s [{counts}]")
+    return summary
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the InsightPro forecast over the inventory database.")
+    parser.add_argument("--db", default=None, help=f"SQLite database (default: {db_manager.DB_NAME})")
+    parser.add_argument("--products", default=None, help="comma-separated product ids to forecast")
+    parser.add_argument("--category", default=None, help="only forecast this category")
+    parser.add_argument("--incremental", action="store_true",
+                        help="only products sold or restocked since their last forecast")
+    parser.add_argument("--workers", type=int, default=1, help="batches forecast concurrently")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE, help="products per batch")
+    parser.add_argument("--model", default=None, choices=['auto', *ml_logic.MODELS],
+                        help="daily-demand model (default: 30-day trend from the rollup)")
+    args = parser.parse_args(argv)
+
+    if args.db:
+        db_manager.DB_NAME = args.db
+    product_ids = None
+    if args.products:
+        try:
+            product_ids = [int(pid) for pid in args.products.split(",") if pid.strip()]
+        except ValueError:
+            parser.error("--products must be comma-separated integers")
+
+    run_batch_forecast(product_ids, args.category, args.incremental, args.workers, args.batch_size,
+                       model=args.model)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -5,67 +5,712 @@ Database Management Module
 
 This module handles all SQLite database operations for the InsightPro inventory system.
 It manages:
+- Pooled, long-lived SQLite connections (one per thread, WAL journaling)
 - Database initialization and schema creation
 - Inventory data CRUD operations
-- Sales history tracking
-- Mock data generation for demo purposes
+- Sales history tracking and streaming, micro-batched sales ingestion
+- Mock data generation for demo purposes and seedable synthetic datasets for load tests
+- Parquet snapshots of inventory and sales (month-partitioned) for fast columnar loads
 
 Tables:
 - inventory: Product information and stock levels
 - sales: Historical sales data for ML analysis
+- sales_daily: Per-product daily sales totals, maintained by triggers on sales
+- sales_stats: Per-product count of days with sales and first/last sale day
+- product_metrics: Per-product burn rate, runway, status and stock value for the dashboard
+- dashboard_summary: One row of dashboard totals, maintained by triggers on product_metrics
+- forecast_runs / forecasts: Batch forecast runs and each product's latest result
+- stock_changes / alert_state / alerts: Stock edit feed, alert levels and recorded crossings
+- schema_version: Applied schema migrations (see MIGRATIONS)
 
 Author: InsightPro Team
 Version: 2.1
 """
 
+import json
+import os
 import sqlite3
+import threading
+import time
+import weakref
 import pandas as pd
-import random
+import numpy as np
+from contextlib import contextmanager
 from datetime import datetime, timedelta
+from engine import telemetry
 
 DB_NAME = "inventory_v2.db"
 
-def init_db():
-    """Initializes the SQLite database and creates tables if they don't exist."""
-    conn = sqlite3.connect(DB_NAME)
-    cursor = conn.cursor()
-    
-    # Create Inventory Table
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS inventory (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            product_name TEXT NOT NULL,
-            category TEXT,
-            current_stock INTEGER,
-            reorder_point INTEGER,
-            unit_cost REAL,
-            selling_price REAL
-        )
-    ''')
+# --- Connection Management ---
+# Streamlit runs every script run on a worker thread, so each thread keeps one
+# long-lived connection per database file. When a thread exits its connection
+# goes back to an idle pool for the next thread instead of being closed, which
+# keeps the per-connection page cache and prepared-statement cache warm.
+PRAGMAS = {
+    "journal_mode": "WAL",        # readers never block on the stock-edit writer
+    "synchronous": "NORMAL",      # safe with WAL, avoids an fsync per commit
+    "cache_size": -65536,         # 64 MiB page cache
+    "mmap_size": 268435456,       # 256 MiB memory-mapped reads
+    "temp_store": "MEMORY",
+}
+BUSY_TIMEOUT_SECONDS = 30
+STATEMENT_CACHE_SIZE = 256
+POOL_MAX_IDLE = 8
 
-    # Create Sales History Table
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS sales (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            product_id INTEGER,
-            sale_date DATE,
-            quantity_sold INTEGER,
-            FOREIGN KEY (product_id) REFERENCES inventory (id)
-        )
-    ''')
-    
-    conn.commit()
+# Streaming imports read and write uploads this many rows at a time
+IMPORT_CHUNK_ROWS = 10000
+IMPORT_REQUIRED_COLUMNS = ['product_name', 'current_stock', 'reorder_point']
+IMPORT_DEFAULTS = {'category': 'Uncategorized', 'unit_cost': 0.0, 'selling_price': 0.0}
+
+# Diffs larger than this are applied with a temp-table join instead of executemany
+BULK_UPDATE_THRESHOLD = 5000
+
+# Columns the paginated asset grid may sort on (interpolated into ORDER BY)
+INVENTORY_SORT_COLUMNS = ('id', 'product_name', 'category', 'current_stock', 'reorder_point', 'unit_cost', 'selling_price')
+
+# Synthetic datasets are generated and inserted this many sales rows at a time
+SYNTHETIC_CHUNK_ROWS = 200000
+SYNTHETIC_DISTRIBUTIONS = ('poisson', 'negative_binomial')
+
+# Parquet snapshots: sales are exported this many rows at a time, and loads
+# project these columns unless asked for more (what the ML layer reads)
+SNAPSHOT_CHUNK_ROWS = 500000
+SNAPSHOT_SALES_COLUMNS = ('product_id', 'sale_date', 'quantity_sold')
+SNAPSHOT_MANIFEST = "_snapshot.json"
+
+# Streaming sales ingestion: buffered events are committed once this many are
+# pending or the oldest has waited this long, whichever comes first
+INGEST_BATCH_ROWS = 1000
+INGEST_FLUSH_SECONDS = 1.0
+
+_local = threading.local()
+_pool_lock = threading.Lock()
+_idle_connections = {}  # db path -> [sqlite3.Connection]
+
+class _HeldConnection:
+    """A thread's claim on a connection; returns it to the pool when the thread exits."""
+
+    def __init__(self, path, conn):
+        self.conn = conn
+        weakref.finalize(self, _release_connection, path, conn)
+
+def _open_connection(path):
+    # isolation_level=None: transactions are opened explicitly by transaction()
+    conn = sqlite3.connect(
+        path,
+        timeout=BUSY_TIMEOUT_SECONDS,
+        isolation_level=None,
+        check_same_thread=False,
+        cached_statements=STATEMENT_CACHE_SIZE,
+    )
+    for pragma, value in PRAGMAS.items():
+        conn.execute(f"PRAGMA {pragma} = {value}")
+    return conn
+
+def _release_connection(path, conn):
+    try:
+        if conn.in_transaction:
+            conn.rollback()
+    except sqlite3.ProgrammingError:
+        return  # already closed
+    with _pool_lock:
+        idle = _idle_connections.setdefault(path, [])
+        if len(idle) < POOL_MAX_IDLE:
+            idle.append(conn)
+            return
     conn.close()
+
+def get_connection():
+    """Returns the calling thread's long-lived connection to DB_NAME."""
+    held = getattr(_local, "held", None)
+    if held is None:
+        held = _local.held = {}
+    claim = held.get(DB_NAME)
+    if claim is None:
+        with _pool_lock:
+            idle = _idle_connections.get(DB_NAME)
+            conn = idle.pop() if idle else None
+        if conn is None:
+            conn = _open_connection(DB_NAME)
+        claim = held[DB_NAME] = _HeldConnection(DB_NAME, conn)
+    return claim.conn
+
+@contextmanager
+def transaction():
+    """
+    Runs a block as one write transaction on this thread's connection.
+
+    BEGIN IMMEDIATE takes the write lock up front, so concurrent writers wait
+    on the busy timeout instead of failing mid-transaction. Commits on success
+    and rolls back on any exception.
+    """
+    conn = get_connection()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        yield conn.cursor()
+    except BaseException:
+        conn.rollback()
+        raise
+    conn.commit()
+
+def close_connections():
+    """Closes every pooled connection and this thread's own connections."""
+    held = getattr(_local, "held", None)
+    if held:
+        for claim in held.values():
+            claim.conn.close()
+        held.clear()
+    with _pool_lock:
+        for idle in _idle_connections.values():
+            for conn in idle:
+                conn.close()
+        _idle_connections.clear()
+
+# --- Change Notifications ---
+# In-process listeners are called (with no arguments) after a commit that
+# edited stock or added sales, so a background consumer can wake up instead of
+# waiting for its next poll. They carry no data: consumers read the
+# stock_changes feed and the sales high-water mark, which also cover writers
+# in other processes.
+_listeners = []
+_listeners_lock = threading.Lock()
+
+def subscribe(callback):
+    """Registers callback() to run after stock edits and new sales. Returns it."""
+    with _listeners_lock:
+        _listeners.append(callback)
+    return callback
+
+def unsubscribe(callback):
+    with _listeners_lock:
+        if callback in _listeners:
+            _listeners.remove(callback)
+
+def _notify():
+    with _listeners_lock:
+        listeners = list(_listeners)
+    for callback in listeners:
+        try:
+            callback()
+        except Exception:
+            pass  # the write has already committed; a broken listener must not fail it
+
+# --- Schema Migrations ---
+# Rollup days are integer days since 1970-01-01, so the regression sums
+# stay exact INTEGER arithmetic inside SQLite.
+EPOCH = datetime(1970, 1, 1)
+
+def _sql_day(column):
+    return f"CAST(julianday({column}) - 2440587.5 AS INTEGER)"
+
+BASE_SCHEMA = '''
+    CREATE TABLE IF NOT EXISTS inventory (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        product_name TEXT NOT NULL,
+        category TEXT,
+        current_stock INTEGER,
+        reorder_point INTEGER,
+        unit_cost REAL,
+        selling_price REAL
+    );
+
+    CREATE TABLE IF NOT EXISTS sales (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        product_id INTEGER,
+        sale_date DATE,
+        quantity_sold INTEGER,
+        FOREIGN KEY (product_id) REFERENCES inventory (id)
+    );
+'''
+
+SALES_ROLLUP_SCHEMA = f'''
+    CREATE TABLE IF NOT EXISTS sales_daily (
+        product_id INTEGER NOT NULL,
+        day INTEGER NOT NULL,
+        quantity_sold INTEGER NOT NULL DEFAULT 0,
+        sales_count INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (product_id, day)
+    ) WITHOUT ROWID;
+
+    CREATE TABLE IF NOT EXISTS sales_stats (
+        product_id INTEGER PRIMARY KEY,
+        n INTEGER NOT NULL,
+        sum_x INTEGER NOT NULL,
+        sum_y INTEGER NOT NULL,
+        sum_xy INTEGER NOT NULL,
+        sum_xx INTEGER NOT NULL,
+        first_day INTEGER,
+        last_day INTEGER
+    );
+
+    -- sales -> sales_daily
+    CREATE TRIGGER IF NOT EXISTS sales_rollup_insert AFTER INSERT ON sales
+    WHEN NEW.sale_date IS NOT NULL
+    BEGIN
+        INSERT INTO sales_daily (product_id, day, quantity_sold, sales_count)
+        VALUES (NEW.product_id, {_sql_day("NEW.sale_date")}, COALESCE(NEW.quantity_sold, 0), 1)
+        ON CONFLICT (product_id, day) DO UPDATE SET
+            quantity_sold = quantity_sold + excluded.quantity_sold,
+            sales_count = sales_count + 1;
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS sales_rollup_delete AFTER DELETE ON sales
+    WHEN OLD.sale_date IS NOT NULL
+    BEGIN
+        UPDATE sales_daily
+        SET quantity_sold = quantity_sold - COALESCE(OLD.quantity_sold, 0),
+            sales_count = sales_count - 1
+        WHERE product_id = OLD.product_id AND day = {_sql_day("OLD.sale_date")};
+        DELETE FROM sales_daily
+        WHERE product_id = OLD.product_id AND day = {_sql_day("OLD.sale_date")} AND sales_count <= 0;
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS sales_rollup_update
+    AFTER UPDATE OF product_id, sale_date, quantity_sold ON sales
+    BEGIN
+        UPDATE sales_daily
+        SET quantity_sold = quantity_sold - COALESCE(OLD.quantity_sold, 0),
+            sales_count = sales_count - 1
+        WHERE product_id = OLD.product_id AND day = {_sql_day("OLD.sale_date")};
+        DELETE FROM sales_daily
+        WHERE product_id = OLD.product_id AND day = {_sql_day("OLD.sale_date")} AND sales_count <= 0;
+        INSERT INTO sales_daily (product_id, day, quantity_sold, sales_count)
+        SELECT NEW.product_id, {_sql_day("NEW.sale_date")}, COALESCE(NEW.quantity_sold, 0), 1
+        WHERE NEW.sale_date IS NOT NULL
+        ON CONFLICT (product_id, day) DO UPDATE SET
+            quantity_sold = quantity_sold + excluded.quantity_sold,
+            sales_count = sales_count + 1;
+    END;
+
+    -- sales_daily -> sales_stats (x = day, y = daily quantity)
+    CREATE TRIGGER IF NOT EXISTS sales_stats_insert AFTER INSERT ON sales_daily
+    BEGIN
+        INSERT INTO sales_stats (product_id, n, sum_x, sum_y, sum_xy, sum_xx, first_day, last_day)
+        VALUES (NEW.product_id, 1, NEW.day, NEW.quantity_sold, NEW.day * NEW.quantity_sold,
+                NEW.day * NEW.day, NEW.day, NEW.day)
+        ON CONFLICT (product_id) DO UPDATE SET
+            n = n + 1,
+            sum_x = sum_x + excluded.sum_x,
+            sum_y = sum_y + excluded.sum_y,
+            sum_xy = sum_xy + excluded.sum_xy,
+            sum_xx = sum_xx + excluded.sum_xx,
+            first_day = MIN(first_day, excluded.first_day),
+            last_day = MAX(last_day, excluded.last_day);
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS sales_stats_update AFTER UPDATE OF quantity_sold ON sales_daily
+    BEGIN
+        UPDATE sales_stats
+        SET sum_y = sum_y + NEW.quantity_sold - OLD.quantity_sold,
+            sum_xy = sum_xy + NEW.day * (NEW.quantity_sold - OLD.quantity_sold)
+        WHERE product_id = NEW.product_id;
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS sales_stats_delete AFTER DELETE ON sales_daily
+    BEGIN
+        UPDATE sales_stats
+        SET n = n - 1,
+            sum_x = sum_x - OLD.day,
+            sum_y = sum_y - OLD.quantity_sold,
+            sum_xy = sum_xy - OLD.day * OLD.quantity_sold,
+            sum_xx = sum_xx - OLD.day * OLD.day,
+            first_day = (SELECT MIN(day) FROM sales_daily WHERE product_id = OLD.product_id),
+            last_day = (SELECT MAX(day) FROM sales_daily WHERE product_id = OLD.product_id)
+        WHERE product_id = OLD.product_id;
+    END;
+'''
+
+# Backfill for databases that already had sales before the rollup existed
+SALES_ROLLUP_BACKFILL = f'''
+    INSERT INTO sales_daily (product_id, day, quantity_sold, sales_count)
+    SELECT product_id, {_sql_day("sale_date")}, SUM(COALESCE(quantity_sold, 0)), COUNT(*)
+    FROM sales
+    WHERE sale_date IS NOT NULL AND NOT EXISTS (SELECT 1 FROM sales_daily)
+    GROUP BY 1, 2;
+'''
+
+# Rollup triggers skip sale dates SQLite cannot parse (julianday() is NULL),
+# as sales accepted any text before the rollup existed. The all-history
+# regression sums were only ever read by tests; windowed reads aggregate
+# sales_daily, so sales_stats keeps just what marks a product as having
+# history. The table is rebuilt rather than altered so the script stays
+# idempotent.
+SALES_ROLLUP_V2 = f'''
+    DROP TRIGGER IF EXISTS sales_rollup_insert;
+    DROP TRIGGER IF EXISTS sales_rollup_delete;
+    DROP TRIGGER IF EXISTS sales_rollup_update;
+    DROP TRIGGER IF EXISTS sales_stats_insert;
+    DROP TRIGGER IF EXISTS sales_stats_update;
+    DROP TRIGGER IF EXISTS sales_stats_delete;
+
+    DROP TABLE IF EXISTS sales_stats_rebuild;
+    CREATE TABLE sales_stats_rebuild (
+        product_id INTEGER PRIMARY KEY,
+        n INTEGER NOT NULL,                     -- days with sales
+        first_day INTEGER,
+        last_day INTEGER
+    );
+    INSERT INTO sales_stats_rebuild (product_id, n, first_day, last_day)
+    SELECT product_id, n, first_day, last_day FROM sales_stats;
+    DROP TABLE sales_stats;
+    ALTER TABLE sales_stats_rebuild RENAME TO sales_stats;
+
+    -- sales -> sales_daily
+    CREATE TRIGGER sales_rollup_insert AFTER INSERT ON sales
+    WHEN julianday(NEW.sale_date) IS NOT NULL
+    BEGIN
+        INSERT INTO sales_daily (product_id, day, quantity_sold, sales_count)
+        VALUES (NEW.product_id, {_sql_day("NEW.sale_date")}, COALESCE(NEW.quantity_sold, 0), 1)
+        ON CONFLICT (product_id, day) DO UPDATE SET
+            quantity_sold = quantity_sold + excluded.quantity_sold,
+            sales_count = sales_count + 1;
+    END;
+
+    CREATE TRIGGER sales_rollup_delete AFTER DELETE ON sales
+    WHEN julianday(OLD.sale_date) IS NOT NULL
+    BEGIN
+        UPDATE sales_daily
+        SET quantity_sold = quantity_sold - COALESCE(OLD.quantity_sold, 0),
+            sales_count = sales_count - 1
+        WHERE product_id = OLD.product_id AND day = {_sql_day("OLD.sale_date")};
+        DELETE FROM sales_daily
+        WHERE product_id = OLD.product_id AND day = {_sql_day("OLD.sale_date")} AND sales_count <= 0;
+    END;
+
+    CREATE TRIGGER sales_rollup_update
+    AFTER UPDATE OF product_id, sale_date, quantity_sold ON sales
+    BEGIN
+        UPDATE sales_daily
+        SET quantity_sold = quantity_sold - COALESCE(OLD.quantity_sold, 0),
+            sales_count = sales_count - 1
+        WHERE product_id = OLD.product_id AND day = {_sql_day("OLD.sale_date")};
+        DELETE FROM sales_daily
+        WHERE product_id = OLD.product_id AND day = {_sql_day("OLD.sale_date")} AND sales_count <= 0;
+        INSERT INTO sales_daily (product_id, day, quantity_sold, sales_count)
+        SELECT NEW.product_id, {_sql_day("NEW.sale_date")}, COALESCE(NEW.quantity_sold, 0), 1
+        WHERE julianday(NEW.sale_date) IS NOT NULL
+        ON CONFLICT (product_id, day) DO UPDATE SET
+            quantity_sold = quantity_sold + excluded.quantity_sold,
+            sales_count = sales_count + 1;
+    END;
+
+    -- sales_daily -> sales_stats
+    CREATE TRIGGER sales_stats_insert AFTER INSERT ON sales_daily
+    BEGIN
+        INSERT INTO sales_stats (product_id, n, first_day, last_day)
+        VALUES (NEW.product_id, 1, NEW.day, NEW.day)
+        ON CONFLICT (product_id) DO UPDATE SET
+            n = n + 1,
+            first_day = MIN(first_day, excluded.first_day),
+            last_day = MAX(last_day, excluded.last_day);
+    END;
+
+    CREATE TRIGGER sales_stats_delete AFTER DELETE ON sales_daily
+    BEGIN
+        UPDATE sales_stats
+        SET n = n - 1,
+            first_day = (SELECT MIN(day) FROM sales_daily WHERE product_id = OLD.product_id),
+            last_day = (SELECT MAX(day) FROM sales_daily WHERE product_id = OLD.product_id)
+        WHERE product_id = OLD.product_id;
+    END;
+'''
+
+SCHEMA_INDEXES = '''
+    -- Per-product history lookups
+    CREATE INDEX IF NOT EXISTS idx_sales_product_date ON sales (product_id, sale_date);
+    -- Runway queries: trailing-window scans over raw sales, answered from the index alone
+    CREATE INDEX IF NOT EXISTS idx_sales_date_covering ON sales (sale_date, product_id, quantity_sold);
+    CREATE INDEX IF NOT EXISTS idx_inventory_category ON inventory (category);
+'''
+
+# Paginated grid: every sortable column gets a (column, id) index so a page
+# is read in order without sorting the catalog (product_name and category
+# already have one, with the rowid as the tie-breaker). The partial index
+# serves the below-reorder filter, and a trigram FTS5 index over
+# product_name answers substring search, kept in sync by triggers.
+INVENTORY_PAGE_SCHEMA = '''
+    CREATE INDEX IF NOT EXISTS idx_inventory_current_stock ON inventory (current_stock, id);
+    CREATE INDEX IF NOT EXISTS idx_inventory_reorder_point ON inventory (reorder_point, id);
+    CREATE INDEX IF NOT EXISTS idx_inventory_unit_cost ON inventory (unit_cost, id);
+    CREATE INDEX IF NOT EXISTS idx_inventory_selling_price ON inventory (selling_price, id);
+    CREATE INDEX IF NOT EXISTS idx_inventory_below_reorder ON inventory (id) WHERE current_stock < reorder_point;
+
+    CREATE VIRTUAL TABLE IF NOT EXISTS inventory_search USING fts5(
+        product_name, content='inventory', content_rowid='id', tokenize='trigram'
+    );
+    CREATE TRIGGER IF NOT EXISTS inventory_search_insert AFTER INSERT ON inventory
+    BEGIN
+        INSERT INTO inventory_search (rowid, product_name) VALUES (NEW.id, NEW.product_name);
+    END;
+    CREATE TRIGGER IF NOT EXISTS inventory_search_delete AFTER DELETE ON inventory
+    BEGIN
+        INSERT INTO inventory_search (inventory_search, rowid, product_name) VALUES ('delete', OLD.id, OLD.product_name);
+    END;
+    CREATE TRIGGER IF NOT EXISTS inventory_search_update AFTER UPDATE OF product_name ON inventory
+    BEGIN
+        INSERT INTO inventory_search (inventory_search, rowid, product_name) VALUES ('delete', OLD.id, OLD.product_name);
+        INSERT INTO inventory_search (rowid, product_name) VALUES (NEW.id, NEW.product_name);
+    END;
+    INSERT INTO inventory_search (inventory_search) VALUES ('rebuild');
+'''
+
+# Dashboard summary: per-product runway/status derived from the last fitted
+# burn rate, and one row of running totals the landing view reads directly.
+# Thresholds match the grid's Health column (runway rounded to 0.1 day).
+DASHBOARD_CRITICAL_DAYS = 7
+DASHBOARD_WARNING_DAYS = 30
+DASHBOARD_TOP_K = 8
+
+def _runway_sql(stock, burn):
+    return f"CASE WHEN {burn} > 0 THEN ROUND({stock} / {burn}, 1) END"
+
+def _status_sql(runway):
+    return (f"CASE WHEN {runway} < {DASHBOARD_CRITICAL_DAYS} THEN 'Critical' "
+            f"WHEN {runway} < {DASHBOARD_WARNING_DAYS} THEN 'Warning' ELSE 'Healthy' END")
+
+def _summary_delta_sql(row, sign):
+    return f'''
+        UPDATE dashboard_summary SET
+            products = products {sign} 1,
+            critical_count = critical_count {sign} ({row}.status = 'Critical'),
+            warning_count = warning_count {sign} ({row}.status = 'Warning'),
+            healthy_count = healthy_count {sign} ({row}.status = 'Healthy'),
+            below_reorder_count = below_reorder_count {sign} {row}.below_reorder,
+            total_value = total_value {sign} {row}.stock_value,
+            value_at_risk = value_at_risk {sign} (CASE WHEN {row}.status IN ('Critical', 'Warning') THEN {row}.stock_value ELSE 0 END)
+        WHERE id = 1;
+    '''
+
+_NEW_RUNWAY = _runway_sql("NEW.current_stock", "burn_rate")
+
+DASHBOARD_SCHEMA = f'''
+    CREATE TABLE IF NOT EXISTS product_metrics (
+        product_id INTEGER PRIMARY KEY,
+        burn_rate REAL,                         -- unrounded; NULL = no sales in the window
+        runway REAL,                            -- NULL = no stockout expected
+        status TEXT NOT NULL,
+        stock_value REAL NOT NULL,
+        below_reorder INTEGER NOT NULL,
+        fitted INTEGER NOT NULL DEFAULT 0       -- 0 until refresh_dashboard_metrics fits it
+    );
+    CREATE INDEX IF NOT EXISTS idx_product_metrics_burn ON product_metrics (burn_rate);
+
+    CREATE TABLE IF NOT EXISTS dashboard_summary (
+        id INTEGER PRIMARY KEY CHECK (id = 1),
+        products INTEGER NOT NULL DEFAULT 0,
+        critical_count INTEGER NOT NULL DEFAULT 0,
+        warning_count INTEGER NOT NULL DEFAULT 0,
+        healthy_count INTEGER NOT NULL DEFAULT 0,
+        below_reorder_count INTEGER NOT NULL DEFAULT 0,
+        total_value REAL NOT NULL DEFAULT 0,
+        value_at_risk REAL NOT NULL DEFAULT 0,
+        sales_hwm INTEGER,                      -- burn rates reflect sales up to this id
+        as_of_day INTEGER                       -- ... and this window end (epoch day)
+    );
+    INSERT OR IGNORE INTO dashboard_summary (id) VALUES (1);
+
+    -- inventory -> product_metrics (stock edits re-derive runway from the stored burn rate)
+    CREATE TRIGGER IF NOT EXISTS inventory_metrics_insert AFTER INSERT ON inventory
+    BEGIN
+        INSERT INTO product_metrics (product_id, burn_rate, runway, status, stock_value, below_reorder, fitted)
+        VALUES (NEW.id, NULL, NULL, 'Healthy', COALESCE(NEW.current_stock * NEW.unit_cost, 0),
+                COALESCE(NEW.current_stock < NEW.reorder_point, 0), 0)
+        ON CONFLICT (product_id) DO NOTHING;
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS inventory_metrics_update
+    AFTER UPDATE OF current_stock, reorder_point, unit_cost ON inventory
+    BEGIN
+        UPDATE product_metrics SET
+            runway = {_NEW_RUNWAY},
+            status = {_status_sql(_NEW_RUNWAY)},
+            stock_value = COALESCE(NEW.current_stock * NEW.unit_cost, 0),
+            below_reorder = COALESCE(NEW.current_stock < NEW.reorder_point, 0)
+        WHERE product_id = NEW.id;
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS inventory_metrics_delete AFTER DELETE ON inventory
+    BEGIN
+        DELETE FROM product_metrics WHERE product_id = OLD.id;
+    END;
+
+    -- product_metrics -> dashboard_summary
+    CREATE TRIGGER IF NOT EXISTS product_metrics_insert AFTER INSERT ON product_metrics
+    BEGIN {_summary_delta_sql("NEW", "+")} END;
+
+    CREATE TRIGGER IF NOT EXISTS product_metrics_delete AFTER DELETE ON product_metrics
+    BEGIN {_summary_delta_sql("OLD", "-")} END;
+
+    CREATE TRIGGER IF NOT EXISTS product_metrics_update
+    AFTER UPDATE OF status, stock_value, below_reorder ON product_metrics
+    BEGIN {_summary_delta_sql("OLD", "-")} {_summary_delta_sql("NEW", "+")} END;
+
+    -- Existing products start unfitted; the first refresh fills in burn rates
+    INSERT OR IGNORE INTO product_metrics (product_id, burn_rate, runway, status, stock_value, below_reorder, fitted)
+    SELECT id, NULL, NULL, 'Healthy', COALESCE(current_stock * unit_cost, 0),
+           COALESCE(current_stock < reorder_point, 0), 0
+    FROM inventory;
+'''
+
+# Recomputes the running totals from product_metrics (drops float drift)
+DASHBOARD_SUMMARY_REBUILD = '''
+    UPDATE dashboard_summary SET
+        (products, critical_count, warning_count, healthy_count, below_reorder_count, total_value, value_at_risk) = (
+            SELECT COUNT(*),
+                   COALESCE(SUM(status = 'Critical'), 0),
+                   COALESCE(SUM(status = 'Warning'), 0),
+                   COALESCE(SUM(status = 'Healthy'), 0),
+                   COALESCE(SUM(below_reorder), 0),
+                   COALESCE(SUM(stock_value), 0),
+                   COALESCE(SUM(CASE WHEN status IN ('Critical', 'Warning') THEN stock_value ELSE 0 END), 0)
+            FROM product_metrics
+        )
+    WHERE id = 1
+'''
+
+# Batch forecasts written by engine.batch_forecast. Each product's current
+# forecast is its row with the highest run_id; current_stock records the
+# stock the runway was computed from so stale rows can be detected.
+FORECAST_SCHEMA = '''
+    CREATE TABLE IF NOT EXISTS forecast_runs (
+        run_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        started_at TEXT NOT NULL,
+        finished_at TEXT NOT NULL,
+        mode TEXT NOT NULL,                     -- 'full' or 'incremental'
+        products INTEGER NOT NULL,
+        workers INTEGER NOT NULL,
+        sales_hwm INTEGER NOT NULL,             -- sales up to this id were included
+        as_of_day INTEGER NOT NULL              -- window end (epoch day)
+    );
+
+    CREATE TABLE IF NOT EXISTS forecasts (
+        product_id INTEGER NOT NULL,
+        run_id INTEGER NOT NULL,
+        burn_rate REAL,
+        days_to_stockout REAL,
+        status TEXT,
+        current_stock INTEGER,
+        PRIMARY KEY (product_id, run_id)
+    ) WITHOUT ROWID;
+'''
+
+# Stockout alerts (engine.alerts). stock_changes is a change feed of stock
+# edits, fed by triggers so writers in any process are seen; alert_state holds
+# each product's current alert level and alerts the recorded crossings.
+ALERTS_SCHEMA = '''
+    CREATE TABLE IF NOT EXISTS stock_changes (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        product_id INTEGER NOT NULL
+    );
+
+    CREATE TRIGGER IF NOT EXISTS inventory_stock_change_insert AFTER INSERT ON inventory
+    BEGIN
+        INSERT INTO stock_changes (product_id) VALUES (NEW.id);
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS inventory_stock_change_update AFTER UPDATE OF current_stock ON inventory
+    WHEN NEW.current_stock IS NOT OLD.current_stock
+    BEGIN
+        INSERT INTO stock_changes (product_id) VALUES (NEW.id);
+    END;
+
+    CREATE TABLE IF NOT EXISTS alert_state (
+        product_id INTEGER PRIMARY KEY,
+        status TEXT NOT NULL,                   -- 'Healthy', 'Warning' or 'Critical'
+        runway REAL,                            -- NULL = no stockout expected
+        burn_rate REAL,
+        evaluated_at TEXT NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS idx_alert_state_status ON alert_state (status, runway);
+
+    CREATE TABLE IF NOT EXISTS alerts (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        product_id INTEGER NOT NULL,
+        created_at TEXT NOT NULL,
+        from_status TEXT NOT NULL,
+        to_status TEXT NOT NULL,
+        runway REAL,
+        burn_rate REAL,
+        current_stock INTEGER
+    );
+    CREATE INDEX IF NOT EXISTS idx_alerts_product ON alerts (product_id, id);
+'''
+
+# (version, description, script). Append new migrations; never edit shipped ones.
+MIGRATIONS = [
+    (1, "inventory and sales tables", BASE_SCHEMA),
+    (2, "sales_daily / sales_stats rollup", SALES_ROLLUP_SCHEMA + SALES_ROLLUP_BACKFILL),
+    (3, "indexes for per-product, date-window and category queries", SCHEMA_INDEXES),
+    (4, "product name index for imports",
+     "CREATE INDEX IF NOT EXISTS idx_inventory_product_name ON inventory (product_name);"),
+    (5, "product_metrics / dashboard_summary", DASHBOARD_SCHEMA),
+    (6, "forecast_runs / forecasts for batch forecasting", FORECAST_SCHEMA),
+    (7, "stock_changes / alert_state / alerts for stockout alerting", ALERTS_SCHEMA),
+    (8, "keep only each product's latest forecast", '''
+        DELETE FROM forecasts
+        WHERE run_id < (SELECT MAX(run_id) FROM forecasts latest WHERE latest.product_id = forecasts.product_id);
+     '''),
+    (9, "rollup skips unparsable sale dates; sales_stats without running sums", SALES_ROLLUP_V2),
+    (10, "sort, below-reorder and name search indexes for the paginated grid", INVENTORY_PAGE_SCHEMA),
+]
+
+@telemetry.instrumented("db.init_db")
+def init_db():
+    """Initializes the SQLite database, applies pending migrations and seeds demo data."""
+    migrate()
     
     if is_db_empty():
         mock_data()
 
+def migrate():
+    """
+    Applies pending schema migrations in order and records each in schema_version.
+
+    Every migration runs as one script inside its own write transaction,
+    rolled back if any statement fails.
+    Scripts are idempotent (IF NOT EXISTS, guarded backfills), so databases
+    created before versioning existed and two sessions racing to upgrade the
+    same file both end up at the latest version.
+
+    Returns:
+        int: The schema version after migrating.
+    """
+    conn = get_connection()
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INTEGER PRIMARY KEY,
+            description TEXT,
+            applied_at TEXT
+        )
+    ''')
+    current = get_schema_version()
+    for version, description, script in MIGRATIONS:
+        if version <= current:
+            continue
+        description = description.replace("'", "''")
+        try:
+            conn.executescript(f'''
+                BEGIN IMMEDIATE;
+                {script}
+                INSERT OR IGNORE INTO schema_version (version, description, applied_at)
+                VALUES ({version}, '{description}', datetime('now'));
+                COMMIT;
+            ''')
+        except BaseException:
+            # A failed statement leaves the script's transaction open on this
+            # pooled connection; the next transaction() would refuse to BEGIN
+            if conn.in_transaction:
+                conn.rollback()
+            raise
+    return get_schema_version()
+
+def get_schema_version():
+    return get_connection().execute("SELECT COALESCE(MAX(version), 0) FROM schema_version").fetchone()[0]
+
 def is_db_empty():
-    conn = sqlite3.connect(DB_NAME)
-    cursor = conn.cursor()
+    cursor = get_connection().cursor()
     cursor.execute("SELECT count(*) FROM inventory")
     count = cursor.fetchone()[0]
-    conn.close()
     return count == 0
 
 def mock_data():
@@ -89,58 +734,1261 @@ def mock_data():
         ("Dyson Purifier Cool Gen1", "Office Environment", 10, 5, 350.00, 550.00)
     ]
     
-    conn = sqlite3.connect(DB_NAME)
-    cursor = conn.cursor()
-    
-    for prod in products:
-        cursor.execute('''
+    # Mock sales for the last 60 days: random daily quantities, slightly
+    # higher for accessories, with a 30% chance of a zero-sales day
+    rng = np.random.default_rng()
+    days = 60
+    max_qty = np.array([8 if prod[1] == "Accessories" else 3 for prod in products])
+    qty = rng.integers(0, max_qty[:, None] + 1, size=(len(products), days))
+    qty[rng.random(qty.shape) > 0.7] = 0
+    dates = [(datetime.now() - timedelta(days=i)).strftime('%Y-%m-%d') for i in range(days)]
+
+    with transaction() as cursor:
+        cursor.executemany('''
             INSERT INTO inventory (product_name, category, current_stock, reorder_point, unit_cost, selling_price)
             VALUES (?, ?, ?, ?, ?, ?)
-        ''', prod)
-        
-        product_id = cursor.lastrowid
-        
-        # Mock sales for last 60 days
-        for i in range(60):
-            date = (datetime.now() - timedelta(days=i)).strftime('%Y-%m-%d')
-            # Random sales, slightly higher for accessories
-            max_qty = 8 if prod[1] == "Accessories" else 3
-            qty = random.randint(0, max_qty)
-            if random.random() > 0.7: # 30% chance of 0 sales
-                qty = 0
-                
-            cursor.execute('''
-                INSERT INTO sales (product_id, sale_date, quantity_sold)
-                VALUES (?, ?, ?)
-            ''', (product_id, date, qty))
-            
-    conn.commit()
-    conn.close()
+        ''', products)
+        first_id = cursor.execute("SELECT MAX(id) FROM inventory").fetchone()[0] - len(products) + 1
+        cursor.executemany('''
+            INSERT INTO sales (product_id, sale_date, quantity_sold)
+            VALUES (?, ?, ?)
+        ''', ((first_id + p, dates[i], int(qty[p, i])) for p in range(len(products)) for i in range(days)))
 
-def get_inventory_df():
-    conn = sqlite3.connect(DB_NAME)
-    df = pd.read_sql_query("SELECT * FROM inventory", conn)
-    conn.close()
+# Tables derived from inventory and sales; a bulk replace clears them with
+# the data so no forecast, alert level or alert outlives its product id
+DERIVED_TABLES = ('sales_daily', 'sales_stats', 'forecasts', 'forecast_runs', 'stock_changes', 'alert_state', 'alerts')
+
+def _clear_dataset(cursor):
+    """Deletes inventory, sales and everything derived from them; the dashboard is refitted on the next refresh."""
+    for table in ('sales', 'inventory', *DERIVED_TABLES):
+        cursor.execute(f"DELETE FROM {table}")
+    cursor.execute("UPDATE dashboard_summary SET sales_hwm = NULL, as_of_day = NULL WHERE id = 1")
+
+def _bulk_load_objects(cursor):
+    """Returns (name, sql) for the sales indexes and rollup triggers a bulk load drops."""
+    return cursor.execute('''
+        SELECT name, type, sql FROM sqlite_master
+        WHERE tbl_name IN ('sales', 'sales_daily') AND type IN ('index', 'trigger') AND sql IS NOT NULL
+    ''').fetchall()
+
+@telemetry.instrumented("db.generate_synthetic_data")
+def generate_synthetic_data(n_products, n_days, seed=None, distribution='poisson', base_demand=2.0,
+                            demand_spread=0.5, dispersion=2.0, weekly_seasonality=0.0,
+                            yearly_seasonality=0.0, trend=0.0, sparsity=0.0, n_categories=20,
+                            end_date=None, replace=True, chunk_rows=SYNTHETIC_CHUNK_ROWS):
+    """
+    Bulk-loads a synthetic catalog of n_products with n_days of daily sales.
+
+    Demand is generated with NumPy per block of products: each product gets a
+    log-normal base rate, shaped by a linear trend and weekly / yearly
+    seasonality, then sampled from the chosen count distribution. Rows are
+    written with executemany in chunks inside a single transaction. The sales
+    indexes and rollup triggers are dropped for the load and recreated after;
+    sales_daily and sales_stats are filled from the same arrays instead of
+    paying two trigger upserts per sales row.
+
+    The same seed always produces the same database contents.
+
+    Args:
+        n_products: Number of products to create.
+        n_days: Days of sales history per product, ending at end_date.
+        seed: Seed for numpy.random.default_rng; None for fresh entropy.
+        distribution: 'poisson' or 'negative_binomial' daily quantities.
+        base_demand: Median daily demand across products.
+        demand_spread: Sigma of the log-normal spread of base demand.
+        dispersion: Negative binomial shape; lower values are burstier.
+        weekly_seasonality: Amplitude (0-1) of the day-of-week cycle.
+        yearly_seasonality: Amplitude (0-1) of the annual cycle.
+        trend: Mean relative change in demand per day (e.g. 0.002 = +0.2%/day).
+        sparsity: Fraction of product-days with no sales row at all.
+        n_categories: Number of distinct product categories.
+        end_date: Last sales day (defaults to today).
+        replace: Delete existing inventory and sales, and the forecasts, alerts
+            and dashboard fit derived from them, first; otherwise append.
+        chunk_rows: Sales rows generated and inserted per executemany call.
+
+    Returns:
+        dict: {'products': rows inserted into inventory, 'sales': rows inserted into sales}
+    """
+    if distribution not in SYNTHETIC_DISTRIBUTIONS:
+        raise ValueError(f"distribution must be one of {SYNTHETIC_DISTRIBUTIONS}, got {distribution!r}")
+    if not 0 <= sparsity < 1:
+        raise ValueError("sparsity must be in [0, 1)")
+
+    rng = np.random.default_rng(seed)
+    end = pd.Timestamp(end_date or datetime.now()).normalize()
+    calendar = pd.date_range(end=end, periods=n_days, freq='D')
+    dates = calendar.strftime('%Y-%m-%d').tolist()
+    days = ((calendar - EPOCH).days).to_numpy(dtype=np.int64)
+    t = np.arange(n_days)
+    season = np.ones(n_days)
+    if weekly_seasonality:
+        season *= 1 + weekly_seasonality * np.sin(2 * np.pi * calendar.dayofweek.to_numpy() / 7)
+    if yearly_seasonality:
+        season *= 1 + yearly_seasonality * np.sin(2 * np.pi * calendar.dayofyear.to_numpy() / 365.25)
+
+    base = base_demand * rng.lognormal(0.0, demand_spread, n_products)
+    slope = rng.normal(trend, abs(trend) / 2, n_products) if trend else np.zeros(n_products)
+    unit_cost = np.round(rng.lognormal(4.5, 1.0, n_products), 2)
+    products = pd.DataFrame({
+        'product_name': [f"SKU-{i:07d}" for i in range(n_products)],
+        'category': [f"Category {i % n_categories:02d}" for i in range(n_products)],
+        'current_stock': np.round(base * rng.uniform(0, 60, n_products)).astype(int),
+        'reorder_point': np.maximum(1, np.round(base * rng.uniform(5, 15, n_products))).astype(int),
+        'unit_cost': unit_cost,
+        'selling_price': np.round(unit_cost * rng.uniform(1.2, 2.0, n_products), 2),
+    })
+
+    block = max(1, chunk_rows // max(n_days, 1))
+    sales_rows = 0
+    with transaction() as cursor:
+        dropped = _bulk_load_objects(cursor)
+        for name, kind, _ in dropped:
+            cursor.execute(f'DROP {kind.upper()} "{name}"')
+        if replace:
+            _clear_dataset(cursor)
+            cursor.execute("DELETE FROM sqlite_sequence WHERE name IN ('sales', 'inventory')")
+
+        cursor.executemany('''
+            INSERT INTO inventory (product_name, category, current_stock, reorder_point, unit_cost, selling_price)
+            VALUES (?, ?, ?, ?, ?, ?)
+        ''', products.itertuples(index=False, name=None))
+        first_id = cursor.execute("SELECT MAX(id) FROM inventory").fetchone()[0] - n_products + 1
+
+        for start in range(0, n_products, block):
+            stop = min(start + block, n_products)
+            rate = base[start:stop, None] * season * np.clip(1 + slope[start:stop, None] * t, 0, None)
+            if distribution == 'negative_binomial':
+                rate = rate * rng.gamma(dispersion, 1 / dispersion, rate.shape)
+            qty = rng.poisson(rate)
+            keep = rng.random(qty.shape) >= sparsity if sparsity else np.ones(qty.shape, dtype=bool)
+            product_idx, day_idx = np.nonzero(keep)
+            product_ids = (product_idx + first_id + start).tolist()
+            quantities = qty[keep].tolist()
+            cursor.executemany(
+                "INSERT INTO sales (product_id, sale_date, quantity_sold) VALUES (?, ?, ?)",
+                zip(product_ids, [dates[d] for d in day_idx.tolist()], quantities)
+            )
+            sales_rows += len(product_ids)
+
+            # Every generated row is the only sale for a new product on that
+            # day, so the rollup rows follow directly from the same arrays
+            cursor.executemany(
+                "INSERT INTO sales_daily (product_id, day, quantity_sold, sales_count) VALUES (?, ?, ?, 1)",
+                zip(product_ids, days[day_idx].tolist(), quantities)
+            )
+            has_sales = keep.any(axis=1)
+            cursor.executemany(
+                "INSERT INTO sales_stats (product_id, n, first_day, last_day) VALUES (?, ?, ?, ?)",
+                zip(*(column[has_sales].tolist() for column in (
+                    np.arange(start, stop) + first_id, keep.sum(axis=1),
+                    days[keep.argmax(axis=1)], days[n_days - 1 - keep[:, ::-1].argmax(axis=1)]
+                )))
+            )
+
+        for _, _, sql in dropped:
+            cursor.execute(sql)
+
+    return {'products': n_products, 'sales': sales_rows}
+
+def _compact(df, int32=(), small_ints=(), categories=()):
+    """
+    Shrinks loader columns in place: int32 for ids and stock levels, the
+    smallest integer type that fits for quantities, and categoricals for
+    repeated strings. Columns holding NULLs keep the dtype pandas chose.
+    """
+    for column in int32:
+        values = df[column]
+        if not values.hasnans and (values.empty or values.abs().max() <= np.iinfo(np.int32).max):
+            df[column] = values.astype(np.int32)
+    for column in small_ints:
+        df[column] = pd.to_numeric(df[column], downcast='integer')
+    for column in categories:
+        df[column] = df[column].astype('category')
+    return df
+
+def memory_report(**frames):
+    """
+    Per-column memory footprint of the given frames (deep, i.e. including
+    string payloads), e.g. memory_report(inventory=inventory_df, sales=sales_df).
+
+    Returns:
+        pd.DataFrame: frame, column, dtype, rows, bytes; one total row per frame.
+    """
+    rows = []
+    for name, df in frames.items():
+        usage = df.memory_usage(deep=True, index=True)
+        for column, size in usage.items():
+            dtype = df.index.dtype if column == 'Index' else df[column].dtype
+            rows.append((name, column, str(dtype), len(df), int(size)))
+        rows.append((name, 'total', '', len(df), int(usage.sum())))
+    return pd.DataFrame(rows, columns=['frame', 'column', 'dtype', 'rows', 'bytes'])
+
+@telemetry.instrumented("db.get_inventory_df")
+def get_inventory_df(product_ids=None):
+    """
+    Returns the inventory as a compact frame: int32 id / current_stock /
+    reorder_point and categorical product_name / category.
+    """
+    if product_ids is None:
+        df = pd.read_sql_query("SELECT * FROM inventory", get_connection())
+    else:
+        df = pd.read_sql_query(
+            "SELECT * FROM inventory WHERE id IN (SELECT value FROM json_each(?)) ORDER BY id",
+            get_connection(), params=[json.dumps([int(pid) for pid in product_ids])]
+        )
+    df = _compact(df, int32=('id', 'current_stock', 'reorder_point'), categories=('product_name', 'category'))
+    telemetry.annotate(bytes=int(df.memory_usage(deep=True).sum()))
     return df
 
+@telemetry.instrumented("db.get_inventory_page")
+def get_inventory_page(page=0, page_size=50, search=None, category=None, below_reorder=False,
+                       sort_by='id', descending=False):
+    """
+    Returns one page of inventory with filtering, search and sorting done in SQL.
+
+    Every filter and sort column is indexed (see INVENTORY_PAGE_SCHEMA), so
+    a page reads its rows in order from an index instead of sorting the
+    catalog; the unfiltered total comes from dashboard_summary. Rows are
+    ordered by sort_by with id as the tie-breaker so pages are stable.
+    Search terms shorter than three characters cannot use the trigram index
+    and fall back to a LIKE scan.
+
+    Args:
+        page: Zero-based page number.
+        search: Case-insensitive substring of product_name.
+        category: Exact category to restrict to.
+        below_reorder: Only products with current_stock < reorder_point.
+        sort_by: One of INVENTORY_SORT_COLUMNS.
+
+    Returns:
+        tuple: (pd.DataFrame page, int total matching rows)
+    """
+    if sort_by not in INVENTORY_SORT_COLUMNS:
+        raise ValueError(f"sort_by must be one of {INVENTORY_SORT_COLUMNS}, got {sort_by!r}")
+    conditions, params = [], []
+    if search and len(search) >= 3:
+        conditions.append("id IN (SELECT rowid FROM inventory_search WHERE inventory_search MATCH ?)")
+        params.append('"' + search.replace('"', '""') + '"')  # one phrase: a substring for trigrams
+    elif search:
+        escaped = search.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+        conditions.append("product_name LIKE ? ESCAPE '\\'")
+        params.append(f"%{escaped}%")
+    if category:
+        conditions.append("category = ?")
+        params.append(category)
+    if below_reorder:
+        conditions.append("current_stock < reorder_point")
+    where = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+    direction = "DESC" if descending else "ASC"
+
+    conn = get_connection()
+    if conditions:
+        total = conn.execute(f"SELECT COUNT(*) FROM inventory{where}", params).fetchone()[0]
+    else:
+        total = conn.execute("SELECT products FROM dashboard_summary WHERE id = 1").fetchone()[0]
+    page_df = pd.read_sql_query(
+        f"SELECT * FROM inventory{where} ORDER BY {sort_by} {direction}, id {direction} LIMIT ? OFFSET ?",
+        conn, params=params + [page_size, max(page, 0) * page_size]
+    )
+    return page_df, total
+
+def get_inventory_categories():
+    """Distinct inventory categories, read from idx_inventory_category."""
+    rows = get_connection().execute(
+        "SELECT DISTINCT category FROM inventory WHERE category IS NOT NULL ORDER BY category"
+    ).fetchall()
+    return [row[0] for row in rows]
+
+@telemetry.instrumented("db.get_sales_df")
 def get_sales_df():
-    conn = sqlite3.connect(DB_NAME)
-    df = pd.read_sql_query("SELECT * FROM sales", conn)
-    conn.close()
+    """
+    Returns the whole sales table as a compact frame: int32 id / product_id,
+    the smallest integer type holding quantity_sold, and sale_date parsed
+    once to datetime64 so ml_logic never re-parses it.
+    """
+    df = pd.read_sql_query("SELECT * FROM sales", get_connection(),
+                           parse_dates={'sale_date': {'format': 'ISO8601'}})
+    df = _compact(df, int32=('id', 'product_id'), small_ints=('quantity_sold',))
+    telemetry.annotate(bytes=int(df.memory_usage(deep=True).sum()))
     return df
 
+@telemetry.instrumented("db.get_daily_sales_window")
+def get_daily_sales_window(window_days=30, product_ids=None, now=None):
+    """
+    Returns daily sales totals for the trailing window, aggregated in SQLite.
+
+    Filtering and GROUP BY happen in SQL (served by idx_sales_date_covering),
+    so only one row per product per day crosses into pandas, with sale_date
+    already parsed. The cutoff matches ml_logic: sale_date >= now - window.
+
+    Args:
+        window_days: Length of the trailing window in days.
+        product_ids: Optional iterable of product ids to restrict to.
+
+    Returns:
+        pd.DataFrame: product_id, sale_date (datetime64), quantity_sold.
+    """
+    cutoff = ((now or datetime.now()) - timedelta(days=window_days)).strftime('%Y-%m-%d %H:%M:%S')
+    sql = "SELECT product_id, sale_date, SUM(quantity_sold) AS quantity_sold FROM sales WHERE sale_date >= ?"
+    params = [cutoff]
+    if product_ids is not None:
+        # One JSON parameter instead of an IN list, so any number of ids binds
+        sql += " AND product_id IN (SELECT value FROM json_each(?))"
+        params.append(json.dumps([int(pid) for pid in product_ids]))
+    sql += " GROUP BY product_id, sale_date"
+    return pd.read_sql_query(sql, get_connection(), params=params, parse_dates=['sale_date'])
+
+def get_daily_demand(days=56, now=None, product_ids=None):
+    """
+    Returns the per-product daily totals of the last `days` days (today
+    included) straight from the sales_daily rollup, for ml_logic.demand_matrix.
+
+    Returns:
+        pd.DataFrame: product_id, day (integer days since 1970-01-01),
+        quantity_sold. Days without a sales row are absent.
+    """
+    first_day = ((now or datetime.now()).date() - EPOCH.date()).days - days + 1
+    sql = "SELECT product_id, day, quantity_sold FROM sales_daily WHERE day >= ?"
+    params = [first_day]
+    if product_ids is not None:
+        sql += " AND product_id IN (SELECT value FROM json_each(?))"
+        params.append(json.dumps([int(pid) for pid in product_ids]))
+    return pd.read_sql_query(sql, get_connection(), params=params)
+
+def get_sales_high_water_mark():
+    """Returns the highest sales row id (0 when empty); O(1) on the rowid b-tree."""
+    return get_connection().execute("SELECT COALESCE(MAX(id), 0) FROM sales").fetchone()[0]
+
+def get_products_sold_since(sales_id):
+    """Returns the ids of products with sales rows newer than `sales_id`."""
+    # No DISTINCT: SQLite would answer it by scanning a whole product index
+    # instead of the rowid range holding just the new rows.
+    rows = get_connection().execute(
+        "SELECT product_id FROM sales WHERE id > ?", (int(sales_id),)
+    ).fetchall()
+    return sorted({row[0] for row in rows})
+
+@telemetry.instrumented("db.get_sales_stats")
+def get_sales_stats(window_days=30, now=None, product_ids=None):
+    """
+    Returns per-product regression sums from the sales rollup.
+
+    One row per product with sales history, aggregated from the sales_daily
+    rollup, so the cost never depends on how many raw sales rows exist. The
+    sums cover the same trailing window ml_logic uses (sale_date >= now -
+    window), or all history with window_days=None.
+
+    Pass product_ids to restrict the result to those products.
+
+    Returns:
+        pd.DataFrame: product_id, n, sum_x, sum_y, sum_xy, sum_xx, first_day,
+        last_day. x and the day columns are integer days since 1970-01-01;
+        n is 0 for products with no sales inside the window.
+    """
+    conn = get_connection()
+    product_filter, product_params = "", []
+    if product_ids is not None:
+        product_filter = " AND {} IN (SELECT value FROM json_each(?))"
+        product_params = [json.dumps([int(pid) for pid in product_ids])]
+    window_filter, window_params = "1", []
+    if window_days is not None:
+        cutoff = (now or datetime.now()) - timedelta(days=window_days)
+        window_filter = "day >= ?"
+        window_params = [-((EPOCH - cutoff) // timedelta(days=1))]  # first whole day >= cutoff
+    return pd.read_sql_query(f'''
+        SELECT s.product_id,
+               COALESCE(w.n, 0) AS n,
+               COALESCE(w.sum_x, 0) AS sum_x,
+               COALESCE(w.sum_y, 0) AS sum_y,
+               COALESCE(w.sum_xy, 0) AS sum_xy,
+               COALESCE(w.sum_xx, 0) AS sum_xx,
+               w.first_day,
+               w.last_day
+        FROM sales_stats s
+        LEFT JOIN (
+            SELECT product_id,
+                   COUNT(*) AS n,
+                   SUM(day) AS sum_x,
+                   SUM(quantity_sold) AS sum_y,
+                   SUM(day * quantity_sold) AS sum_xy,
+                   SUM(day * day) AS sum_xx,
+                   MIN(day) AS first_day,
+                   MAX(day) AS last_day
+            FROM sales_daily
+            WHERE {window_filter}{product_filter.format("product_id")}
+            GROUP BY product_id
+        ) w USING (product_id)
+        WHERE s.n > 0{product_filter.format("s.product_id")}
+    ''', conn, params=window_params + product_params * 2)
+
+@telemetry.instrumented("db.refresh_dashboard_metrics")
+def refresh_dashboard_metrics(now=None):
+    """
+    Brings product_metrics burn rates (and so dashboard_summary) up to date.
+
+    Stock edits are applied by triggers as they happen; this handles sales.
+    Only products sold since the stored high-water mark, plus products never
+    fitted, are refitted from sales_stats. Everything is refitted once the
+    window has moved to a new day (or sales were deleted), and the running
+    totals are then rebuilt from scratch. An up-to-date summary costs three
+    tiny reads and no write transaction.
+
+    Returns:
+        int: Number of products refitted.
+    """
+    # Imported here so db_manager stays importable without the ML stack
+    from engine import ml_logic
+
+    now = now or datetime.now()
+    today = (now.date() - EPOCH.date()).days
+    conn = get_connection()
+    sales_hwm = get_sales_high_water_mark()
+    fitted_hwm, fitted_day = conn.execute(
+        "SELECT sales_hwm, as_of_day FROM dashboard_summary WHERE id = 1"
+    ).fetchone()
+
+    full = fitted_day != today or fitted_hwm is None or sales_hwm < fitted_hwm
+    if full:
+        product_ids = [row[0] for row in conn.execute("SELECT product_id FROM product_metrics")]
+    else:
+        changed = set(get_products_sold_since(fitted_hwm)) if sales_hwm > fitted_hwm else set()
+        changed.update(row[0] for row in conn.execute("SELECT product_id FROM product_metrics WHERE fitted = 0"))
+        product_ids = sorted(changed)
+        if not product_ids and sales_hwm == fitted_hwm:
+            # Up to date: return without taking the write lock
+            return 0
+
+    burn_rates = []
+    if product_ids:
+        stats = get_sales_stats(window_days=ml_logic.WINDOW_DAYS, now=now, product_ids=product_ids)
+        burn_rates = ml_logic.burn_rates_from_stats(product_ids, stats)
+
+    stock = "(SELECT current_stock FROM inventory WHERE id = :id)"
+    with transaction() as cursor:
+        cursor.executemany(f'''
+            UPDATE product_metrics SET
+                burn_rate = :burn,
+                fitted = 1,
+                runway = {_runway_sql(stock, ":burn")},
+                status = {_status_sql(_runway_sql(stock, ":burn"))}
+            WHERE product_id = :id
+        ''', (
+            {'id': int(product_id), 'burn': None if np.isnan(burn) else float(burn)}
+            for product_id, burn in zip(product_ids, burn_rates)
+        ))
+        if full:
+            cursor.execute(DASHBOARD_SUMMARY_REBUILD)
+        cursor.execute(
+            "UPDATE dashboard_summary SET sales_hwm = ?, as_of_day = ? WHERE id = 1", (sales_hwm, today)
+        )
+    return len(product_ids)
+
+@telemetry.instrumented("db.get_dashboard_summary")
+def get_dashboard_summary(top_k=DASHBOARD_TOP_K):
+    """
+    Reads the landing-view metrics: one summary row plus the top_k burners.
+
+    Both reads are O(1) in the catalog size (the top list walks
+    idx_product_metrics_burn backwards). Call refresh_dashboard_metrics()
+    first to pick up new sales.
+
+    Returns:
+        dict: products, critical_count, warning_count, healthy_count,
+        below_reorder_count, total_value, value_at_risk, sales_hwm,
+        as_of_day, and top_burn (DataFrame: id, product_name, 'Burn Rate',
+        'Runway').
+    """
+    conn = get_connection()
+    cursor = conn.execute("SELECT * FROM dashboard_summary WHERE id = 1")
+    summary = dict(zip([column[0] for column in cursor.description], cursor.fetchone()))
+    summary.pop('id')
+    summary['top_burn'] = pd.read_sql_query('''
+        SELECT i.id, i.product_name, ROUND(m.burn_rate, 2) AS "Burn Rate", m.runway AS "Runway"
+        FROM product_metrics m JOIN inventory i ON i.id = m.product_id
+        WHERE m.burn_rate IS NOT NULL
+        ORDER BY m.burn_rate DESC
+        LIMIT ?
+    ''', conn, params=[top_k])
+    return summary
+
+# save_forecast_run replaces a product's earlier rows, so forecasts holds
+# only the latest per product and a product filter is a primary-key seek.
+_LATEST_FORECASTS = '''
+    SELECT f.product_id, f.run_id, f.burn_rate, f.days_to_stockout, f.status, f.current_stock,
+           r.sales_hwm, r.as_of_day
+    FROM forecasts f
+    JOIN forecast_runs r ON r.run_id = f.run_id
+'''
+
+def save_forecast_run(forecast_df, mode, workers, sales_hwm, as_of, started_at):
+    """
+    Records one batch forecast run and its results in a single transaction.
+
+    The run's rows supersede the products' earlier forecasts, which are
+    deleted; forecast_runs keeps the log of every run.
+
+    Args:
+        forecast_df: product_id, current_stock, burn_rate, days_to_stockout, status.
+        mode: 'full' or 'incremental'.
+        sales_hwm: Sales high-water mark the forecast was computed at.
+        as_of: Datetime the trailing window ended at.
+
+    Returns:
+        int: The new run_id.
+    """
+    rows = forecast_df[['product_id', 'burn_rate', 'days_to_stockout', 'status', 'current_stock']]
+    with transaction() as cursor:
+        cursor.execute('''
+            INSERT INTO forecast_runs (started_at, finished_at, mode, products, workers, sales_hwm, as_of_day)
+            VALUES (?, datetime('now'), ?, ?, ?, ?, ?)
+        ''', (started_at.strftime('%Y-%m-%d %H:%M:%S'), mode, len(rows), int(workers), int(sales_hwm),
+              (as_of.date() - EPOCH.date()).days))
+        run_id = cursor.lastrowid
+        cursor.execute(
+            "DELETE FROM forecasts WHERE product_id IN (SELECT value FROM json_each(?)) AND run_id < ?",
+            (json.dumps([int(pid) for pid in rows['product_id']]), run_id)
+        )
+        cursor.executemany(
+            "INSERT INTO forecasts (product_id, run_id, burn_rate, days_to_stockout, status, current_stock) VALUES (?, ?, ?, ?, ?, ?)",
+            (
+                (int(product_id), run_id, float(burn), None if np.isinf(days) else float(days), status,
+                 None if pd.isna(stock) else int(stock))
+                for product_id, burn, days, status, stock in rows.itertuples(index=False, name=None)
+            )
+        )
+    return run_id
+
+def get_last_forecast_run():
+    """The most recent forecast_runs row as a dict, or None before the first run."""
+    cursor = get_connection().execute("SELECT * FROM forecast_runs ORDER BY run_id DESC LIMIT 1")
+    row = cursor.fetchone()
+    return dict(zip([column[0] for column in cursor.description], row)) if row else None
+
+@telemetry.instrumented("db.get_latest_forecasts")
+def get_latest_forecasts(product_ids=None):
+    """
+    Each product's most recent batch forecast (days_to_stockout NULL = never).
+
+    Returns:
+        pd.DataFrame: product_id, run_id, burn_rate, days_to_stockout, status,
+        current_stock (the stock the runway was computed from), and the run's
+        sales_hwm and as_of_day.
+    """
+    sql, params = _LATEST_FORECASTS, []
+    if product_ids is not None:
+        sql += " WHERE f.product_id IN (SELECT value FROM json_each(?))"
+        params.append(json.dumps([int(pid) for pid in product_ids]))
+    return pd.read_sql_query(sql, get_connection(), params=params)
+
+def get_fresh_forecasts(product_ids=None, now=None):
+    """
+    The latest batch forecasts that are still current: computed for today's
+    window, at the product's current stock, with no sales for the product
+    since the run's high-water mark.
+
+    Returns:
+        pd.DataFrame: Same columns as get_latest_forecasts, stale rows dropped.
+    """
+    today = ((now or datetime.now()).date() - EPOCH.date()).days
+    latest = get_latest_forecasts(product_ids)
+    stock = get_inventory_df(latest['product_id'].tolist()).set_index('id')['current_stock']
+    fresh = (latest['as_of_day'] == today).to_numpy() & (
+        latest['current_stock'].to_numpy(dtype=float) == stock.reindex(latest['product_id']).to_numpy(dtype=float)
+    )
+    if fresh.any():
+        # Newest sale per product since the oldest run involved: the rowid
+        # range for the whole catalog, the product index for a page of ids
+        since = int(latest.loc[fresh, 'sales_hwm'].min())
+        if product_ids is None:
+            query, params = "SELECT product_id, id FROM sales WHERE id > ?", (since,)
+        else:
+            query = ("SELECT product_id, id FROM sales "
+                     "WHERE product_id IN (SELECT value FROM json_each(?)) AND id > ?")
+            params = (json.dumps(latest.loc[fresh, 'product_id'].astype(int).tolist()), since)
+        last_sale = pd.read_sql_query(query, get_connection(), params=params).groupby('product_id')['id'].max()
+        fresh &= last_sale.reindex(latest['product_id'], fill_value=0).to_numpy() <= latest['sales_hwm'].to_numpy()
+    return latest[fresh].reset_index(drop=True)
+
+def get_products_needing_forecast(now=None):
+    """Inventory products without a current batch forecast (see get_fresh_forecasts)."""
+    fresh = set(get_fresh_forecasts(now=now)['product_id'])
+    return [pid for pid in get_inventory_df()['id'].tolist() if pid not in fresh]
+
+def get_stock_change_high_water_mark():
+    """Returns the last stock_changes id handed out (0 before the first); unaffected by pruning."""
+    return get_connection().execute(
+        "SELECT COALESCE((SELECT seq FROM sqlite_sequence WHERE name = 'stock_changes'), 0)"
+    ).fetchone()[0]
+
+def get_products_with_stock_changes(since_id):
+    """Ids of products whose stock was edited (or which were created) after stock_changes row `since_id`."""
+    rows = get_connection().execute(
+        "SELECT product_id FROM stock_changes WHERE id > ?", (int(since_id),)
+    ).fetchall()
+    return sorted({row[0] for row in rows})
+
+def prune_stock_changes(up_to_id):
+    """Deletes consumed stock_changes rows (id <= up_to_id)."""
+    with transaction() as cursor:
+        cursor.execute("DELETE FROM stock_changes WHERE id <= ?", (int(up_to_id),))
+
+def get_alert_state(product_ids=None):
+    """
+    Current alert level per product.
+
+    Returns:
+        pd.DataFrame: product_id, status, runway, burn_rate, evaluated_at.
+    """
+    sql, params = "SELECT * FROM alert_state", []
+    if product_ids is not None:
+        sql += " WHERE product_id IN (SELECT value FROM json_each(?))"
+        params.append(json.dumps([int(pid) for pid in product_ids]))
+    return pd.read_sql_query(sql, get_connection(), params=params)
+
+def save_alert_evaluation(state_df, crossings_df, removed_ids=()):
+    """
+    Stores one alert evaluation in a single transaction: upserts alert_state
+    for every evaluated product, appends the crossings to alerts, and drops
+    the state of products no longer in inventory.
+
+    Args:
+        state_df: product_id, status, runway (NaN = none), burn_rate.
+        crossings_df: product_id, from_status, to_status, runway, burn_rate, current_stock.
+    """
+    def value(x):
+        return None if pd.isna(x) or np.isinf(x) else float(x)
+
+    with transaction() as cursor:
+        cursor.executemany('''
+            INSERT INTO alert_state (product_id, status, runway, burn_rate, evaluated_at)
+            VALUES (?, ?, ?, ?, datetime('now'))
+            ON CONFLICT (product_id) DO UPDATE SET
+                status = excluded.status,
+                runway = excluded.runway,
+                burn_rate = excluded.burn_rate,
+                evaluated_at = excluded.evaluated_at
+        ''', (
+            (int(pid), status, value(runway), value(burn))
+            for pid, status, runway, burn in state_df[['product_id', 'status', 'runway', 'burn_rate']].itertuples(index=False, name=None)
+        ))
+        cursor.executemany('''
+            INSERT INTO alerts (product_id, created_at, from_status, to_status, runway, burn_rate, current_stock)
+            VALUES (?, datetime('now'), ?, ?, ?, ?, ?)
+        ''', (
+            (int(pid), old, new, value(runway), value(burn), None if pd.isna(stock) else int(stock))
+            for pid, old, new, runway, burn, stock in crossings_df[
+                ['product_id', 'from_status', 'to_status', 'runway', 'burn_rate', 'current_stock']
+            ].itertuples(index=False, name=None)
+        ))
+        if len(removed_ids):
+            cursor.execute("DELETE FROM alert_state WHERE product_id IN (SELECT value FROM json_each(?))",
+                           (json.dumps([int(pid) for pid in removed_ids]),))
+
+@telemetry.instrumented("db.get_alerts")
+def get_alerts(limit=50, since_id=None, product_id=None):
+    """
+    Recorded alert crossings, newest first, with the product name.
+
+    Returns:
+        pd.DataFrame: id, product_id, product_name, created_at, from_status,
+        to_status, runway, burn_rate, current_stock.
+    """
+    sql = '''
+        SELECT a.id, a.product_id, i.product_name, a.created_at, a.from_status, a.to_status,
+               a.runway, a.burn_rate, a.current_stock
+        FROM alerts a LEFT JOIN inventory i ON i.id = a.product_id
+        WHERE a.id > ?
+    '''
+    params = [int(since_id or 0)]
+    if product_id is not None:
+        sql += " AND a.product_id = ?"
+        params.append(int(product_id))
+    sql += " ORDER BY a.id DESC LIMIT ?"
+    params.append(int(limit))
+    return pd.read_sql_query(sql, get_connection(), params=params)
+
+@telemetry.instrumented("db.get_alerted_products")
+def get_alerted_products(status='Critical', limit=None):
+    """
+    Products currently at an alert level, shortest runway first. Served by
+    idx_alert_state_status, so it costs O(matches) at any catalog size.
+
+    Returns:
+        pd.DataFrame: product_id, product_name, category, current_stock,
+        runway, burn_rate, evaluated_at.
+    """
+    sql = '''
+        SELECT s.product_id, i.product_name, i.category, i.current_stock, s.runway, s.burn_rate, s.evaluated_at
+        FROM alert_state s JOIN inventory i ON i.id = s.product_id
+        WHERE s.status = ?
+        ORDER BY s.runway
+    '''
+    params = [status]
+    if limit is not None:
+        sql += " LIMIT ?"
+        params.append(int(limit))
+    return pd.read_sql_query(sql, get_connection(), params=params)
+
+@telemetry.instrumented("db.update_stock_batch")
 def update_stock_batch(edited_df):
-    """Updates stock levels from an edited DataFrame."""
-    conn = sqlite3.connect(DB_NAME)
-    cursor = conn.cursor()
-    
-    # Inefficient but simple for demo: iterate and update
-    # Better: use executemany with a list of tuples
-    for index, row in edited_df.iterrows():
-        cursor.execute("UPDATE inventory SET current_stock = ? WHERE id = ?", (row['current_stock'], row['id']))
-        
-    conn.commit()
-    conn.close()
+    """
+    Saves stock levels from an edited DataFrame, writing only rows that changed.
+
+    Edited values are diffed against the stored ones and the changed set is
+    applied in a single transaction: executemany for small diffs, or a
+    temp-table join once the diff exceeds BULK_UPDATE_THRESHOLD rows.
+
+    Returns:
+        int: Number of inventory rows updated.
+    """
+    conn = get_connection()
+    # Only the rows being saved are read back, so saving one grid page stays cheap
+    stored = pd.read_sql_query(
+        "SELECT id, current_stock FROM inventory WHERE id IN (SELECT value FROM json_each(?))",
+        conn, params=[json.dumps([int(pid) for pid in edited_df['id'].tolist()])]
+    ).set_index('id')['current_stock']
+
+    edited = edited_df[['id', 'current_stock']]
+    edited = edited[edited['id'].isin(stored.index)]
+    old = stored.reindex(edited['id']).to_numpy()
+    new = edited['current_stock'].to_numpy()
+    unchanged = (new == old) | (pd.isna(new) & pd.isna(old))
+    changed = edited[~unchanged]
+    if changed.empty:
+        return 0
+
+    # Plain Python values for sqlite3 (numpy scalars are not bindable)
+    updates = [
+        (None if pd.isna(stock) else int(stock), int(product_id))
+        for product_id, stock in zip(changed['id'].tolist(), changed['current_stock'].tolist())
+    ]
+
+    with transaction() as cursor:
+        if len(updates) <= BULK_UPDATE_THRESHOLD:
+            cursor.executemany("UPDATE inventory SET current_stock = ? WHERE id = ?", updates)
+        else:
+            cursor.execute("CREATE TEMP TABLE IF NOT EXISTS stock_updates (id INTEGER PRIMARY KEY, current_stock INTEGER)")
+            cursor.execute("DELETE FROM stock_updates")
+            cursor.executemany("INSERT INTO stock_updates (current_stock, id) VALUES (?, ?)", updates)
+            cursor.execute('''
+                UPDATE inventory
+                SET current_stock = (SELECT u.current_stock FROM stock_updates u WHERE u.id = inventory.id)
+                WHERE id IN (SELECT id FROM stock_updates)
+            ''')
+        updated = cursor.rowcount
+    _notify()
+    return updated
+
+# --- Sales Ingestion ---
+def _sale_date_text(sale_date):
+    """sale_date as SQLite date text; date-only strings keep their 'YYYY-MM-DD' form."""
+    if sale_date is None:
+        return datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    try:
+        stamp = pd.Timestamp(sale_date)
+    except (TypeError, ValueError):
+        stamp = pd.NaT
+    if pd.isna(stamp):
+        raise ValueError(f"sale_date is not a date: {sale_date!r}")
+    if isinstance(sale_date, str) and stamp == stamp.normalize():
+        return stamp.strftime('%Y-%m-%d')
+    return stamp.strftime('%Y-%m-%d %H:%M:%S')
+
+def _insert_sales(cursor, rows):
+    """
+    Inserts (product_id, sale_date, quantity_sold) rows. If the batch breaks
+    a constraint it is rolled back and retried row by row, dropping the rows
+    that fail, so one bad event cannot block the rest.
+
+    Returns:
+        list: The rows written.
+    """
+    insert = "INSERT INTO sales (product_id, sale_date, quantity_sold) VALUES (?, ?, ?)"
+    cursor.execute("SAVEPOINT insert_sales")
+    try:
+        cursor.executemany(insert, rows)
+    except sqlite3.IntegrityError:
+        cursor.execute("ROLLBACK TO insert_sales")
+        written = []
+        for row in rows:
+            try:
+                cursor.execute(insert, row)
+            except sqlite3.IntegrityError:
+                continue
+            written.append(row)
+        rows = written
+    cursor.execute("RELEASE insert_sales")
+    return rows
+
+class SalesIngestor:
+    """
+    Buffers point-of-sale events and commits them in micro-batches.
+
+    record() validates one event and appends it to an in-memory buffer. The
+    buffer is written with executemany in one transaction, which also takes
+    the sold quantities off inventory.current_stock (never below zero), as
+    soon as it holds batch_rows events or its oldest event is flush_seconds
+    old. A background thread enforces the time limit while the feed is idle.
+    A full buffer is flushed by the caller that filled it, so a producer
+    outpacing the database is slowed down instead of growing memory: at
+    most batch_rows events are ever held.
+
+    Events for products missing from inventory, or rows the database rejects
+    with a constraint error, are dropped at flush time and counted in
+    stats()['rejected']; the rest of their batch is still written.
+
+    Use as a context manager, or call close(), to flush the tail.
+    """
+
+    def __init__(self, batch_rows=INGEST_BATCH_ROWS, flush_seconds=INGEST_FLUSH_SECONDS):
+        if batch_rows < 1:
+            raise ValueError("batch_rows must be at least 1")
+        self.batch_rows = batch_rows
+        self.flush_seconds = flush_seconds
+        self._lock = threading.RLock()
+        self._buffer = []
+        self._oldest = None  # time.monotonic() of the first buffered event
+        self._closed = threading.Event()
+        self._timer = None
+        self._stats = {'events': 0, 'rows': 0, 'rejected': 0, 'batches': 0}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+    def record(self, product_id, quantity_sold, sale_date=None):
+        """
+        Queues one sale. sale_date may be a datetime, Timestamp or date
+        text pandas can parse; it defaults to now.
+
+        If the flush this triggers fails (e.g. the database stays locked),
+        the error propagates and the buffered events, this one included,
+        are kept for the next flush.
+
+        Raises:
+            ValueError: If quantity_sold is not a positive integer or
+                sale_date is not a date.
+        """
+        quantity = int(quantity_sold)
+        if quantity <= 0 or quantity != quantity_sold:
+            raise ValueError(f"quantity_sold must be a positive integer, got {quantity_sold!r}")
+        event = (int(product_id), _sale_date_text(sale_date), quantity)
+        with self._lock:
+            if self._closed.is_set():
+                raise ValueError("SalesIngestor is closed")
+            if len(self._buffer) >= self.batch_rows:
+                self.flush()  # a previous flush failed; retry before buffering more
+            if not self._buffer:
+                self._oldest = time.monotonic()
+            self._buffer.append(event)
+            self._stats['events'] += 1
+            if len(self._buffer) >= self.batch_rows:
+                self.flush()
+            elif self._timer is None and self.flush_seconds is not None:
+                self._timer = threading.Thread(target=self._flush_on_time, name="sales-ingest-flush", daemon=True)
+                self._timer.start()
+
+    def extend(self, events):
+        """
+        Queues every event from an iterable of (product_id, quantity_sold)
+        or (product_id, quantity_sold, sale_date) tuples, or dicts with
+        those keys. Consumed lazily, so generators of any length are fine.
+
+        Returns:
+            int: Number of events queued.
+        """
+        count = 0
+        for event in events:
+            if isinstance(event, dict):
+                self.record(event['product_id'], event['quantity_sold'], event.get('sale_date'))
+            else:
+                self.record(*event)
+            count += 1
+        return count
+
+    def flush(self):
+        """
+        Commits the buffered events now.
+
+        Returns:
+            int: Number of sales rows written.
+        """
+        with self._lock:
+            if not self._buffer:
+                return 0
+            events = self._buffer
+            with telemetry.stage("db.ingest_flush", events=len(events)), transaction() as cursor:
+                product_ids = sorted({event[0] for event in events})
+                known = {row[0] for row in cursor.execute(
+                    "SELECT id FROM inventory WHERE id IN (SELECT value FROM json_each(?))", (json.dumps(product_ids),)
+                )}
+                rows = _insert_sales(cursor, [event for event in events if event[0] in known])
+                sold = {}
+                for product_id, _, quantity in rows:
+                    sold[product_id] = sold.get(product_id, 0) + quantity
+                cursor.executemany(
+                    "UPDATE inventory SET current_stock = MAX(current_stock - ?, 0) WHERE id = ?",
+                    ((quantity, product_id) for product_id, quantity in sold.items())
+                )
+                telemetry.annotate(rows=len(rows))
+            # Only dropped once committed; a failed batch stays buffered for the next flush
+            self._buffer, self._oldest = [], None
+            if rows:
+                _notify()
+            self._stats['rows'] += len(rows)
+            self._stats['rejected'] += len(events) - len(rows)
+            self._stats['batches'] += 1
+            return len(rows)
+
+    def _flush_on_time(self):
+        while True:
+            with self._lock:
+                oldest = self._oldest
+            wait = self.flush_seconds if oldest is None else oldest + self.flush_seconds - time.monotonic()
+            if self._closed.wait(max(wait, 0)):
+                return
+            with self._lock:
+                if self._oldest is not None and time.monotonic() - self._oldest >= self.flush_seconds:
+                    try:
+                        self.flush()
+                    except Exception:
+                        # The batch stays buffered; the next record() or close() retries and raises
+                        self._oldest = time.monotonic()
+
+    def close(self):
+        """Flushes what is buffered and stops the background flush thread."""
+        with self._lock:
+            self._closed.set()
+            self.flush()
+        if self._timer is not None:
+            self._timer.join()
+
+    def pending(self):
+        with self._lock:
+            return len(self._buffer)
+
+    def stats(self):
+        """Counts of events received, rows written, events rejected and batches committed."""
+        with self._lock:
+            return dict(self._stats)
+
+@telemetry.instrumented("db.ingest_sales")
+def ingest_sales(events, batch_rows=INGEST_BATCH_ROWS, flush_seconds=INGEST_FLUSH_SECONDS):
+    """
+    Streams an iterable of sales events into the database through a
+    SalesIngestor (see SalesIngestor.extend for the event shapes).
+
+    Returns:
+        dict: SalesIngestor.stats() once everything is committed.
+    """
+    with SalesIngestor(batch_rows, flush_seconds) as ingestor:
+        ingestor.extend(events)
+    return ingestor.stats()
+
+def _iter_upload_chunks(source, file_name, chunk_rows):
+    """Yields (DataFrame, fraction_done) chunks from a CSV or Excel upload."""
+    if file_name.lower().endswith(('.xlsx', '.xlsm')):
+        from openpyxl import load_workbook
+
+        workbook = load_workbook(source, read_only=True, data_only=True)
+        try:
+            sheet = workbook.active
+            rows = sheet.iter_rows(values_only=True)
+            header = [str(name).strip() if name is not None else '' for name in next(rows, ())]
+            total = max((sheet.max_row or 0) - 1, 1)
+            done, batch = 0, []
+            for row in rows:
+                batch.append(row)
+                if len(batch) == chunk_rows:
+                    done += len(batch)
+                    yield pd.DataFrame(batch, columns=header), min(done / total, 1.0)
+                    batch = []
+            if batch or not done:
+                yield pd.DataFrame(batch, columns=header), 1.0
+        finally:
+            workbook.close()
+        return
+
+    size = getattr(source, 'size', None)
+    for chunk in pd.read_csv(source, chunksize=chunk_rows):
+        fraction = min(source.tell() / size, 1.0) if size and hasattr(source, 'tell') else None
+        yield chunk, fraction
+
+def _validate_import_chunk(chunk, first_row):
+    """Checks columns and coerces types; raises ValueError naming the bad rows."""
+    chunk.columns = [str(column).strip() for column in chunk.columns]
+    missing = [column for column in IMPORT_REQUIRED_COLUMNS if column not in chunk.columns]
+    if missing:
+        raise ValueError(f"Missing columns: {missing}")
+
+    for column, default in IMPORT_DEFAULTS.items():
+        if column not in chunk:
+            chunk[column] = default
+    if 'id' not in chunk:
+        chunk['id'] = None
+
+    for column in ['current_stock', 'reorder_point', 'unit_cost', 'selling_price', 'id']:
+        chunk[column] = pd.to_numeric(chunk[column], errors='coerce')
+    chunk['unit_cost'] = chunk['unit_cost'].fillna(IMPORT_DEFAULTS['unit_cost'])
+    chunk['selling_price'] = chunk['selling_price'].fillna(IMPORT_DEFAULTS['selling_price'])
+    chunk['category'] = chunk['category'].fillna(IMPORT_DEFAULTS['category']).astype(str)
+    chunk['product_name'] = chunk['product_name'].astype('string').str.strip()
+
+    invalid = (
+        chunk['product_name'].isna() | (chunk['product_name'] == '')
+        | chunk['current_stock'].isna() | chunk['reorder_point'].isna()
+    )
+    if invalid.any():
+        bad_rows = [first_row + int(i) for i in invalid.to_numpy().nonzero()[0][:5]]
+        raise ValueError(f"Invalid product_name/current_stock/reorder_point in data row(s) {bad_rows}")
+    return chunk
+
+@telemetry.instrumented("db.import_inventory")
+def import_inventory(source, file_name, chunk_rows=IMPORT_CHUNK_ROWS, progress=None):
+    """
+    Streams a CSV/Excel inventory upload into the inventory table.
+
+    The file is read `chunk_rows` rows at a time, and each chunk is validated
+    and upserted with one executemany, all inside a single transaction. A row
+    with an `id` updates that product; a row without one is matched to an
+    existing product by product_name. Either way imported products keep
+    their sales history. Any invalid chunk rolls the whole import back.
+
+    Args:
+        source: Path or binary file-like object (e.g. a Streamlit UploadedFile).
+        file_name: Original file name; '.xlsx' selects the Excel reader.
+        progress: Optional callable(rows_done, fraction_done or None).
+
+    Returns:
+        dict: {'rows': int, 'inserted': int, 'updated': int}
+
+    Raises:
+        ValueError: If required columns are missing or a row fails validation.
+    """
+    columns = ['product_name', 'category', 'current_stock', 'reorder_point', 'unit_cost', 'selling_price']
+    rows_done = 0
+    with transaction() as cursor:
+        cursor.execute("SELECT count(*) FROM inventory")
+        count_before = cursor.fetchone()[0]
+        for chunk, fraction in _iter_upload_chunks(source, file_name, chunk_rows):
+            chunk = _validate_import_chunk(chunk, rows_done + 1)
+            records = [
+                (None if pd.isna(pid) else int(pid), name, name, category,
+                 int(stock), int(reorder), float(cost), float(price))
+                for pid, name, category, stock, reorder, cost, price in zip(
+                    chunk['id'].tolist(), *(chunk[column].tolist() for column in columns)
+                )
+            ]
+            cursor.executemany('''
+                INSERT INTO inventory (id, product_name, category, current_stock, reorder_point, unit_cost, selling_price)
+                VALUES (COALESCE(?, (SELECT id FROM inventory WHERE product_name = ? ORDER BY id LIMIT 1)),
+                        ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (id) DO UPDATE SET
+                    product_name = excluded.product_name,
+                    category = excluded.category,
+                    current_stock = excluded.current_stock,
+                    reorder_point = excluded.reorder_point,
+                    unit_cost = excluded.unit_cost,
+                    selling_price = excluded.selling_price
+            ''', records)
+            rows_done += len(records)
+            if progress:
+                progress(rows_done, fraction)
+        cursor.execute("SELECT count(*) FROM inventory")
+        inserted = cursor.fetchone()[0] - count_before
+    _notify()
+    return {'rows': rows_done, 'inserted': inserted, 'updated': rows_done - inserted}
+
+# --- Parquet Snapshots ---
+# Layout under a snapshot directory:
+#   inventory.parquet
+#   sales/month=YYYY-MM/*.parquet    (hive partitions, one per calendar month)
+#   _snapshot.json                   (schema version, sales high-water mark, row counts)
+# pyarrow is imported inside these functions so the app never pays for it.
+
+def _sales_snapshot_schema(pa):
+    return pa.schema([
+        ('id', pa.int64()),
+        ('product_id', pa.int64()),
+        ('sale_date', pa.timestamp('ms')),
+        ('quantity_sold', pa.int64()),
+        ('month', pa.string()),
+    ])
+
+@telemetry.instrumented("db.export_snapshot")
+def export_snapshot(directory, chunk_rows=SNAPSHOT_CHUNK_ROWS):
+    """
+    Writes inventory and sales to a Parquet snapshot under `directory`.
+
+    Sales stream out of SQLite `chunk_rows` rows at a time in id order and
+    are written as a hive-partitioned dataset by sale month, so memory stays
+    bounded and loads filtered on dates only open the months they need. An
+    existing snapshot in the directory is replaced.
+
+    Returns:
+        dict: {'inventory': rows, 'sales': rows, 'sales_hwm': highest sales id}
+    """
+    import shutil
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    import pyarrow.parquet as pq
+
+    os.makedirs(directory, exist_ok=True)
+    conn = get_connection()
+    # One read transaction, so inventory, sales and the manifest agree
+    conn.execute("BEGIN")
+    try:
+        sales_hwm = get_sales_high_water_mark()
+        inventory = pd.read_sql_query("SELECT * FROM inventory ORDER BY id", conn)
+        pq.write_table(pa.Table.from_pandas(inventory, preserve_index=False),
+                       os.path.join(directory, "inventory.parquet"))
+
+        schema = _sales_snapshot_schema(pa)
+        sales_rows = 0
+
+        def batches():
+            nonlocal sales_rows
+            # The month comes from the ISO text prefix; strftime costs more than the query
+            chunks = pd.read_sql_query(
+                "SELECT id, product_id, sale_date, quantity_sold, substr(sale_date, 1, 7) AS month "
+                "FROM sales WHERE id <= ? ORDER BY id",
+                conn, params=(sales_hwm,), parse_dates={'sale_date': {'format': 'ISO8601'}}, chunksize=chunk_rows
+            )
+            for chunk in chunks:
+                sales_rows += len(chunk)
+                yield from pa.Table.from_pandas(chunk, schema=schema, preserve_index=False).to_batches()
+
+        sales_dir = os.path.join(directory, "sales")
+        shutil.rmtree(sales_dir, ignore_errors=True)
+        ds.write_dataset(
+            batches(), sales_dir, schema=schema, format="parquet",
+            partitioning=ds.partitioning(pa.schema([('month', pa.string())]), flavor="hive"),
+            basename_template="part-{i}.parquet",
+        )
+    finally:
+        conn.execute("COMMIT")
+
+    manifest = {
+        'schema_version': get_schema_version(),
+        'exported_at': datetime.now().isoformat(timespec='seconds'),
+        'sales_hwm': sales_hwm,
+        'inventory': len(inventory),
+        'sales': sales_rows,
+    }
+    with open(os.path.join(directory, SNAPSHOT_MANIFEST), "w") as f:
+        json.dump(manifest, f, indent=2)
+    return {'inventory': len(inventory), 'sales': sales_rows, 'sales_hwm': sales_hwm}
+
+@telemetry.instrumented("db.load_snapshot_sales")
+def load_snapshot_sales(directory, columns=SNAPSHOT_SALES_COLUMNS, start=None, end=None, product_ids=None):
+    """
+    Loads sales from a Parquet snapshot with column projection and pruning.
+
+    Files are memory-mapped and only the requested columns are decoded. A
+    start/end date skips whole month partitions and row groups outside the
+    range; product_ids filters rows during the scan. The default columns
+    are what ml_logic.forecast_inventory expects as sales history.
+
+    Args:
+        columns: Columns to read (any of id, product_id, sale_date,
+            quantity_sold, month).
+        start: Earliest sale_date to include (inclusive).
+        end: Latest sale_date to include (exclusive).
+        product_ids: Optional iterable of product ids to restrict to.
+
+    Returns:
+        pd.DataFrame: The requested columns, sale_date as datetime64[ns],
+        grouped by month. Project `id` and sort on it if row order matters.
+    """
+    import pyarrow.dataset as ds
+    from pyarrow import fs
+
+    dataset = ds.dataset(os.path.join(directory, "sales"), format="parquet", partitioning="hive",
+                         filesystem=fs.LocalFileSystem(use_mmap=True))
+    filters = []
+    if start is not None:
+        start = pd.Timestamp(start)
+        filters += [ds.field('month') >= start.strftime('%Y-%m'), ds.field('sale_date') >= start]
+    if end is not None:
+        end = pd.Timestamp(end)
+        filters += [ds.field('month') <= end.strftime('%Y-%m'), ds.field('sale_date') < end]
+    if product_ids is not None:
+        filters.append(ds.field('product_id').isin([int(pid) for pid in product_ids]))
+    row_filter = None
+    for condition in filters:
+        row_filter = condition if row_filter is None else row_filter & condition
+
+    table = dataset.to_table(columns=list(columns), filter=row_filter)
+    return table.to_pandas(coerce_temporal_nanoseconds=True)
+
+def load_snapshot_inventory(directory, columns=None):
+    """Loads inventory from a Parquet snapshot (memory-mapped, optional column projection)."""
+    import pyarrow.parquet as pq
+
+    table = pq.read_table(os.path.join(directory, "inventory.parquet"), columns=columns, memory_map=True)
+    return table.to_pandas()
+
+@telemetry.instrumented("db.import_snapshot")
+def import_snapshot(directory):
+    """
+    Replaces inventory and sales with the contents of a Parquet snapshot.
+
+    Rows keep their ids. The load runs in one transaction with the sales
+    indexes and rollup triggers dropped; sales_daily and sales_stats are
+    then rebuilt in SQL. Batch forecasts, alert state and alerts are
+    cleared and the dashboard metrics are refitted on the next refresh.
+
+    Returns:
+        dict: {'inventory': rows, 'sales': rows}
+    """
+    import pyarrow.dataset as ds
+    from pyarrow import fs
+
+    inventory = load_snapshot_inventory(directory)
+    inventory_columns = ['id', 'product_name', 'category', 'current_stock', 'reorder_point', 'unit_cost', 'selling_price']
+    dataset = ds.dataset(os.path.join(directory, "sales"), format="parquet", partitioning="hive",
+                         filesystem=fs.LocalFileSystem(use_mmap=True))
+
+    sales_rows = 0
+    with transaction() as cursor:
+        dropped = _bulk_load_objects(cursor)
+        for name, kind, _ in dropped:
+            cursor.execute(f'DROP {kind.upper()} "{name}"')
+        _clear_dataset(cursor)
+
+        cursor.executemany(
+            f"INSERT INTO inventory ({', '.join(inventory_columns)}) VALUES ({', '.join('?' * len(inventory_columns))})",
+            inventory[inventory_columns].astype(object).where(inventory[inventory_columns].notna(), None)
+            .itertuples(index=False, name=None)
+        )
+        for batch in dataset.to_batches(columns=['id', 'product_id', 'sale_date', 'quantity_sold'],
+                                        batch_size=SNAPSHOT_CHUNK_ROWS):
+            chunk = batch.to_pandas(coerce_temporal_nanoseconds=True)
+            # Date-only sales keep their 'YYYY-MM-DD' text form
+            dates = chunk['sale_date'].to_numpy()
+            days = dates.astype('datetime64[D]')
+            text = np.where(dates == days, np.datetime_as_string(days),
+                            np.char.replace(np.datetime_as_string(dates, unit='s'), 'T', ' '))
+            cursor.executemany(
+                "INSERT INTO sales (id, product_id, sale_date, quantity_sold) VALUES (?, ?, ?, ?)",
+                zip(chunk['id'].tolist(), chunk['product_id'].tolist(), text.tolist(), chunk['quantity_sold'].tolist())
+            )
+            sales_rows += len(chunk)
+
+        cursor.execute(SALES_ROLLUP_BACKFILL)
+        cursor.execute('''
+            INSERT INTO sales_stats (product_id, n, first_day, last_day)
+            SELECT product_id, COUNT(*), MIN(day), MAX(day)
+            FROM sales_daily GROUP BY product_id
+        ''')
+        for _, _, sql in dropped:
+            cursor.execute(sql)
+
+    return {'inventory': len(inventory), 'sales': sales_rows}
 
 if __name__ == "__main__":
     init_db()
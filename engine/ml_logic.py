@@ -12,16 +12,40 @@ It calculates:
 Models:
 - Linear Regression: Used for trend analysis on 30-day sales history
 - Fallback: Simple averaging for insufficient data points
+- Registry (MODELS): linear, exponential smoothing, day-of-week seasonal and
+  Croston intermittent-demand models over a daily demand matrix, chosen per
+  product by holdout error (forecast_with_models); runway accumulates the
+  forecast demand over the horizon
+
+Batch API:
+- forecast_inventory: Same model as calculate_burn_rate_and_stockout, fitted for
+  every product at once with closed-form least squares in NumPy
+- ForecastCache: Memoizes per-product fits across Streamlit reruns
 
 Author: InsightPro Team
 Version: 2.1
 """
 
+import threading
+from collections import OrderedDict
 import pandas as pd
-from sklearn.linear_model import LinearRegression
 from datetime import datetime, timedelta
 import numpy as np
+from engine import telemetry
+
+WINDOW_DAYS = 30
+MIN_TREND_POINTS = 6
+MIN_BURN_RATE = 0.1
+CRITICAL_DAYS = 7
+
+def _as_datetime(dates):
+    """Parses sale dates unless the loader already did (db_manager.get_sales_df)."""
+    if pd.api.types.is_datetime64_any_dtype(dates):
+        return dates
+    return pd.to_datetime(dates)
+
 
+@telemetry.instrumented("ml.calculate_burn_rate_and_stockout")
 def calculate_burn_rate_and_stockout(inventory_item, sales_history):
     """
     Calculates the Burn Rate (items/day) and predicted Stockout Days.
@@ -29,14 +53,14 @@ def calculate_burn_rate_and_stockout(inventory_item, sales_history):
     Returns:
         dict: {'burn_rate': float, 'days_to_stockout': float (or inf), 'status': str}
     """
-    product_sales = sales_history[sales_history['product_id'] == inventory_item['id']].copy()
+    product_sales = sales_history[sales_history['product_id'] == inventory_item['id']]
     
     if product_sales.empty:
          return {'burn_rate': 0.0, 'days_to_stockout': float('inf'), 'status': 'No Data'}
 
     # Filter for last 30 days for trend analysis
     last_30_days = datetime.now() - timedelta(days=30)
-    product_sales['sale_date'] = pd.to_datetime(product_sales['sale_date'])
+    product_sales = product_sales.assign(sale_date=_as_datetime(product_sales['sale_date']))
     recent_sales = product_sales[product_sales['sale_date'] >= last_30_days]
     
     if recent_sales.empty:
@@ -48,6 +72,8 @@ def calculate_burn_rate_and_stockout(inventory_item, sales_history):
     
     # Linear Regression to find trend
     if len(daily_sales) > 5: # Need enough data points
+        # sklearn adds about a second to start-up; only this per-row path needs it
+        from sklearn.linear_model import LinearRegression
         X = daily_sales[['days_since']]
         y = daily_sales['quantity_sold']
         model = LinearRegression()
@@ -74,3 +100,530 @@ def calculate_burn_rate_and_stockout(inventory_item, sales_history):
         'days_to_stockout': round(days_to_stockout, 1),
         'status': 'Critical' if days_to_stockout < 7 else 'Healthy'
     }
+
+
+@telemetry.instrumented("ml.forecast_inventory")
+def forecast_inventory(inventory_df, sales_history, now=None):
+    """
+    Batch version of calculate_burn_rate_and_stockout for a whole inventory.
+
+    Sales are parsed and grouped once, then every product's trend line is
+    solved in closed form from its per-product sums (n, Σx, Σy, Σxy, Σx²)
+    instead of fitting one sklearn model per row. `sales_history` may be the
+    raw sales table or the pre-aggregated db_manager.get_daily_sales_window().
+
+    Returns:
+        pd.DataFrame: Indexed like inventory_df with columns
+        'burn_rate', 'days_to_stockout' and 'status'.
+    """
+    now = now or datetime.now()
+    product_ids = inventory_df['id'].to_numpy()
+    n_products = len(product_ids)
+
+    sales = sales_history[['product_id', 'sale_date', 'quantity_sold']]
+    has_history = np.isin(product_ids, sales['product_id'].to_numpy())
+
+    dates = _as_datetime(sales['sale_date'])
+    recent = sales.assign(sale_date=dates)[dates >= now - timedelta(days=WINDOW_DAYS)]
+
+    daily = (
+        recent.groupby(['product_id', 'sale_date'], sort=False)['quantity_sold']
+        .sum()
+        .reset_index()
+    )
+    # Map each daily row onto its inventory position; rows for products that
+    # are not in the inventory frame are dropped.
+    position = pd.Index(product_ids).get_indexer(daily['product_id'])
+    daily = daily[position >= 0]
+    position = position[position >= 0]
+
+    first_date = daily.groupby('product_id')['sale_date'].transform('min')
+    x = (daily['sale_date'] - first_date).dt.days.to_numpy(dtype=float)
+    y = daily['quantity_sold'].to_numpy(dtype=float)
+
+    n = np.bincount(position, minlength=n_products).astype(float)
+    sum_x = np.bincount(position, weights=x, minlength=n_products)
+    sum_y = np.bincount(position, weights=y, minlength=n_products)
+    sum_xy = np.bincount(position, weights=x * y, minlength=n_products)
+    sum_xx = np.bincount(position, weights=x * x, minlength=n_products)
+    max_x = np.full(n_products, -np.inf)
+    np.maximum.at(max_x, position, x)
+
+    stats = pd.DataFrame({
+        'n': n, 'sum_x': sum_x, 'sum_y': sum_y,
+        'sum_xy': sum_xy, 'sum_xx': sum_xx, 'max_x': max_x,
+    })
+    return _runway_and_status(
+        _burn_rates_from_sums(stats),
+        inventory_df['current_stock'].to_numpy(dtype=float),
+        has_history,
+        index=inventory_df.index,
+    )
+
+
+def _burn_rates_from_sums(stats):
+    """
+    Solves each product's burn rate from its regression sums.
+
+    `stats` holds one row per product with the window sums n, sum_x, sum_y,
+    sum_xy, sum_xx and the last day offset max_x, where x counts days since
+    the product's first sale in the window. Products with no sales in the
+    window (n == 0) get NaN.
+    """
+    n = stats['n'].to_numpy(dtype=float)
+    sum_x = stats['sum_x'].to_numpy(dtype=float)
+    sum_y = stats['sum_y'].to_numpy(dtype=float)
+    sum_xy = stats['sum_xy'].to_numpy(dtype=float)
+    sum_xx = stats['sum_xx'].to_numpy(dtype=float)
+    max_x = stats['max_x'].to_numpy(dtype=float)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        mean_y = sum_y / n
+        denom = n * sum_xx - sum_x * sum_x
+        # A flat x column (every point on the same day) has no trend, which
+        # is also what LinearRegression reports for it.
+        slope = np.where(denom > 0, (n * sum_xy - sum_x * sum_y) / denom, 0.0)
+        intercept = mean_y - slope * (sum_x / n)
+
+    trend = np.maximum(MIN_BURN_RATE, intercept + slope * (max_x + 1))
+    burn_rate = np.where(n >= MIN_TREND_POINTS, trend, mean_y)
+    return np.where(n == 0, np.nan, burn_rate)
+
+
+def _runway_and_status(burn_rate, current_stock, has_history, index=None):
+    """
+    Turns unrounded burn rates (NaN = no sales in the window) and stock
+    levels into the burn_rate / days_to_stockout / status result frame.
+    """
+    burn_rate = np.asarray(burn_rate, dtype=float)
+    current_stock = np.asarray(current_stock, dtype=float)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        days_to_stockout = np.where(burn_rate > 0, current_stock / burn_rate, np.inf)
+
+    status = np.where(days_to_stockout < CRITICAL_DAYS, 'Critical', 'Healthy').astype(object)
+    empty = np.isnan(burn_rate)
+    status[empty] = 'Stable'
+    status[empty & ~np.asarray(has_history, dtype=bool)] = 'No Data'
+    burn_rate = np.where(empty, 0.0, burn_rate)
+    days_to_stockout = np.where(empty, np.inf, days_to_stockout)
+
+    return pd.DataFrame({
+        'burn_rate': np.round(burn_rate, 2),
+        'days_to_stockout': np.round(days_to_stockout, 1),
+        'status': status,
+    }, index=index)
+
+
+def _rebase_stats(product_ids, sales_stats):
+    """
+    Aligns db_manager.get_sales_stats() rows to `product_ids` and re-bases
+    the absolute-day sums on each product's first day in the window.
+
+    Returns:
+        tuple: (sums frame for _burn_rates_from_sums, has_history mask)
+    """
+    stats = sales_stats.set_index('product_id').reindex(product_ids)
+    has_history = stats['n'].notna().to_numpy()
+    stats = stats.fillna(0)
+
+    # Shift x to "days since first sale in window" in exact integer math
+    n = stats['n'].to_numpy(dtype=np.int64)
+    x0 = stats['first_day'].to_numpy(dtype=np.int64)
+    sum_x = stats['sum_x'].to_numpy(dtype=np.int64)
+    sum_y = stats['sum_y'].to_numpy(dtype=np.int64)
+    shifted = pd.DataFrame({
+        'n': n,
+        'sum_x': sum_x - n * x0,
+        'sum_y': sum_y,
+        'sum_xy': stats['sum_xy'].to_numpy(dtype=np.int64) - x0 * sum_y,
+        'sum_xx': stats['sum_xx'].to_numpy(dtype=np.int64) - 2 * x0 * sum_x + n * x0 * x0,
+        'max_x': stats['last_day'].to_numpy(dtype=np.int64) - x0,
+    })
+    return shifted, has_history
+
+
+def burn_rates_from_stats(product_ids, sales_stats):
+    """
+    Unrounded burn rates for `product_ids` from db_manager.get_sales_stats().
+
+    Returns:
+        np.ndarray: One burn rate per product id, NaN for products with no
+        sales in the window.
+    """
+    shifted, _ = _rebase_stats(np.asarray(product_ids), sales_stats)
+    return _burn_rates_from_sums(shifted)
+
+
+@telemetry.instrumented("ml.forecast_from_stats")
+def forecast_from_stats(inventory_df, sales_stats):
+    """
+    Batch forecast from pre-aggregated regression sums.
+
+    `sales_stats` is the frame returned by db_manager.get_sales_stats: one
+    row per product with sales history, holding window sums over absolute
+    day numbers. Sums are re-based on each product's first day in the window
+    so the result matches forecast_inventory on the raw sales.
+
+    Returns:
+        pd.DataFrame: Indexed like inventory_df with columns
+        'burn_rate', 'days_to_stockout' and 'status'.
+    """
+    shifted, has_history = _rebase_stats(inventory_df['id'].to_numpy(), sales_stats)
+    return _runway_and_status(
+        _burn_rates_from_sums(shifted),
+        inventory_df['current_stock'].to_numpy(dtype=float),
+        has_history,
+        index=inventory_df.index,
+    )
+
+
+# --- Model registry ---
+# Daily-demand models, each fitted for a whole batch of products at once.
+# A model takes a (products x days) demand matrix (oldest day first, ending
+# today), the matching `observed` mask (days with a sales row), the horizon
+# and the weekday of the last day, and returns (products x horizon) forecast
+# daily demand starting tomorrow. Loops run over days, never over products.
+HISTORY_DAYS = 56
+HORIZON_DAYS = 30
+SMOOTHING_ALPHA = 0.3
+CROSTON_ALPHA = 0.1
+SELECTION_HOLDOUT_DAYS = 7
+
+MODELS = {}
+
+
+def register_model(name):
+    """Decorator adding a model function to MODELS under `name`."""
+    def register(model):
+        MODELS[name] = model
+        return model
+    return register
+
+
+def _flat(rate, horizon):
+    return np.repeat(np.asarray(rate, dtype=float)[:, None], horizon, axis=1)
+
+
+@register_model('linear')
+def linear_model(demand, observed, horizon, end_weekday):
+    """The 30-day trend of calculate_burn_rate_and_stockout, held flat over the horizon."""
+    y = demand[:, -WINDOW_DAYS:]
+    mask = observed[:, -WINDOW_DAYS:]
+    n = mask.sum(axis=1)
+    first = np.where(n > 0, mask.argmax(axis=1), 0)
+    last = y.shape[1] - 1 - mask[:, ::-1].argmax(axis=1)
+    x = (np.arange(y.shape[1]) - first[:, None]) * mask
+    y = y * mask
+    stats = pd.DataFrame({
+        'n': n,
+        'sum_x': x.sum(axis=1),
+        'sum_y': y.sum(axis=1),
+        'sum_xy': (x * y).sum(axis=1),
+        'sum_xx': (x * x).sum(axis=1),
+        'max_x': last - first,
+    })
+    return _flat(np.nan_to_num(_burn_rates_from_sums(stats)), horizon)
+
+
+def _smoothed_level(series, alpha):
+    """Final simple-exponential-smoothing level per row; NaN entries leave it unchanged."""
+    level = np.nan_to_num(np.nanmean(series[:, :7], axis=1)) if series.shape[1] else np.zeros(len(series))
+    for column in series.T:
+        level = np.where(np.isnan(column), level, level + alpha * (column - level))
+    return level
+
+
+@register_model('exp_smoothing')
+def exp_smoothing_model(demand, observed, horizon, end_weekday):
+    """Simple exponential smoothing: recent days weigh most, no trend."""
+    with np.errstate(invalid='ignore'):
+        return _flat(_smoothed_level(demand, SMOOTHING_ALPHA), horizon)
+
+
+@register_model('seasonal')
+def seasonal_model(demand, observed, horizon, end_weekday):
+    """
+    Day-of-week seasonality: multiplicative weekday indices from the whole
+    history, times the smoothed level of the deseasonalized series.
+    """
+    days = demand.shape[1]
+    if days < 14:
+        return exp_smoothing_model(demand, observed, horizon, end_weekday)
+    weekday = (end_weekday - days + 1 + np.arange(days)) % 7
+    by_weekday = np.stack([demand[:, weekday == day].mean(axis=1) for day in range(7)], axis=1)
+    mean = by_weekday.mean(axis=1, keepdims=True)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        index = np.where(mean > 0, by_weekday / mean, 1.0)
+        season = index[:, weekday]
+        # A weekday that never sells carries no information about the level
+        level = _smoothed_level(np.where(season > 0, demand / season, np.nan), SMOOTHING_ALPHA)
+    future = (end_weekday + 1 + np.arange(horizon)) % 7
+    return level[:, None] * index[:, future]
+
+
+@register_model('croston')
+def croston_model(demand, observed, horizon, end_weekday):
+    """
+    Croston's method for intermittent demand, with the Syntetos-Boylan bias
+    correction: smooths the size of non-zero days and the gap between them
+    separately, so runs of zero days do not drag the rate towards zero.
+    """
+    alpha = CROSTON_ALPHA
+    selling = demand > 0
+    count = selling.sum(axis=1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        size = np.where(count > 0, demand.sum(axis=1) / count, 0.0)
+        interval = np.where(count > 0, demand.shape[1] / count, 1.0)
+    since = np.ones(len(demand))
+    for column, sold in zip(demand.T, selling.T):
+        size = np.where(sold, size + alpha * (column - size), size)
+        interval = np.where(sold, interval + alpha * (since - interval), interval)
+        since = np.where(sold, 1.0, since + 1.0)
+    return _flat((1 - alpha / 2) * size / interval, horizon)
+
+
+def demand_matrix(product_ids, daily_demand, end_day, days=HISTORY_DAYS):
+    """
+    Lays db_manager.get_daily_demand() rows out as dense arrays.
+
+    Returns:
+        tuple: (demand, observed), both (len(product_ids) x days) with the
+        last column at epoch day `end_day`; days without a row are 0 / False.
+    """
+    row = pd.Index(product_ids).get_indexer(daily_demand['product_id'])
+    column = daily_demand['day'].to_numpy(dtype=np.int64) - (end_day - days + 1)
+    keep = (row >= 0) & (column >= 0) & (column < days)
+    demand = np.zeros((len(product_ids), days))
+    observed = np.zeros((len(product_ids), days), dtype=bool)
+    demand[row[keep], column[keep]] = daily_demand['quantity_sold'].to_numpy(dtype=float)[keep]
+    observed[row[keep], column[keep]] = True
+    return demand, observed
+
+
+def select_models(demand, observed, end_weekday, candidates=None, holdout=SELECTION_HOLDOUT_DAYS):
+    """
+    Picks a model per product: every candidate is fitted on all but the last
+    `holdout` days and scored by MAE on them. Ties go to the earlier candidate.
+
+    Returns:
+        np.ndarray: One model name per row.
+    """
+    candidates = list(candidates or MODELS)
+    train, actual = demand[:, :-holdout], demand[:, -holdout:]
+    errors = np.stack([
+        np.abs(MODELS[name](train, observed[:, :-holdout], holdout, (end_weekday - holdout) % 7) - actual).mean(axis=1)
+        for name in candidates
+    ], axis=1)
+    return np.array(candidates, dtype=object)[errors.argmin(axis=1)]
+
+
+def forecast_demand(demand, observed, end_weekday, model='auto', horizon=HORIZON_DAYS):
+    """
+    Forecast daily demand per product with one model or per-product selection.
+
+    Args:
+        model: A MODELS name, or 'auto' for select_models.
+
+    Returns:
+        tuple: ((products x horizon) forecast, model name per product)
+    """
+    if model == 'auto':
+        names = select_models(demand, observed, end_weekday)
+    elif model in MODELS:
+        names = np.full(len(demand), model, dtype=object)
+    else:
+        raise ValueError(f"model must be 'auto' or one of {sorted(MODELS)}, got {model!r}")
+    forecast = np.zeros((len(demand), horizon))
+    for name in pd.unique(names):
+        rows = names == name
+        forecast[rows] = MODELS[name](demand[rows], observed[rows], horizon, end_weekday)
+    return np.maximum(forecast, 0.0), names
+
+
+def runway_from_forecast(forecast, current_stock):
+    """
+    Days until cumulative forecast demand reaches current stock, interpolated
+    within the day it runs out. Past the horizon the last week's average rate
+    is extrapolated; inf when no demand is forecast.
+    """
+    stock = np.asarray(current_stock, dtype=float)
+    horizon = forecast.shape[1]
+    cumulative = np.cumsum(forecast, axis=1)
+    reached = cumulative >= stock[:, None]
+    day = reached.argmax(axis=1)
+    rows = np.arange(len(forecast))
+    before = np.where(day > 0, cumulative[rows, day - 1], 0.0)
+    tail_rate = forecast[:, -min(7, horizon):].mean(axis=1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        within = day + (stock - before) / forecast[rows, day]
+        beyond = np.where(tail_rate > 0, horizon + (stock - cumulative[:, -1]) / tail_rate, np.inf)
+    runway = np.where(reached.any(axis=1), within, beyond)
+    return np.where(stock <= 0, 0.0, runway)
+
+
+@telemetry.instrumented("ml.forecast_with_models")
+def forecast_with_models(inventory_df, daily_demand, now=None, model='auto', horizon=HORIZON_DAYS,
+                         history_days=HISTORY_DAYS):
+    """
+    Batch forecast from daily demand with a model per product (see MODELS).
+
+    `daily_demand` is db_manager.get_daily_demand(history_days, now). Runway
+    accumulates the forecast over the horizon, so seasonal and intermittent
+    demand shift it; burn_rate is the mean forecast daily demand. As in
+    forecast_from_stats, products without sales in the last WINDOW_DAYS are
+    'Stable' ('No Data' with none in the whole history).
+
+    Returns:
+        pd.DataFrame: Indexed like inventory_df with columns 'burn_rate',
+        'days_to_stockout', 'status' and 'model'.
+    """
+    now = now or datetime.now()
+    product_ids = inventory_df['id'].to_numpy()
+    end_day = int(np.datetime64(now.date(), 'D').astype(np.int64))
+    demand, observed = demand_matrix(product_ids, daily_demand, end_day, history_days)
+    forecast, names = forecast_demand(demand, observed, now.weekday(), model, horizon)
+    telemetry.annotate(products=len(product_ids), model=model)
+
+    stock = inventory_df['current_stock'].to_numpy(dtype=float)
+    days_to_stockout = runway_from_forecast(forecast, stock)
+    status = np.where(days_to_stockout < CRITICAL_DAYS, 'Critical', 'Healthy').astype(object)
+    idle = ~observed[:, -WINDOW_DAYS:].any(axis=1)
+    status[idle] = 'Stable'
+    status[~observed.any(axis=1)] = 'No Data'
+    return pd.DataFrame({
+        'burn_rate': np.round(np.where(idle, 0.0, forecast.mean(axis=1)), 2),
+        'days_to_stockout': np.round(np.where(idle, np.inf, days_to_stockout), 1),
+        'status': status,
+        'model': names,
+    }, index=inventory_df.index)
+
+
+class ForecastCache:
+    """
+    Memoized forecasts keyed by product id and a data-version stamp.
+
+    The stamp is the sales high-water mark (highest sales row id) plus the
+    current day, since the trailing window slides at midnight. Fitted burn
+    rates are cached per product; runway and status are derived from them
+    and the current stock, so:
+
+    - an unchanged rerun returns the previous result without touching the DB,
+    - a stock edit recomputes runway/status for the edited rows only,
+    - new sales refit only the products sold since the last high-water mark.
+
+    Sales are treated as append-only; call clear() after rewriting history.
+    Entries are evicted least-recently-used beyond max_entries.
+    """
+
+    def __init__(self, max_entries=200000):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # product_id -> (burn_rate, has_history)
+        self._sales_hwm = None
+        self._day = None
+        self._last = None  # (ids, stock, result) from the previous call
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._last = None
+
+    def invalidate(self, product_ids):
+        """Drops the cached fits for `product_ids`."""
+        with self._lock:
+            self._invalidate(product_ids)
+
+    def _invalidate(self, product_ids):
+        for product_id in product_ids:
+            self._entries.pop(product_id, None)
+
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses, 'entries': len(self._entries)}
+
+    @telemetry.instrumented("ml.ForecastCache.forecast")
+    def forecast(self, inventory_df, sales_hwm, load_stats, sold_since, now=None):
+        """
+        Cached equivalent of forecast_from_stats(inventory_df, ...).
+
+        Args:
+            sales_hwm: Current sales high-water mark
+                (db_manager.get_sales_high_water_mark()).
+            load_stats: callable(product_ids) -> regression sums for those
+                products (db_manager.get_sales_stats(product_ids=...)).
+            sold_since: callable(sales_id) -> ids of products sold after that
+                row (db_manager.get_products_sold_since).
+
+        Returns:
+            pd.DataFrame: Indexed like inventory_df with columns
+            'burn_rate', 'days_to_stockout' and 'status'.
+        """
+        hits, misses = self.hits, self.misses
+        try:
+            return self._forecast(inventory_df, sales_hwm, load_stats, sold_since, now)
+        finally:
+            telemetry.annotate(cache_hits=self.hits - hits, cache_misses=self.misses - misses)
+
+    def _forecast(self, inventory_df, sales_hwm, load_stats, sold_since, now):
+        day = (now or datetime.now()).date()
+        ids = inventory_df['id'].to_numpy()
+        stock = inventory_df['current_stock'].to_numpy(dtype=float)
+
+        with self._lock:
+            refitted = False
+            if day != self._day or self._sales_hwm is None or sales_hwm < self._sales_hwm:
+                self._entries.clear()
+                self._last = None
+            elif sales_hwm > self._sales_hwm:
+                affected = sold_since(self._sales_hwm)
+                self._invalidate(affected)
+                # Sales of products outside this frame leave its result as is
+                refitted = bool(np.isin(ids, list(affected)).any())
+            self._day, self._sales_hwm = day, sales_hwm
+
+            if len(ids) == 0:
+                return _runway_and_status([], [], [], index=inventory_df.index)
+
+            last = self._last
+            same_rows = last is not None and np.array_equal(last[0], ids)
+            if same_rows and not refitted and np.array_equal(last[1], stock):
+                # Nothing changed since the previous call
+                self.hits += len(ids)
+                return last[2].set_axis(inventory_df.index)
+
+            cached = np.fromiter((pid in self._entries for pid in ids.tolist()), dtype=bool, count=len(ids))
+            self.hits += int(cached.sum())
+            self.misses += int((~cached).sum())
+            if not cached.all():
+                missing = ids[~cached]
+                shifted, has_history = _rebase_stats(missing, load_stats(missing.tolist()))
+                for product_id, burn_rate, history in zip(
+                    missing.tolist(), _burn_rates_from_sums(shifted), has_history
+                ):
+                    self._entries[product_id] = (burn_rate, history)
+
+            # Only refitted products and edited stock levels need a new runway
+            stale = ~(cached & (last[1] == stock)) if same_rows else np.ones(len(ids), dtype=bool)
+            if not stale.any():
+                result = last[2].copy()
+            elif stale.all():
+                burn_rate, has_history = zip(*(self._entries[pid] for pid in ids.tolist()))
+                result = _runway_and_status(burn_rate, stock, has_history)
+            else:
+                burn_rate, has_history = zip(*(self._entries[pid] for pid in ids[stale].tolist()))
+                fresh = _runway_and_status(burn_rate, stock[stale], has_history)
+                result = last[2].copy()
+                for column in fresh.columns:
+                    values = result[column].to_numpy(copy=True)
+                    values[stale] = fresh[column].to_numpy()
+                    result[column] = values
+
+            for product_id in ids.tolist():
+                self._entries.move_to_end(product_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+            result = result.set_axis(inventory_df.index)
+            self._last = (ids, stock, result)
+            return result.copy()
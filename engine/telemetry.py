@@ -0,0 +1,223 @@
+"""
+telemetry.py
+============
+Hot-path Timing Instrumentation
+
+Lightweight per-stage timing for the dashboard's entry points:
+- @instrumented("stage") decorates db_manager / ml_logic / api_bridge functions
+- stage("name") times an ad-hoc block (e.g. building the Plotly figure)
+- annotate(**fields) attaches row counts, cache hits, etc. to the current stage
+- begin_run() / end_run() group the stages of one Streamlit rerun
+
+Finished runs are kept in memory (last RUN_HISTORY, tagged with the session
+passed to begin_run so each profiling panel lists its own), optionally appended to a JSON-lines file, and summarised as Prometheus text.
+
+Disabled by default. When disabled every decorated call costs two flag
+checks and stage() returns a shared no-op context manager. Enable for the
+whole process with enable() or the INSIGHTPRO_PROFILE=1 environment
+variable, or for one thread's run with begin_run(profile=True);
+INSIGHTPRO_PROFILE_LOG=path also appends each run to a JSON-lines file.
+
+Author: InsightPro Team
+Version: 2.1
+"""
+
+import functools
+import json
+import os
+import threading
+import time
+from collections import deque
+from contextlib import nullcontext
+from datetime import datetime
+
+RUN_HISTORY = 50
+LOG_PATH = os.getenv("INSIGHTPRO_PROFILE_LOG") or None
+
+_enabled = os.getenv("INSIGHTPRO_PROFILE", "") not in ("", "0")
+_local = threading.local()
+_lock = threading.Lock()
+_runs = deque(maxlen=RUN_HISTORY)
+_totals = {}  # stage -> [count, seconds, rows]
+_NOOP = nullcontext()
+
+def enable(log_path=None):
+    global _enabled, LOG_PATH
+    _enabled = True
+    if log_path:
+        LOG_PATH = log_path
+
+def disable():
+    global _enabled
+    _enabled = False
+
+def is_enabled():
+    """True when profiling is on for the whole process."""
+    return _enabled
+
+def _active():
+    return _enabled or getattr(_local, 'profiling', False)
+
+def reset():
+    """Forgets recorded runs and Prometheus totals."""
+    with _lock:
+        _runs.clear()
+        _totals.clear()
+
+# --- Recording ---
+class _Stage:
+    __slots__ = ('name', 'fields', 'start', 'depth', 'run', 'slot')
+
+    def __init__(self, name, fields):
+        self.name = name
+        self.fields = fields
+
+    def __enter__(self):
+        stack = _stack()
+        self.depth = len(stack)
+        stack.append(self)
+        # Reserve the run slot now so stages list in start order (parents first)
+        self.run = getattr(_local, 'run', None)
+        if self.run is not None:
+            self.slot = len(self.run['stages'])
+            self.run['stages'].append(None)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        seconds = time.perf_counter() - self.start
+        _stack().pop()
+        span = {'stage': self.name, 'seconds': round(seconds, 6), 'depth': self.depth, **self.fields}
+        if exc_type is not None:
+            span['error'] = exc_type.__name__
+        _record(span, self.run, getattr(self, 'slot', None))
+        return False
+
+def _stack():
+    stack = getattr(_local, 'stack', None)
+    if stack is None:
+        stack = _local.stack = []
+    return stack
+
+def _record(span, run, slot):
+    with _lock:
+        totals = _totals.setdefault(span['stage'], [0, 0.0, 0])
+        totals[0] += 1
+        totals[1] += span['seconds']
+        totals[2] += span.get('rows') or 0
+    if run is not None:
+        run['stages'][slot] = span
+    else:
+        # Work outside a rerun (e.g. a background brief job) is its own run
+        _finish({'run': threading.current_thread().name, 'started': datetime.now().isoformat(timespec='milliseconds'),
+                 'seconds': span['seconds'], 'stages': [span]})
+
+def _finish(run):
+    with _lock:
+        _runs.append(run)
+    if LOG_PATH:
+        with open(LOG_PATH, 'a') as f:
+            f.write(json.dumps(run, default=str) + "\n")
+
+def stage(name, **fields):
+    """Times a block as one stage. Returns a shared no-op when disabled."""
+    if not _active():
+        return _NOOP
+    return _Stage(name, fields)
+
+def annotate(**fields):
+    """Adds fields (rows=, cache_hits=, ...) to the innermost running stage."""
+    if _active():
+        stack = _stack()
+        if stack:
+            stack[-1].fields.update(fields)
+
+def _row_count(result):
+    if isinstance(result, bool):
+        return None
+    if isinstance(result, int):
+        return result
+    if isinstance(result, tuple) and result and hasattr(result[0], '__len__'):
+        return len(result[0])
+    if hasattr(result, '__len__') and not isinstance(result, (str, dict)):
+        return len(result)
+    return None
+
+def instrumented(name):
+    """
+    Decorator timing every call as stage `name`, with the row count of the
+    result (DataFrame/list length, an int return, or the first item of a
+    tuple) unless the function annotate()s its own.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _active():
+                return func(*args, **kwargs)
+            with _Stage(name, {}) as current:
+                result = func(*args, **kwargs)
+                if 'rows' not in current.fields:
+                    rows = _row_count(result)
+                    if rows is not None:
+                        current.fields['rows'] = rows
+                return result
+        return wrapper
+    return decorator
+
+# --- Runs ---
+def begin_run(label="rerun", profile=False, session=None):
+    """
+    Starts grouping this thread's stages; an unfinished previous run is closed
+    first. profile=True records this run even while profiling is disabled
+    process-wide, without turning it on for other threads. The run is tagged
+    with `session` so recent_runs(session=...) returns only that session's.
+    """
+    end_run(interrupted=True)
+    _local.profiling = profile
+    if not _active():
+        return
+    _local.run = {'run': label, 'started': datetime.now().isoformat(timespec='milliseconds'),
+                  '_start': time.perf_counter(), 'stages': []}
+    if session is not None:
+        _local.run['session'] = session
+
+def end_run(interrupted=False):
+    run = getattr(_local, 'run', None)
+    _local.profiling = False
+    if run is None:
+        return None
+    _local.run = None
+    run['seconds'] = round(time.perf_counter() - run.pop('_start'), 6)
+    run['stages'] = [span for span in run['stages'] if span is not None]
+    if interrupted:
+        run['interrupted'] = True
+    _finish(run)
+    return run
+
+def recent_runs(n=RUN_HISTORY, session=None):
+    """The last n finished runs, newest first; only `session`'s runs if given."""
+    with _lock:
+        return [run for run in reversed(_runs) if session is None or run.get('session') == session][:n]
+
+# --- Export ---
+def to_jsonl(runs=None):
+    return "".join(json.dumps(run, default=str) + "\n" for run in (recent_runs() if runs is None else runs))
+
+def prometheus_text():
+    """Per-stage call counts, total seconds and rows in Prometheus text exposition format."""
+    with _lock:
+        totals = {name: list(values) for name, values in _totals.items()}
+    lines = [
+        "# HELP insightpro_stage_seconds Time spent per instrumented stage.",
+        "# TYPE insightpro_stage_seconds summary",
+    ]
+    for name, (count, seconds, _) in sorted(totals.items()):
+        lines.append(f'insightpro_stage_seconds_count{{stage="{name}"}} {count}')
+        lines.append(f'insightpro_stage_seconds_sum{{stage="{name}"}} {seconds:.6f}')
+    lines += [
+        "# HELP insightpro_stage_rows_total Rows returned or written per instrumented stage.",
+        "# TYPE insightpro_stage_rows_total counter",
+    ]
+    for name, (_, _, rows) in sorted(totals.items()):
+        lines.append(f'insightpro_stage_rows_total{{stage="{name}"}} {rows}')
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,82 @@
+"""
+Unit tests for the event-driven alert evaluator.
+"""
+import numpy as np
+import pytest
+from engine import alerts, db_manager
+
+
+@pytest.fixture
+def synthetic_db(monkeypatch, tmp_path):
+    """A fresh database with a small seeded synthetic catalog."""
+    monkeypatch.setattr(db_manager, 'DB_NAME', str(tmp_path / 'alerts.db'))
+    db_manager.migrate()
+    db_manager.generate_synthetic_data(200, 60, seed=3)
+    yield
+    db_manager.close_connections()
+
+
+def set_stock(product_id, stock):
+    row = db_manager.get_inventory_df([product_id])
+    db_manager.update_stock_batch(row.assign(current_stock=stock))
+
+
+def test_next_levels_hysteresis():
+    """Test that escalation is immediate and de-escalation needs the margin."""
+    assert list(alerts.classify([np.inf, 29.9, 6.9, np.nan])) == [0, 1, 2, 0]
+    # Critical stays critical just above 7 days, relaxes past 7 * 1.2
+    assert list(alerts.next_levels([2, 2, 2], [7.5, 8.5, 40.0])) == [2, 1, 0]
+    # Warning stays warning until 30 * 1.2, escalates at once
+    assert list(alerts.next_levels([1, 1, 0], [33.0, 36.5, 3.0])) == [1, 0, 2]
+
+
+def test_poll_evaluates_only_touched_products(synthetic_db):
+    """Test that stock edits and sales re-evaluate just those products, once."""
+    evaluator = alerts.AlertEvaluator()
+    evaluator.poll()
+    assert evaluator.evaluated == 200
+    assert len(db_manager.get_alert_state()) == 200
+    assert evaluator.poll().empty
+
+    burn_rate = db_manager.get_alert_state([5]).loc[0, 'burn_rate']
+    set_stock(5, 0)
+    with db_manager.transaction() as cursor:
+        cursor.execute("INSERT INTO sales (product_id, sale_date, quantity_sold) VALUES (9, datetime('now'), 4)")
+    crossings = evaluator.poll()
+    assert evaluator.evaluated == 202
+    assert burn_rate > 0
+    assert crossings.loc[crossings['product_id'] == 5, 'to_status'].tolist() == ['Critical']
+    assert 5 in db_manager.get_alerted_products('Critical')['product_id'].tolist()
+
+    # Re-saving the same stock is not a change; the consumed feed is pruned
+    set_stock(5, 0)
+    assert evaluator.poll().empty
+    assert evaluator.evaluated == 202
+    assert db_manager.get_products_with_stock_changes(0) == []
+    assert db_manager.get_alerts(product_id=5)['to_status'].tolist() == ['Critical']
+
+
+def test_hovering_runway_does_not_flap(synthetic_db):
+    """Test that a runway moving around the critical threshold records one alert."""
+    evaluator = alerts.AlertEvaluator()
+    evaluator.poll()
+    burn_rate = db_manager.get_alert_state([7]).loc[0, 'burn_rate']
+    for days in [6.5, 7.5, 6.8, 7.9, 6.9]:
+        set_stock(7, int(round(days * burn_rate)))
+        evaluator.poll()
+    assert db_manager.get_alert_state([7]).loc[0, 'status'] == 'Critical'
+    assert (db_manager.get_alerts(product_id=7)['to_status'] == 'Critical').sum() == 1
+
+    set_stock(7, int(60 * burn_rate))
+    evaluator.poll()
+    assert db_manager.get_alert_state([7]).loc[0, 'status'] == 'Healthy'
+
+
+def test_deleted_products_leave_alert_state(synthetic_db):
+    """Test that evaluating a deleted product drops its alert state."""
+    evaluator = alerts.AlertEvaluator()
+    evaluator.poll()
+    with db_manager.transaction() as cursor:
+        cursor.execute("DELETE FROM inventory WHERE id = 3")
+    assert evaluator.evaluate([3]).empty
+    assert db_manager.get_alert_state([3]).empty
@@ -1,12 +1,49 @@
 """
 Unit tests for API bridge module.
 """
+import threading
+import time
 import pytest
 import pandas as pd
+from types import SimpleNamespace
 from unittest.mock import patch, MagicMock
+import api_bridge
 from api_bridge import get_supply_chain_brief
 
 
+@pytest.fixture(autouse=True)
+def isolated_brief_cache(monkeypatch, tmp_path):
+    """Keep the brief cache and model discovery cache per test."""
+    monkeypatch.setattr(api_bridge, 'BRIEF_CACHE_DB', str(tmp_path / 'brief_cache.db'))
+    monkeypatch.setattr(api_bridge, '_model_cache', {})
+
+
+class StubGenai:
+    """Local stand-in for google.generativeai that counts calls."""
+
+    def __init__(self, text="Stub brief.", gate=None):
+        self.text = text
+        self.gate = gate
+        self.list_calls = 0
+        self.generate_calls = 0
+
+    def configure(self, api_key):
+        pass
+
+    def list_models(self):
+        self.list_calls += 1
+        return [SimpleNamespace(name='models/gemini-2.0-flash', supported_generation_methods=['generateContent'])]
+
+    def GenerativeModel(self, name):
+        return SimpleNamespace(generate_content=lambda prompt: self._generate(name, prompt))
+
+    def _generate(self, name, prompt):
+        self.generate_calls += 1
+        if self.gate:
+            self.gate.wait(5)
+        return SimpleNamespace(text=f"{self.text} ({name})")
+
+
 @pytest.fixture
 def mock_inventory_data():
     """Create mock inventory data for testing."""
@@ -84,3 +121,188 @@ def test_data_analysis_metrics(mock_inventory_data):
         
         # Verify the function completed without error
         assert result is not None
+
+
+def test_brief_is_cached_per_snapshot(mock_inventory_data):
+    """Test that repeated briefs reuse the cache and model discovery."""
+    stub = StubGenai()
+    with patch('api_bridge.genai', stub):
+        first = get_supply_chain_brief(mock_inventory_data.copy(), api_key="test_key")
+        second = get_supply_chain_brief(mock_inventory_data.copy(), api_key="test_key")
+        assert first == second == "Stub brief. (models/gemini-2.0-flash)"
+        assert stub.generate_calls == 1
+        assert stub.list_calls == 1
+
+        changed = mock_inventory_data.assign(current_stock=[1, 2, 3])
+        get_supply_chain_brief(changed, api_key="test_key")
+        assert stub.generate_calls == 2
+
+        with patch.object(api_bridge, 'BRIEF_CACHE_TTL_SECONDS', -1):
+            get_supply_chain_brief(mock_inventory_data.copy(), api_key="test_key")
+        assert stub.generate_calls == 3
+
+
+def test_failed_briefs_are_not_cached(mock_inventory_data):
+    """Test that error messages are returned but never stored."""
+    with patch('api_bridge.genai') as mock_genai:
+        mock_genai.GenerativeModel.side_effect = Exception("API Error")
+        assert "failed" in get_supply_chain_brief(mock_inventory_data, api_key="test_key").lower()
+
+    stub = StubGenai()
+    with patch('api_bridge.genai', stub):
+        assert get_supply_chain_brief(mock_inventory_data, api_key="test_key").startswith("Stub brief.")
+        assert stub.generate_calls == 1
+
+
+def test_concurrent_identical_briefs_share_one_call(mock_inventory_data):
+    """Test that simultaneous identical requests coalesce into one model call."""
+    gate = threading.Event()
+    stub = StubGenai(gate=gate)
+    results = []
+    with patch('api_bridge.genai', stub):
+        threads = [
+            threading.Thread(target=lambda: results.append(
+                get_supply_chain_brief(mock_inventory_data.copy(), api_key="test_key")))
+            for _ in range(4)
+        ]
+        for thread in threads:
+            thread.start()
+        while not api_bridge._inflight:
+            time.sleep(0.01)
+        gate.set()
+        for thread in threads:
+            thread.join()
+
+    assert len(set(results)) == 1 and len(results) == 4
+    assert stub.generate_calls == 1
+
+
+def wait_for(job, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not job.done() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return job.result()
+
+
+def test_submit_brief_returns_handle_immediately(mock_inventory_data):
+    """Test that submitting does not wait for the model."""
+    gate = threading.Event()
+    stub = StubGenai(gate=gate)
+    with patch('api_bridge.genai', stub):
+        job = api_bridge.submit_supply_chain_brief(mock_inventory_data, api_key="test_key")
+        assert job.result() is None
+        gate.set()
+        assert wait_for(job).startswith("Stub brief.")
+
+    locked = api_bridge.submit_supply_chain_brief(mock_inventory_data, api_key="")
+    assert locked.done() and "Locked" in locked.result()
+
+
+def test_rate_limited_job_backs_off_and_can_be_cancelled(mock_inventory_data, monkeypatch):
+    """Test that retries wait with bounded jitter and stop on cancel."""
+    monkeypatch.setattr(api_bridge, 'BACKOFF_BASE_SECONDS', 30.0)
+    delays = [api_bridge._backoff_delay(attempt) for attempt in range(10)]
+    assert all(0 <= d <= api_bridge.BACKOFF_CAP_SECONDS for d in delays)
+
+    with patch('api_bridge.genai') as mock_genai:
+        mock_genai.list_models.return_value = []
+        mock_genai.GenerativeModel.return_value.generate_content.side_effect = Exception("429 quota exceeded")
+        monkeypatch.setattr(api_bridge, '_backoff_delay', lambda attempt: 60)
+        job = api_bridge.submit_supply_chain_brief(mock_inventory_data, api_key="test_key")
+        while mock_genai.GenerativeModel.return_value.generate_content.call_count == 0:
+            time.sleep(0.01)
+        job.cancel()
+        assert "cancelled" in wait_for(job).lower()
+        assert mock_genai.GenerativeModel.return_value.generate_content.call_count == 1
+
+
+def test_per_key_concurrency_limit(mock_inventory_data, monkeypatch):
+    """Test that one API key never has more model calls in flight than allowed."""
+    monkeypatch.setattr(api_bridge, 'BRIEF_MAX_CONCURRENT_PER_KEY', 1)
+    monkeypatch.setattr(api_bridge, '_key_slots', {})
+    active, peak, lock = [0], [0], threading.Lock()
+
+    def generate(prompt):
+        with lock:
+            active[0] += 1
+            peak[0] = max(peak[0], active[0])
+        time.sleep(0.05)
+        with lock:
+            active[0] -= 1
+        return SimpleNamespace(text=prompt[-20:])
+
+    with patch('api_bridge.genai') as mock_genai:
+        mock_genai.list_models.return_value = []
+        mock_genai.GenerativeModel.return_value.generate_content.side_effect = generate
+        jobs = [
+            api_bridge.submit_supply_chain_brief(mock_inventory_data.assign(current_stock=[i, 1, 1]), api_key="test_key")
+            for i in range(3)
+        ]
+        assert all(wait_for(job) for job in jobs)
+
+    assert peak[0] == 1
+
+
+def test_prompt_does_not_mutate_and_uses_runway(mock_inventory_data):
+    """Test that the prompt builder leaves the frame alone and ranks by forecast runway."""
+    before = mock_inventory_data.copy()
+    prompt = api_bridge.build_brief_prompt(mock_inventory_data)
+
+    pd.testing.assert_frame_equal(mock_inventory_data, before)
+    items = prompt.split("INVENTORY ANALYSIS DATA")[1].split("CATEGORY SUMMARY")[0]
+    assert items.index("Product B") < items.index("Product A") < items.index("Product C")
+    assert "runway 6.0 days" in items
+
+
+def test_prompt_stays_within_budget_for_large_catalogs():
+    """Test that prompt size is bounded regardless of catalog size."""
+    sizes = []
+    for n in [20, 20000]:
+        df = pd.DataFrame({
+            'product_name': [f"SKU-{i}" for i in range(n)],
+            'category': [f"Category {i % 50}" for i in range(n)],
+            'current_stock': [i % 300 for i in range(n)],
+            'reorder_point': [20] * n,
+            'unit_cost': [9.5] * n,
+        })
+        prompt = api_bridge.build_brief_prompt(df)
+        assert api_bridge.estimate_tokens(prompt) <= api_bridge.PROMPT_TOKEN_BUDGET
+        assert prompt.count("\n- SKU-") <= api_bridge.MAX_PROMPT_ITEMS
+        sizes.append(len(prompt))
+
+        tight = api_bridge.build_brief_prompt(df, token_budget=450)
+        assert api_bridge.estimate_tokens(tight) <= 450
+
+    assert sizes[1] < sizes[0] * 1.5
+
+
+def test_concurrent_briefs_use_their_own_api_key():
+    """Test that briefs for different keys never run under each other's configured key."""
+    class KeyedStub(StubGenai):
+        def __init__(self):
+            super().__init__()
+            self.key = None
+            self.seen = []
+
+        def configure(self, api_key):
+            self.key = api_key
+
+        def _generate(self, name, prompt):
+            key = self.key
+            time.sleep(0.05)
+            self.seen.append((prompt, key, self.key))
+            return SimpleNamespace(text="ok")
+
+    stub = KeyedStub()
+    with patch('api_bridge.genai', stub):
+        threads = [
+            threading.Thread(target=api_bridge._generate_brief, args=(key, 'gemini-2.0-flash', key, None))
+            for key in ['key-a', 'key-b', 'key-a', 'key-b']
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    assert len(stub.seen) == 4
+    assert all(prompt == before == after for prompt, before, after in stub.seen)
@@ -59,3 +59,15 @@ def test_requirements_txt_exists():
         content = f.read()
         assert len(content) > 0
         assert 'streamlit' in content.lower()
+
+
+def test_heavy_dependencies_are_deferred():
+    """Test that sklearn, plotly and genai are not imported with the app's modules."""
+    import subprocess
+    code = (
+        "import sys; from engine import alerts, db_manager, ml_logic, telemetry; import api_bridge; "
+        "print(' '.join(m for m in ('sklearn', 'plotly', 'google.generativeai', 'streamlit') if m in sys.modules))"
+    )
+    result = subprocess.run([sys.executable, "-c", code], cwd=Path(__file__).parent.parent,
+                            capture_output=True, text=True, check=True)
+    assert result.stdout.split() == []
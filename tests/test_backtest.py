@@ -0,0 +1,66 @@
+"""
+Unit tests for the forecast backtesting harness.
+"""
+import tracemalloc
+import numpy as np
+import pytest
+from engine import backtest, db_manager, ml_logic
+
+
+def test_constant_demand_scores_perfectly():
+    """Test that a model that can forecast the data exactly scores zero error."""
+    demand = np.full((20, 120), 4.0)
+    observed = np.ones_like(demand, dtype=bool)
+
+    result = backtest.backtest(demand, observed, end_day=20000, models=['exp_smoothing', 'croston'], horizon=14)
+    smoothing = result.set_index('model').loc['exp_smoothing']
+
+    assert smoothing['origins'] == len(range(ml_logic.HISTORY_DAYS, 120 - 14 + 1, backtest.BACKTEST_STEP))
+    assert smoothing['mae'] == pytest.approx(0)
+    assert smoothing['mape'] == pytest.approx(0)
+    assert smoothing['hit_rate'] == 1
+    assert smoothing['false_alarm_rate'] == 0
+    assert (result['seconds'] >= 0).all() and (result['peak_mb'] >= 0).all()
+
+
+def test_backtest_requires_enough_history():
+    """Test that too short a history is rejected."""
+    demand = np.ones((3, 30))
+    with pytest.raises(ValueError):
+        backtest.backtest(demand, demand > 0, end_day=20000)
+
+
+def test_backtest_database(monkeypatch, tmp_path):
+    """Test a CLI run over a synthetic database scores every model and auto."""
+    monkeypatch.setattr(db_manager, 'DB_NAME', str(tmp_path / 'backtest.db'))
+    db_manager.migrate()
+    db_manager.generate_synthetic_data(50, 120, seed=5, sparsity=0.4)
+    output = tmp_path / 'backtest.csv'
+
+    assert backtest.main(['--days', '120', '--horizon', '14', '--output', str(output)]) == 0
+    result = backtest.backtest_database(days=120, horizon=14)
+    db_manager.close_connections()
+
+    assert list(result['model']) == [*ml_logic.MODELS, 'auto']
+    assert (result['products'] == 50).all()
+    assert result[['mae', 'mape', 'hit_rate', 'false_alarm_rate']].notna().all().all()
+    assert output.read_text().startswith('model,products,')
+
+
+def test_fits_are_timed_without_tracemalloc(monkeypatch):
+    """Test that timed fits run untraced and memory comes from one extra traced fit."""
+    forecast_demand = ml_logic.forecast_demand
+    traced = []
+
+    def spy(*args, **kwargs):
+        traced.append(tracemalloc.is_tracing())
+        return forecast_demand(*args, **kwargs)
+
+    monkeypatch.setattr(ml_logic, 'forecast_demand', spy)
+    demand = np.full((5, 120), 2.0)
+    result = backtest.backtest(demand, demand > 0, end_day=20000, models=['linear'], horizon=14)
+
+    origins = int(result['origins'].iloc[0])
+    assert traced == [False] * origins + [True]
+    assert result['peak_mb'].iloc[0] > 0
+    assert not tracemalloc.is_tracing()
@@ -0,0 +1,96 @@
+"""
+Unit tests for the headless batch forecast.
+"""
+import numpy as np
+import pytest
+from engine import batch_forecast, db_manager, ml_logic
+
+
+@pytest.fixture
+def synthetic_db(monkeypatch, tmp_path):
+    """A fresh database with a small seeded synthetic catalog."""
+    monkeypatch.setattr(db_manager, 'DB_NAME', str(tmp_path / 'batch.db'))
+    db_manager.migrate()
+    db_manager.generate_synthetic_data(200, 60, seed=3)
+    yield
+    db_manager.close_connections()
+
+
+def run(*argv):
+    return batch_forecast.run_batch_forecast(*argv, log=lambda message: None)
+
+
+def test_full_run_matches_live_forecast(synthetic_db):
+    """Test that a full run stores every product's forecast as computed live."""
+    summary = batch_forecast.main(['--workers', '3', '--batch-size', '40'])
+    assert summary == 0
+
+    inventory = db_manager.get_inventory_df()
+    expected = ml_logic.forecast_from_stats(inventory, db_manager.get_sales_stats(product_ids=inventory['id']))
+    stored = db_manager.get_latest_forecasts().set_index('product_id').reindex(inventory['id'])
+
+    assert db_manager.get_last_forecast_run()['products'] == len(inventory)
+    assert np.allclose(stored['burn_rate'], expected['burn_rate'])
+    assert np.allclose(stored['days_to_stockout'].fillna(np.inf), expected['days_to_stockout'])
+    assert list(stored['status']) == list(expected['status'])
+
+
+def test_incremental_run_forecasts_only_changes(synthetic_db):
+    """Test that incremental runs pick up stock edits, new sales and nothing else."""
+    run(None, None, False)
+    assert run(None, None, True)['run_id'] is None
+
+    inventory = db_manager.get_inventory_df()
+    edited = inventory[inventory['id'] == 5].copy()
+    edited['current_stock'] = 1
+    db_manager.update_stock_batch(edited)
+    with db_manager.transaction() as cursor:
+        cursor.execute("INSERT INTO sales (product_id, sale_date, quantity_sold) VALUES (9, datetime('now'), 4)")
+
+    summary = run(None, None, True)
+    assert summary['mode'] == 'incremental'
+    assert summary['products'] == 2
+    latest = db_manager.get_latest_forecasts([5, 9]).set_index('product_id')
+    assert (latest['run_id'] == summary['run_id']).all()
+    assert latest.loc[5, 'current_stock'] == 1
+    assert len(db_manager.get_fresh_forecasts()) == len(inventory)
+
+
+def test_fresh_forecasts_for_a_page(synthetic_db):
+    """Test that a page's freshness check only looks at that page's sales."""
+    run(None, None, False)
+    with db_manager.transaction() as cursor:
+        cursor.execute("INSERT INTO sales (product_id, sale_date, quantity_sold) VALUES (9, datetime('now'), 4)")
+
+    assert db_manager.get_fresh_forecasts([1, 2, 3])['product_id'].tolist() == [1, 2, 3]
+    assert db_manager.get_fresh_forecasts([8, 9, 10])['product_id'].tolist() == [8, 10]
+
+
+def test_subset_options(synthetic_db):
+    """Test that --products and --category restrict the run."""
+    category = db_manager.get_inventory_df(list(range(1, 11))).set_index('id')['category']
+    summary = run(list(range(1, 11)), category.loc[1], False)
+
+    written = db_manager.get_latest_forecasts()['product_id']
+    assert summary['products'] == (category == category.loc[1]).sum()
+    assert set(written) == set(category.index[category == category.loc[1]])
+
+
+def test_model_option_uses_registry(synthetic_db):
+    """Test that --model forecasts from daily demand and reports the models chosen."""
+    summary = batch_forecast.run_batch_forecast(model='auto', log=lambda message: None)
+
+    assert sum(summary['models'].values()) == summary['products'] == 200
+    assert set(summary['models']) <= set(ml_logic.MODELS)
+    assert len(db_manager.get_latest_forecasts()) == 200
+
+
+def test_runs_keep_only_latest_forecast(synthetic_db):
+    """Test that a run supersedes earlier forecast rows instead of accumulating them."""
+    first = run(None, None, False)['run_id']
+    second = run(list(range(1, 11)), None, False)['run_id']
+
+    count, = db_manager.get_connection().execute("SELECT COUNT(*) FROM forecasts").fetchone()
+    runs = db_manager.get_latest_forecasts().set_index('product_id')['run_id']
+    assert count == 200
+    assert (runs.loc[1:10] == second).all() and (runs.loc[11:] == first).all()
@@ -1,9 +1,14 @@
 """
 Unit tests for database manager module.
 """
+import io
+import sqlite3
+import threading
 import pytest
+import numpy as np
 import pandas as pd
-from engine.db_manager import init_db, get_inventory_df, get_sales_df
+from engine import alerts, batch_forecast, db_manager
+from engine.db_manager import init_db, get_inventory_df, get_sales_df, get_sales_stats, get_connection, update_stock_batch, get_daily_sales_window, import_inventory, generate_synthetic_data, get_inventory_page
 
 
 def test_init_db():
@@ -43,10 +48,13 @@ def test_inventory_data_types():
     init_db()
     df = get_inventory_df()
     
-    assert df['current_stock'].dtype in ['int64', 'int32']
-    assert df['reorder_point'].dtype in ['int64', 'int32']
+    assert df['id'].dtype == 'int32'
+    assert df['current_stock'].dtype == 'int32'
+    assert df['reorder_point'].dtype == 'int32'
     assert df['unit_cost'].dtype in ['float64', 'float32']
     assert df['selling_price'].dtype in ['float64', 'float32']
+    assert isinstance(df['category'].dtype, pd.CategoricalDtype)
+    assert isinstance(df['product_name'].dtype, pd.CategoricalDtype)
 
 
 def test_sales_data_types():
@@ -54,5 +62,463 @@ def test_sales_data_types():
     init_db()
     df = get_sales_df()
     
-    assert df['quantity_sold'].dtype in ['int64', 'int32']
-    assert 'sale_date' in df.columns
+    assert df['product_id'].dtype == 'int32'
+    assert df['quantity_sold'].dtype in ['int8', 'int16']
+    assert pd.api.types.is_datetime64_any_dtype(df['sale_date'])
+
+
+def test_sales_stats_match_sales_history():
+    """Test that the rollup sums agree with the raw sales table."""
+    init_db()
+    sales = get_sales_df()
+    stats = get_sales_stats(window_days=None).set_index('product_id')
+
+    days = (pd.to_datetime(sales['sale_date']) - pd.Timestamp('1970-01-01')).dt.days
+    daily = sales.assign(day=days).groupby(['product_id', 'day'])['quantity_sold'].sum().reset_index()
+    expected = daily.groupby('product_id').agg(
+        n=('day', 'size'),
+        sum_y=('quantity_sold', 'sum'),
+        last_day=('day', 'max'),
+    )
+
+    assert len(stats) == len(expected)
+    for column in ['n', 'sum_y', 'last_day']:
+        assert (stats.loc[expected.index, column] == expected[column]).all()
+
+
+def test_sales_stats_window():
+    """Test that the windowed sums only cover recent days."""
+    init_db()
+    stats = get_sales_stats(window_days=30)
+
+    assert not stats.empty
+    assert (stats['n'] <= 30).all()
+
+
+def test_connection_is_reused_per_thread():
+    """Test that each thread keeps one long-lived WAL connection."""
+    init_db()
+    conn = get_connection()
+
+    assert get_connection() is conn
+    assert conn.execute("PRAGMA journal_mode").fetchone()[0] == 'wal'
+
+    other = []
+    thread = threading.Thread(target=lambda: other.append(get_connection()))
+    thread.start()
+    thread.join()
+    assert other[0] is not conn
+
+
+@pytest.mark.parametrize('threshold', [5000, 0])
+def test_update_stock_batch_writes_only_changes(monkeypatch, threshold):
+    """Test that only edited rows are written, via executemany or the temp-table join."""
+    monkeypatch.setattr(db_manager, 'BULK_UPDATE_THRESHOLD', threshold)
+    init_db()
+    original = get_inventory_df()
+
+    assert update_stock_batch(original) == 0
+
+    edited = original.copy()
+    edited.loc[0, 'current_stock'] = original.loc[0, 'current_stock'] + 7
+    try:
+        assert update_stock_batch(edited) == 1
+        stored = get_inventory_df().set_index('id')['current_stock']
+        assert stored[original.loc[0, 'id']] == original.loc[0, 'current_stock'] + 7
+        assert stored.drop(original.loc[0, 'id']).equals(
+            original.set_index('id')['current_stock'].drop(original.loc[0, 'id'])
+        )
+    finally:
+        update_stock_batch(original)
+
+
+def test_migrations_reach_latest_version():
+    """Test that init_db records every migration and creates the indexes."""
+    init_db()
+
+    assert db_manager.get_schema_version() == db_manager.MIGRATIONS[-1][0]
+    assert db_manager.migrate() == db_manager.MIGRATIONS[-1][0]  # idempotent
+
+    indexes = {row[0] for row in get_connection().execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+    assert {'idx_sales_product_date', 'idx_sales_date_covering', 'idx_inventory_category'} <= indexes
+
+
+def test_failed_migration_rolls_back(temp_db, monkeypatch):
+    """Test that a failing migration leaves nothing applied and the connection usable."""
+    version = db_manager.get_schema_version()
+    broken = (version + 1, "broken", "CREATE TABLE half_done (x); SELECT * FROM no_such_table;")
+    monkeypatch.setattr(db_manager, 'MIGRATIONS', db_manager.MIGRATIONS + [broken])
+
+    with pytest.raises(sqlite3.OperationalError, match='no_such_table'):
+        db_manager.migrate()
+    conn = get_connection()
+    assert not conn.in_transaction
+    assert db_manager.get_schema_version() == version
+    assert conn.execute("SELECT COUNT(*) FROM sqlite_master WHERE name = 'half_done'").fetchone()[0] == 0
+    with db_manager.transaction() as cursor:
+        cursor.execute("UPDATE inventory SET current_stock = current_stock WHERE id = 1")
+
+
+def test_daily_sales_window():
+    """Test that the SQL window returns one pre-aggregated row per product per recent day."""
+    init_db()
+    window = get_daily_sales_window(window_days=30)
+
+    assert list(window.columns) == ['product_id', 'sale_date', 'quantity_sold']
+    assert pd.api.types.is_datetime64_any_dtype(window['sale_date'])
+    assert not window.duplicated(['product_id', 'sale_date']).any()
+    assert (window['sale_date'] >= pd.Timestamp.now() - pd.Timedelta(days=30)).all()
+
+    subset = get_daily_sales_window(window_days=30, product_ids=[1, 2])
+    assert set(subset['product_id']) <= {1, 2}
+
+
+@pytest.fixture
+def temp_db(monkeypatch, tmp_path):
+    """Point db_manager at a fresh, initialized database file."""
+    monkeypatch.setattr(db_manager, 'DB_NAME', str(tmp_path / 'test.db'))
+    init_db()
+    yield
+    db_manager.close_connections()
+
+
+def test_rollup_skips_unparsable_sale_dates(temp_db):
+    """Test that sales with dates SQLite cannot parse are stored but left out of the rollup."""
+    rollup = get_connection().execute("SELECT * FROM sales_daily ORDER BY 1, 2").fetchall()
+    with db_manager.transaction() as cursor:
+        cursor.executemany("INSERT INTO sales (product_id, sale_date, quantity_sold) VALUES (1, ?, 2)",
+                           [('2024/01/05',), ('yesterday',)])
+        cursor.execute("UPDATE sales SET quantity_sold = 3 WHERE sale_date = 'yesterday'")
+    assert get_connection().execute("SELECT * FROM sales_daily ORDER BY 1, 2").fetchall() == rollup
+
+    with db_manager.transaction() as cursor:
+        cursor.execute("UPDATE sales SET sale_date = '2024-01-05' WHERE sale_date = '2024/01/05'")
+        cursor.execute("DELETE FROM sales WHERE sale_date = 'yesterday'")
+    day = (pd.Timestamp('2024-01-05') - pd.Timestamp('1970-01-01')).days
+    assert get_sales_stats(window_days=None).set_index('product_id').loc[1, 'first_day'] == day
+
+
+def test_import_inventory_upserts_and_keeps_sales(temp_db):
+    """Test that imports update existing products in place and insert new ones."""
+    before = get_inventory_df()
+    first = before.iloc[0]
+    sales_before = len(get_sales_df())
+
+    csv = io.BytesIO((
+        "product_name,current_stock,reorder_point,unit_cost\n"
+        f"{first['product_name']},999,5,10.5\n"
+        "Brand New Widget,40,10,2.0\n"
+    ).encode())
+    progress = []
+    result = import_inventory(csv, 'upload.csv', chunk_rows=1, progress=lambda rows, fraction: progress.append(rows))
+
+    assert result == {'rows': 2, 'inserted': 1, 'updated': 1}
+    assert progress == [1, 2]
+    after = get_inventory_df().set_index('id')
+    assert after.loc[first['id'], 'current_stock'] == 999
+    assert after.loc[first['id'], 'category'] == 'Uncategorized'
+    assert len(after) == len(before) + 1
+    assert len(get_sales_df()) == sales_before
+
+
+def test_import_inventory_rejects_bad_rows(temp_db):
+    """Test that validation errors roll the whole import back."""
+    before = get_inventory_df()
+
+    with pytest.raises(ValueError, match='Missing columns'):
+        import_inventory(io.BytesIO(b"product_name,current_stock\nA,1\n"), 'upload.csv')
+
+    csv = io.BytesIO(b"product_name,current_stock,reorder_point\nGood,1,1\nBad,lots,1\n")
+    with pytest.raises(ValueError, match='row'):
+        import_inventory(csv, 'upload.csv', chunk_rows=1)
+
+    pd.testing.assert_frame_equal(get_inventory_df(), before)
+
+
+def test_generate_synthetic_data_is_seeded_and_consistent(temp_db):
+    """Test that the bulk generator is reproducible and leaves the rollup exact."""
+    options = dict(seed=7, sparsity=0.2, weekly_seasonality=0.3, trend=0.01,
+                   distribution='negative_binomial', end_date='2026-03-31')
+    result = generate_synthetic_data(50, 40, **options)
+    first = get_sales_df()
+
+    assert result == {'products': 50, 'sales': len(first)}
+    assert len(get_inventory_df()) == 50
+    assert 0 < len(first) < 50 * 40
+    assert first['sale_date'].max() == pd.Timestamp('2026-03-31')
+
+    generate_synthetic_data(50, 40, **options)
+    pd.testing.assert_frame_equal(get_sales_df(), first)
+
+    # Triggers are back: a new sale still flows into the rollup
+    with db_manager.transaction() as cursor:
+        cursor.execute("INSERT INTO sales (product_id, sale_date, quantity_sold) VALUES (1, '2026-04-01', 5)")
+    sales = get_sales_df()
+    days = (pd.to_datetime(sales['sale_date']) - pd.Timestamp('1970-01-01')).dt.days
+    daily = sales.assign(day=days).groupby(['product_id', 'day'])['quantity_sold'].sum().reset_index()
+    daily['xy'] = daily['day'] * daily['quantity_sold']
+    expected = daily.groupby('product_id').agg(n=('day', 'size'), sum_y=('quantity_sold', 'sum'),
+                                               sum_xy=('xy', 'sum'), first_day=('day', 'min'))
+    stats = get_sales_stats(window_days=None).set_index('product_id').loc[expected.index]
+    for column in expected.columns:
+        assert (stats[column] == expected[column]).all()
+
+
+def test_generate_synthetic_data_appends(temp_db):
+    """Test that replace=False keeps existing products and continues their ids."""
+    before = get_inventory_df()
+    generate_synthetic_data(5, 10, seed=1, replace=False)
+
+    after = get_inventory_df()
+    assert len(after) == len(before) + 5
+    assert after['id'].is_unique
+
+    with pytest.raises(ValueError, match='distribution'):
+        generate_synthetic_data(5, 10, distribution='uniform')
+
+
+def test_generate_synthetic_data_replace_clears_derived_results(temp_db):
+    """Test that replacing the dataset drops forecasts, alerts and the dashboard fit."""
+    generate_synthetic_data(50, 40, seed=5)
+    db_manager.refresh_dashboard_metrics()
+    batch_forecast.run_batch_forecast(log=lambda message: None)
+    alerts.AlertEvaluator().poll()
+    assert len(db_manager.get_alert_state()) == 50
+
+    generate_synthetic_data(20, 40, seed=6)
+
+    conn = get_connection()
+    for table in ('forecasts', 'forecast_runs', 'alert_state', 'alerts'):
+        assert conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0] == 0
+    assert conn.execute("SELECT sales_hwm, as_of_day FROM dashboard_summary").fetchone() == (None, None)
+    assert db_manager.refresh_dashboard_metrics() == 20
+
+
+def test_inventory_page_filters_sorts_and_pages(temp_db):
+    """Test that paging, search, category and sort are applied in SQL."""
+    generate_synthetic_data(120, 5, seed=3, n_categories=4)
+    full = get_inventory_df()
+
+    page, total = get_inventory_page(page=1, page_size=50, sort_by='current_stock', descending=True)
+    expected = full.sort_values(['current_stock', 'id'], ascending=False).iloc[50:100]
+    assert total == 120
+    assert page['id'].tolist() == expected['id'].tolist()
+
+    page, total = get_inventory_page(search='sku-000001', category='Category 01', below_reorder=True)
+    mask = (full['product_name'].str.contains('SKU-000001') & (full['category'] == 'Category 01')
+            & (full['current_stock'] < full['reorder_point']))
+    assert total == mask.sum()
+    assert page['id'].tolist() == full.loc[mask, 'id'].tolist()
+
+    assert get_inventory_page(search='100%')[1] == 0
+    with pytest.raises(ValueError, match='sort_by'):
+        get_inventory_page(sort_by='id; DROP TABLE inventory')
+
+
+def test_inventory_page_reads_indexes(temp_db):
+    """Test that every sort column is indexed and the name search follows renames and deletes."""
+    conn = get_connection()
+    for column in db_manager.INVENTORY_SORT_COLUMNS[1:]:
+        plan = conn.execute(f"EXPLAIN QUERY PLAN SELECT * FROM inventory ORDER BY {column} DESC, id DESC LIMIT 5").fetchall()
+        assert not any('TEMP B-TREE' in row[3] for row in plan), column
+
+    first, second = get_inventory_df()['id'].tolist()[:2]
+    with db_manager.transaction() as cursor:
+        cursor.execute("UPDATE inventory SET product_name = 'Walnut Desk \"XL\"' WHERE id = ?", (first,))
+        cursor.execute("DELETE FROM inventory WHERE id = ?", (second,))
+    assert get_inventory_page(search='walnut desk "x')[0]['id'].tolist() == [first]
+    assert get_inventory_page(search='WALNUT')[1] == 2  # plus Standing Desk Pro (Walnut)
+    assert get_inventory_page()[1] == len(get_inventory_df())
+
+
+def test_update_stock_batch_saves_a_page(temp_db):
+    """Test that saving one page leaves rows outside it untouched."""
+    before = get_inventory_df().set_index('id')['current_stock']
+    page, _ = get_inventory_page(page=1, page_size=5)
+    edited = page.assign(current_stock=page['current_stock'] + 1)
+
+    assert update_stock_batch(edited) == 5
+    after = get_inventory_df().set_index('id')['current_stock']
+    assert (after.loc[page['id']] == before.loc[page['id']] + 1).all()
+    others = before.index.difference(page['id'])
+    assert (after.loc[others] == before.loc[others]).all()
+
+
+def expected_summary():
+    """Dashboard numbers computed the way the grid computes them."""
+    from engine import ml_logic
+    inventory = get_inventory_df()
+    forecast = ml_logic.forecast_from_stats(inventory, get_sales_stats(product_ids=inventory['id'].tolist()))
+    runway = forecast['days_to_stockout']
+    status = np.select([runway < 7, runway < 30], ['Critical', 'Warning'], 'Healthy')
+    value = inventory['current_stock'] * inventory['unit_cost']
+    return {
+        'critical_count': (status == 'Critical').sum(),
+        'warning_count': (status == 'Warning').sum(),
+        'below_reorder_count': (inventory['current_stock'] < inventory['reorder_point']).sum(),
+        'total_value': pytest.approx(value.sum()),
+        'value_at_risk': pytest.approx(value[status != 'Healthy'].sum()),
+    }, forecast['burn_rate'].nlargest(3).tolist()
+
+
+def test_dashboard_summary_tracks_stock_and_sales(temp_db):
+    """Test that the precomputed summary matches a full recompute after each kind of change."""
+    generate_synthetic_data(200, 40, seed=5, trend=-0.01)
+
+    def check():
+        db_manager.refresh_dashboard_metrics()
+        summary = db_manager.get_dashboard_summary(top_k=3)
+        expected, top_burn = expected_summary()
+        assert {key: summary[key] for key in expected} == expected
+        assert summary['top_burn']['Burn Rate'].tolist() == top_burn
+        assert summary['products'] == len(get_inventory_df())
+
+    check()
+    assert db_manager.refresh_dashboard_metrics() == 0
+
+    inventory = get_inventory_df()
+    update_stock_batch(inventory.assign(current_stock=inventory['current_stock'] // 4))
+    check()
+
+    today = pd.Timestamp.now().strftime('%Y-%m-%d')
+    with db_manager.transaction() as cursor:
+        cursor.executemany("INSERT INTO sales (product_id, sale_date, quantity_sold) VALUES (?, ?, 40)",
+                           [(product_id, today) for product_id in range(1, 11)])
+        cursor.execute("DELETE FROM inventory WHERE id = 20")
+    assert db_manager.refresh_dashboard_metrics() == 10
+    check()
+
+
+def test_up_to_date_refresh_does_not_write(temp_db):
+    """Test that refreshing current dashboard metrics takes no write transaction."""
+    generate_synthetic_data(50, 40, seed=5)
+    db_manager.refresh_dashboard_metrics()
+    conn = get_connection()
+    changes = conn.total_changes
+
+    assert db_manager.refresh_dashboard_metrics() == 0
+    assert conn.total_changes == changes
+
+
+def test_snapshot_round_trip(temp_db, tmp_path, monkeypatch):
+    """Test that Parquet snapshots load like SQL and restore the database exactly."""
+    pytest.importorskip('pyarrow')
+    generate_synthetic_data(30, 70, seed=9, end_date='2026-03-31')
+    with db_manager.transaction() as cursor:
+        cursor.execute("INSERT INTO sales (product_id, sale_date, quantity_sold) VALUES (2, '2026-03-31 14:30:00', 6)")
+    sales, stats = get_sales_df(), get_sales_stats(window_days=None)
+
+    snapshot = tmp_path / 'snapshot'
+    assert db_manager.export_snapshot(snapshot, chunk_rows=500)['sales'] == len(sales)
+    assert sorted(p.name for p in (snapshot / 'sales').iterdir()) == ['month=2026-01', 'month=2026-02', 'month=2026-03']
+
+    loaded = db_manager.load_snapshot_sales(snapshot)
+    assert list(loaded.columns) == ['product_id', 'sale_date', 'quantity_sold']
+    assert loaded['quantity_sold'].sum() == sales['quantity_sold'].sum()
+    by_id = db_manager.load_snapshot_sales(snapshot, columns=['id', 'sale_date']).sort_values('id', ignore_index=True)
+    expected_dates = pd.to_datetime(sales['sale_date'], format='ISO8601').astype('datetime64[ns]')
+    pd.testing.assert_series_equal(by_id['sale_date'], expected_dates)
+
+    march = db_manager.load_snapshot_sales(snapshot, start='2026-03-01', product_ids=[2])
+    assert (march['product_id'] == 2).all()
+    assert march['quantity_sold'].sum() == sales[(sales['product_id'] == 2) & (sales['sale_date'] >= '2026-03')]['quantity_sold'].sum()
+
+    monkeypatch.setattr(db_manager, 'DB_NAME', str(tmp_path / 'restored.db'))
+    init_db()
+    assert db_manager.import_snapshot(snapshot) == {'inventory': 30, 'sales': len(sales)}
+    pd.testing.assert_frame_equal(get_sales_df(), sales)
+    pd.testing.assert_frame_equal(get_sales_stats(window_days=None), stats)
+
+    # Restoring over a database with alerts drops them with the old products
+    alerts.AlertEvaluator().poll()
+    db_manager.import_snapshot(snapshot)
+    conn = get_connection()
+    assert conn.execute("SELECT COUNT(*) FROM alert_state").fetchone()[0] == 0
+    assert conn.execute("SELECT COUNT(*) FROM alerts").fetchone()[0] == 0
+    # Only the restored products' inserts are left in the change feed
+    assert conn.execute("SELECT COUNT(*) FROM stock_changes").fetchone()[0] == 30
+    db_manager.close_connections()
+
+
+def test_memory_report_shows_compact_loaders(temp_db):
+    """Test that the compact loaders beat default dtypes and the report adds up."""
+    generate_synthetic_data(50, 60, seed=4)
+    sales = get_sales_df()
+    default = pd.read_sql_query("SELECT * FROM sales", get_connection())
+
+    report = db_manager.memory_report(sales=sales, default=default)
+    totals = report[report['column'] == 'total'].set_index('frame')['bytes']
+    assert totals['sales'] * 2 < totals['default']
+    assert totals['sales'] == report[(report['frame'] == 'sales') & (report['column'] != 'total')]['bytes'].sum()
+    assert report.set_index(['frame', 'column']).loc[('sales', 'quantity_sold'), 'dtype'] == str(sales['quantity_sold'].dtype)
+
+
+def test_sales_ingestor_flushes_on_size_and_time(temp_db):
+    """Test that buffered sales commit in micro-batches and take stock off inventory."""
+    generate_synthetic_data(20, 10, seed=2)
+    stock = get_inventory_df().set_index('id')['current_stock']
+    sales_before = len(get_sales_df())
+
+    with db_manager.SalesIngestor(batch_rows=4, flush_seconds=0.05) as ingestor:
+        ingestor.extend([(1, 1), (2, 2), {'product_id': 1, 'quantity_sold': 3}, (3, 1, '2026-01-02 10:00:00')])
+        assert ingestor.pending() == 0  # size flush
+        ingestor.record(2, 1)
+        assert ingestor.pending() == 1
+        for _ in range(100):
+            if ingestor.pending() == 0:
+                break
+            threading.Event().wait(0.01)
+        assert ingestor.pending() == 0  # time flush
+        ingestor.record(999, 1)  # unknown product
+        ingestor.record(4, stock[4] + 50)  # oversold
+        with pytest.raises(ValueError):
+            ingestor.record(1, 0)
+
+    assert ingestor.stats() == {'events': 7, 'rows': 6, 'rejected': 1, 'batches': 3}
+    after = get_inventory_df().set_index('id')['current_stock']
+    assert (stock - after).loc[[1, 2, 3, 4, 5]].tolist() == [4, 3, 1, stock[4], 0]
+    assert len(get_sales_df()) == sales_before + 6
+    assert get_sales_stats(window_days=None).set_index('product_id').loc[3, 'first_day'] == (
+        pd.Timestamp('2026-01-02') - pd.Timestamp('1970-01-01')).days
+
+
+def test_bad_sale_does_not_block_ingestion(temp_db):
+    """Test that a bad event is refused or dropped while the good ones around it are written."""
+    generate_synthetic_data(5, 5, seed=2)
+    sales_before = len(get_sales_df())
+
+    ingestor = db_manager.SalesIngestor(batch_rows=3, flush_seconds=None)
+    with pytest.raises(ValueError, match='sale_date'):
+        ingestor.record(1, 1, "yesterday")
+    ingestor.record(1, 1, "2026/01/05")
+    ingestor.record(2, 1)
+    # A row the database rejects at flush time is dropped, not retried forever
+    with db_manager.transaction() as cursor:
+        cursor.execute("CREATE TRIGGER refuse_three BEFORE INSERT ON sales WHEN NEW.product_id = 3 "
+                       "BEGIN SELECT RAISE(ABORT, 'refused'); END")
+    ingestor.record(3, 1)
+    assert ingestor.pending() == 0
+    ingestor.record(4, 1)
+    ingestor.close()
+
+    assert ingestor.stats() == {'events': 4, 'rows': 3, 'rejected': 1, 'batches': 2}
+    sales = get_sales_df()
+    assert len(sales) == sales_before + 3
+    assert (sales['sale_date'] == pd.Timestamp('2026-01-05')).sum() >= 1
+
+
+def test_ingest_sales_bounds_the_buffer(temp_db):
+    """Test that ingest_sales consumes a generator without holding more than one batch."""
+    generate_synthetic_data(10, 5, seed=2)
+    seen = []
+
+    def feed():
+        for i in range(250):
+            seen.append(db_manager.get_sales_high_water_mark())
+            yield (1 + i % 10, 1)
+
+    hwm = db_manager.get_sales_high_water_mark()
+    stats = db_manager.ingest_sales(feed(), batch_rows=100, flush_seconds=None)
+    assert stats == {'events': 250, 'rows': 250, 'rejected': 0, 'batches': 3}
+    # Rows become visible 100 at a time while the feed is still running
+    assert sorted(set(seen)) == [hwm, hwm + 100, hwm + 200]
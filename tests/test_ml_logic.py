@@ -2,9 +2,11 @@
 Unit tests for ML logic module.
 """
 import pytest
+import numpy as np
 import pandas as pd
 from datetime import datetime, timedelta
-from engine.ml_logic import calculate_burn_rate_and_stockout
+from engine import ml_logic
+from engine.ml_logic import calculate_burn_rate_and_stockout, forecast_inventory, forecast_from_stats, ForecastCache
 
 
 def test_calculate_burn_rate_with_data():
@@ -119,3 +121,193 @@ def test_calculate_burn_rate_zero_stock():
     
     assert result['days_to_stockout'] == 0
     assert result['status'] == 'Critical'
+
+
+def test_forecast_inventory_matches_per_row():
+    """Test that the batch forecast agrees with the per-row function."""
+    rng = np.random.default_rng(7)
+    inventory_df = pd.DataFrame({
+        'id': range(1, 41),
+        'product_name': [f'Product {i}' for i in range(1, 41)],
+        'current_stock': rng.integers(0, 300, 40),
+        'reorder_point': [30] * 40
+    })
+
+    rows = []
+    for product_id in range(1, 36):
+        # Varying history lengths exercise both the trend and mean paths,
+        # and days older than the window exercise the 'Stable' status.
+        for day in rng.choice(60, rng.integers(1, 40), replace=False):
+            rows.append((product_id, datetime.now() - timedelta(days=int(day)), int(rng.integers(0, 10))))
+    sales_df = pd.DataFrame(rows, columns=['product_id', 'sale_date', 'quantity_sold'])
+
+    batch = forecast_inventory(inventory_df, sales_df)
+
+    for index, row in inventory_df.iterrows():
+        expected = calculate_burn_rate_and_stockout(row, sales_df)
+        actual = batch.loc[index]
+        assert actual['status'] == expected['status']
+        assert actual['burn_rate'] == pytest.approx(expected['burn_rate'], abs=0.01)
+        assert actual['days_to_stockout'] == pytest.approx(expected['days_to_stockout'], abs=0.1)
+
+
+def test_forecast_inventory_without_sales():
+    """Test that products without any sales history report 'No Data'."""
+    inventory_df = pd.DataFrame({'id': [1, 2], 'current_stock': [10, 20]})
+    sales_df = pd.DataFrame(columns=['product_id', 'sale_date', 'quantity_sold'])
+
+    result = forecast_inventory(inventory_df, sales_df)
+
+    assert list(result['status']) == ['No Data', 'No Data']
+    assert list(result['burn_rate']) == [0.0, 0.0]
+    assert np.isinf(result['days_to_stockout']).all()
+
+
+def test_forecast_from_stats_matches_raw_sales():
+    """Test that forecasting from rollup sums matches forecasting from raw sales."""
+    from engine.db_manager import init_db, get_inventory_df, get_sales_df, get_sales_stats
+
+    init_db()
+    inventory_df = get_inventory_df()
+
+    from_sales = forecast_inventory(inventory_df, get_sales_df())
+    from_stats = forecast_from_stats(inventory_df, get_sales_stats())
+
+    pd.testing.assert_frame_equal(from_sales, from_stats)
+
+
+def test_forecast_inventory_from_sql_window():
+    """Test that the pre-aggregated SQL window gives the same forecast as raw sales."""
+    from engine.db_manager import init_db, get_inventory_df, get_sales_df, get_daily_sales_window
+
+    init_db()
+    inventory_df = get_inventory_df()
+
+    pd.testing.assert_frame_equal(
+        forecast_inventory(inventory_df, get_sales_df()),
+        forecast_inventory(inventory_df, get_daily_sales_window())
+    )
+
+
+def test_forecast_cache_reuses_and_refreshes():
+    """Test that the forecast cache matches uncached results and only refits on change."""
+    inventory_df = pd.DataFrame({'id': [1, 2, 3], 'current_stock': [10, 50, 0]})
+    sales_stats = pd.DataFrame({
+        'product_id': [1, 2], 'n': [10, 3],
+        'sum_x': [20045, 6003], 'sum_y': [40, 9], 'sum_xy': [80210, 18012],
+        'sum_xx': [40180285, 12012005], 'first_day': [2000, 2000], 'last_day': [2009, 2002]
+    })
+    loads = []
+
+    def load_stats(product_ids):
+        loads.append(list(product_ids))
+        return sales_stats[sales_stats['product_id'].isin(product_ids)]
+
+    cache = ForecastCache()
+    first = cache.forecast(inventory_df, 100, load_stats, sold_since=lambda hwm: [])
+    pd.testing.assert_frame_equal(first, forecast_from_stats(inventory_df, sales_stats))
+    assert loads == [[1, 2, 3]]
+
+    # Unchanged rerun: no reload, all hits
+    cache.forecast(inventory_df, 100, load_stats, sold_since=lambda hwm: [])
+    assert loads == [[1, 2, 3]]
+    assert cache.stats()['hits'] == 3
+
+    # Stock edit: no refit, runway follows the new stock
+    edited = inventory_df.assign(current_stock=[10, 1, 0])
+    result = cache.forecast(edited, 100, load_stats, sold_since=lambda hwm: [])
+    assert loads == [[1, 2, 3]]
+    pd.testing.assert_frame_equal(result, forecast_from_stats(edited, sales_stats))
+
+    # New sales: only the affected product is refitted
+    cache.forecast(edited, 101, load_stats, sold_since=lambda hwm: [2])
+    assert loads == [[1, 2, 3], [2]]
+
+
+def test_forecast_cache_ignores_sales_outside_frame():
+    """Test that a sale of a product not in the frame returns the cached result."""
+    inventory_df = pd.DataFrame({'id': [1, 2], 'current_stock': [10, 50]})
+    sales_stats = pd.DataFrame({
+        'product_id': [1, 2, 3], 'n': [10, 3, 2],
+        'sum_x': [20045, 6003, 4001], 'sum_y': [40, 9, 4], 'sum_xy': [80210, 18012, 8002],
+        'sum_xx': [40180285, 12012005, 8004001], 'first_day': [2000, 2000, 2000], 'last_day': [2009, 2002, 2001]
+    })
+    loads = []
+
+    def load_stats(product_ids):
+        loads.append(list(product_ids))
+        return sales_stats[sales_stats['product_id'].isin(product_ids)]
+
+    cache = ForecastCache()
+    first = cache.forecast(inventory_df, 100, load_stats, sold_since=lambda hwm: [])
+    again = cache.forecast(inventory_df, 101, load_stats, sold_since=lambda hwm: [3])
+
+    pd.testing.assert_frame_equal(again, first)
+    assert loads == [[1, 2]]
+
+
+def test_forecast_cache_evicts_least_recently_used():
+    """Test that the cache stays within max_entries."""
+    inventory_df = pd.DataFrame({'id': range(1, 11), 'current_stock': [5] * 10})
+    empty_stats = pd.DataFrame(columns=['product_id', 'n', 'sum_x', 'sum_y', 'sum_xy', 'sum_xx', 'first_day', 'last_day'])
+
+    cache = ForecastCache(max_entries=4)
+    result = cache.forecast(inventory_df, 0, lambda ids: empty_stats, sold_since=lambda hwm: [])
+
+    assert cache.stats()['entries'] == 4
+    assert (result['status'] == 'No Data').all()
+
+
+def test_registry_linear_model_matches_forecast_from_stats():
+    """Test that the registry's linear model reproduces the rollup forecast."""
+    from engine.db_manager import init_db, get_inventory_df, get_sales_stats, get_daily_demand
+
+    init_db()
+    inventory_df = get_inventory_df()
+    now = datetime.now()
+
+    expected = forecast_from_stats(inventory_df, get_sales_stats(now=now))
+    result = ml_logic.forecast_with_models(inventory_df, get_daily_demand(now=now), now=now, model='linear')
+
+    assert np.allclose(result['burn_rate'], expected['burn_rate'], atol=0.011)
+    assert list(result['status']) == list(expected['status'])
+    assert (result['model'] == 'linear').all()
+
+
+def test_registry_models_fit_their_patterns():
+    """Test seasonal, intermittent and level demand against their own models."""
+    days, end_weekday = 56, 6  # history ends on a Sunday
+    weekday = (end_weekday - days + 1 + np.arange(days)) % 7
+    weekly = np.where(weekday >= 5, 10.0, 2.0)           # weekend peaks
+    intermittent = np.where(np.arange(days) % 4 == 3, 8.0, 0.0)  # 8 units every 4th day
+    level = np.full(days, 3.0)
+    demand = np.stack([weekly, intermittent, level])
+    observed = np.ones_like(demand, dtype=bool)
+
+    seasonal = ml_logic.MODELS['seasonal'](demand, observed, 7, end_weekday)
+    assert np.allclose(seasonal[0], [2, 2, 2, 2, 2, 10, 10])
+    croston = ml_logic.MODELS['croston'](demand, observed, 7, end_weekday)
+    assert croston[1, 0] == pytest.approx(2.0 * (1 - ml_logic.CROSTON_ALPHA / 2))
+    assert np.allclose(ml_logic.MODELS['exp_smoothing'](demand, observed, 7, end_weekday)[2], 3.0)
+
+    forecast, names = ml_logic.forecast_demand(demand, observed, end_weekday, model='auto', horizon=7)
+    assert names[0] == 'seasonal'
+    assert forecast.shape == (3, 7)
+    with pytest.raises(ValueError):
+        ml_logic.forecast_demand(demand, observed, end_weekday, model='arima')
+
+
+def test_runway_accumulates_forecast_demand():
+    """Test that runway sums forecast demand day by day and extrapolates past the horizon."""
+    forecast = np.array([
+        [1.0, 1.0, 10.0, 10.0],   # runs out during the third day
+        [2.0, 2.0, 2.0, 2.0],     # outlasts the horizon
+        [0.0, 0.0, 0.0, 0.0],     # no demand
+        [5.0, 5.0, 5.0, 5.0],     # already out of stock
+    ])
+    runway = ml_logic.runway_from_forecast(forecast, [7, 12, 5, 0])
+
+    assert runway[0] == pytest.approx(2.5)
+    assert runway[1] == pytest.approx(6.0)
+    assert np.isinf(runway[2])
+    assert runway[3] == 0
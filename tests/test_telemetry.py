@@ -0,0 +1,116 @@
+"""
+Unit tests for the telemetry module.
+"""
+import json
+import threading
+import pytest
+import pandas as pd
+from engine import telemetry
+
+
+@pytest.fixture(autouse=True)
+def clean_telemetry(monkeypatch):
+    """Start each test disabled, with no recorded runs."""
+    monkeypatch.setattr(telemetry, '_enabled', False)
+    monkeypatch.setattr(telemetry, 'LOG_PATH', None)
+    telemetry.reset()
+    yield
+    telemetry.end_run()
+    telemetry.reset()
+
+
+@telemetry.instrumented("test.load")
+def load(n):
+    return pd.DataFrame({'x': range(n)})
+
+
+@telemetry.instrumented("test.outer")
+def outer():
+    telemetry.annotate(cache_hits=3)
+    return load(4), load(2)
+
+
+def test_disabled_records_nothing():
+    """Test that instrumentation is a pass-through when disabled."""
+    telemetry.begin_run()
+    assert len(load(5)) == 5
+    with telemetry.stage("test.block"):
+        pass
+    telemetry.end_run()
+
+    assert telemetry.recent_runs() == []
+    assert 'test.load' not in telemetry.prometheus_text()
+
+
+def test_run_groups_nested_stages_in_start_order(tmp_path):
+    """Test that a run lists stages parent-first with rows and annotations."""
+    log = tmp_path / 'profile.jsonl'
+    telemetry.enable(log_path=str(log))
+
+    telemetry.begin_run("rerun")
+    outer()
+    with telemetry.stage("test.block", rows=7):
+        pass
+    run = telemetry.end_run()
+
+    assert [(s['stage'], s['depth']) for s in run['stages']] == [
+        ('test.outer', 0), ('test.load', 1), ('test.load', 1), ('test.block', 0)
+    ]
+    assert run['stages'][0]['cache_hits'] == 3
+    assert run['stages'][0]['rows'] == 4
+    assert [s['rows'] for s in run['stages'][1:]] == [4, 2, 7]
+    assert json.loads(log.read_text().splitlines()[-1])['stages'] == run['stages']
+    assert telemetry.recent_runs(1) == [run]
+
+
+def test_errors_and_prometheus_export():
+    """Test that failing stages are marked and totals export as Prometheus text."""
+    telemetry.enable()
+
+    @telemetry.instrumented("test.fail")
+    def fail():
+        raise ValueError("boom")
+
+    with pytest.raises(ValueError):
+        fail()
+    load(3)
+    load(4)
+
+    # Outside a run each stage is recorded on its own
+    assert telemetry.recent_runs()[-1]['stages'][0]['error'] == 'ValueError'
+    text = telemetry.prometheus_text()
+    assert 'insightpro_stage_seconds_count{stage="test.load"} 2' in text
+    assert 'insightpro_stage_rows_total{stage="test.load"} 7' in text
+    assert 'insightpro_stage_seconds_count{stage="test.fail"} 1' in text
+
+
+def test_profiled_run_stays_on_its_thread():
+    """Test that begin_run(profile=True) records only that thread's run."""
+    telemetry.begin_run("rerun", profile=True)
+    load(3)
+    other = threading.Thread(target=lambda: (telemetry.begin_run(), load(9), telemetry.end_run()))
+    other.start()
+    other.join()
+    run = telemetry.end_run()
+
+    assert not telemetry.is_enabled()
+    assert [s['rows'] for s in run['stages']] == [3]
+    assert telemetry.recent_runs() == [run]
+    # The next plain run on this thread is not profiled either
+    telemetry.begin_run()
+    load(2)
+    assert telemetry.end_run() is None
+
+
+def test_recent_runs_by_session():
+    """Test that runs are tagged with their session and can be listed per session."""
+    telemetry.begin_run("rerun", profile=True, session="a")
+    load(1)
+    first = telemetry.end_run()
+    telemetry.begin_run("rerun", profile=True, session="b")
+    load(2)
+    second = telemetry.end_run()
+
+    assert telemetry.recent_runs(session="a") == [first]
+    assert telemetry.recent_runs(session="b") == [second]
+    assert telemetry.recent_runs() == [second, first]